@@ -1,5 +1,6 @@
 # drugbank/__init__.py
 from .api import *
+from .database import *
 from .parsers import *
 from .simulator import *
 from .visualisers import *
\ No newline at end of file
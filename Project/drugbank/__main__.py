@@ -0,0 +1,51 @@
+# drugbank/__main__.py
+import argparse
+import os
+import sys
+
+from lxml import etree
+
+from .sinks import DEFAULT_FLUSH_DRUGS, SINKS, TABLES, convert
+
+
+def positive_int(value):
+    """An argparse type for counts which have to be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m drugbank", description="Tools for DrugBank XML files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="stream the XML into one file per table",
+                                         description="Streams the DrugBank XML file into one file per table, "
+                                                     "without keeping the tables in memory.")
+    convert_parser.add_argument("xml_path", help="DrugBank XML file, plain or packed in a .zip/.gz/.xz archive")
+    convert_parser.add_argument("--out", required=True, help="directory of the output files")
+    convert_parser.add_argument("--format", choices=list(SINKS), default="parquet", help="format of the output files")
+    convert_parser.add_argument("--tables", nargs="+", choices=TABLES, default=list(TABLES),
+                                help="tables to write (all by default)")
+    convert_parser.add_argument("--flush-drugs", type=positive_int, default=DEFAULT_FLUSH_DRUGS,
+                                help="write the records out every this many drugs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+
+    if args.command == "convert":
+        try:
+            counts = convert(args.xml_path, args.out, args.format, args.tables, args.flush_drugs)
+        except (OSError, etree.ParseError) as e:
+            print(f"Error converting {args.xml_path}: {e}")
+            return 1
+        for table, count in counts.items():
+            print(f"{table}: {count} records written to {os.path.join(args.out, f'{table}.{args.format}')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# drugbank/amino_acid_cache.py
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+import pandas as pd
+
+from .cache import DEFAULT_CACHE_DIR
+from .name_index import normalize
+from .parsers import LOOKUP_FAILED
+
+DEFAULT_AMINO_ACID_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "amino_acid_counts.sqlite")
+
+# Found counts are kept for a month, "not found" results only for a day, as a miss may be a temporary failure.
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_NEGATIVE_TTL_SECONDS = 24 * 3600
+
+DEFAULT_SOURCE = "uniprot"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS amino_acid_counts (
+    target_key TEXT PRIMARY KEY,
+    target_name TEXT NOT NULL,
+    amino_acid_count INTEGER,
+    source TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+CachedCount = namedtuple("CachedCount", ["target_name", "amino_acid_count", "source", "fetched_at"])
+AminoAcidCacheInfo = namedtuple("AminoAcidCacheInfo", ["hits", "misses", "lookups", "shared"])
+
+
+def target_key(target_name):
+    """The cache key of a target: its normalized name, or None for a missing name."""
+    if not isinstance(target_name, str):
+        return None
+    return normalize(target_name) or None
+
+
+class AminoAcidCache:
+    """
+    Disk-backed cache of amino acid counts looked up on UniProt, keyed by the normalized target name,
+    so a target shared by many drugs is looked up once and reruns do not look anything up again.
+
+    Every entry keeps the count (NULL if the target was not found), its source and the time it was fetched.
+    Counts expire after ttl seconds and "not found" results after the shorter negative_ttl.
+    A target which is being looked up by one thread is not looked up again by another one: the second thread
+    waits for the first one's result instead.
+
+    The lookup given to get_many is a function of a list of target names returning the list of their counts
+    (see parsers.amino_acid_lookup), so the missing targets are looked up in a single batch, e.g. by a WebDriverPool.
+    A target the lookup could not look up gets LOOKUP_FAILED instead of a count and is not cached.
+
+    Example:
+        with AminoAcidCache() as cache:
+            cache.prefetch(targets, amino_acid_lookup(pool))
+            get_target_amino_acid_count_for_drug("DB00002", targets, cache=cache)
+    """
+
+    def __init__(self, path=DEFAULT_AMINO_ACID_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL_SECONDS, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Lookups may come from the threads of a WebDriverPool, so the connection is shared under a lock.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.shared = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_fresh(self, entry):
+        ttl = self.ttl if entry.amino_acid_count is not None else self.negative_ttl
+        return self.clock() - entry.fetched_at < ttl
+
+    def read(self, key):
+        """Returns the CachedCount stored under the key, expired or not, or None."""
+        row = self.connection.execute(
+            "SELECT target_name, amino_acid_count, source, fetched_at FROM amino_acid_counts WHERE target_key = ?",
+            (key,)).fetchone()
+        return CachedCount(*row) if row else None
+
+    def get(self, target_name):
+        """Returns the fresh CachedCount of the target, or None if it is not cached or has expired."""
+        key = target_key(target_name)
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.read(key)
+        return entry if entry is not None and self.is_fresh(entry) else None
+
+    def put_many(self, entries, source=DEFAULT_SOURCE):
+        """Stores (target name, count) pairs, with None for the targets which were not found."""
+        fetched_at = self.clock()
+        rows = [(target_key(target_name), target_name, count, source, fetched_at)
+                for target_name, count in entries if target_key(target_name) is not None]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO amino_acid_counts (target_key, target_name, amino_acid_count, source, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def put(self, target_name, count, source=DEFAULT_SOURCE):
+        self.put_many([(target_name, count)], source)
+
+    def get_many(self, target_names, lookup, source=DEFAULT_SOURCE):
+        """
+        Returns the counts of the targets, in order. The targets which are not cached (or have expired) are
+        looked up by a single call of lookup with the list of their distinct names and stored.
+        Targets already being looked up by another thread are waited for instead.
+        """
+        keys = [target_key(target_name) for target_name in target_names]
+        counts = {None: None}
+        own = {}
+        waiting = {}
+        with self.lock:
+            for target_name, key in zip(target_names, keys):
+                if key in counts or key in own or key in waiting:
+                    continue
+                entry = self.read(key)
+                if entry is not None and self.is_fresh(entry):
+                    self.hits += 1
+                    counts[key] = entry.amino_acid_count
+                elif key in self.in_flight:
+                    self.shared += 1
+                    waiting[key] = self.in_flight[key]
+                else:
+                    self.misses += 1
+                    future = Future()
+                    self.in_flight[key] = future
+                    own[key] = (target_name, future)
+
+        if own:
+            names = [target_name for target_name, _ in own.values()]
+            found = {}
+            error = None
+            try:
+                results = list(lookup(names))
+                if len(results) != len(names):
+                    raise ValueError(f"The lookup gave {len(results)} counts for {len(names)} targets")
+                found = dict(zip(own, results))
+                # A target whose lookup failed is not stored, so it is looked up again next time.
+                self.put_many([(target_name, count) for target_name, count in zip(names, results)
+                               if count is not LOOKUP_FAILED], source)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                # Every lookup of this thread is resolved, even after an error, so no other thread waits forever.
+                self.finish(own, found, error)
+            counts.update((key, None if count is LOOKUP_FAILED else count) for key, count in found.items())
+
+        for key, future in waiting.items():
+            counts[key] = future.result()
+        return [counts[key] for key in keys]
+
+    def finish(self, own, found, error=None):
+        """
+        Hands the results of this thread's lookups to the threads waiting for them. A target without a result
+        gets the error of the lookup instead.
+        """
+        with self.lock:
+            for key in own:
+                del self.in_flight[key]
+            self.lookups += sum(found.get(key, LOOKUP_FAILED) is not LOOKUP_FAILED for key in own)
+        for key, (target_name, future) in own.items():
+            if key not in found:
+                future.set_exception(error or RuntimeError(f"The lookup of {target_name!r} gave no result"))
+            else:
+                future.set_result(None if found[key] is LOOKUP_FAILED else found[key])
+
+    def prefetch(self, targets, lookup, source=DEFAULT_SOURCE):
+        """
+        Looks up, in one batch, every distinct target of the parse_targets dataframe which has no amino acid count
+        parsed from the XML and is not cached yet. Returns the number of targets looked up.
+        """
+        if "Amino_Acid_Count" in targets:
+            targets = targets[targets["Amino_Acid_Count"].isna()]
+        names = pd.unique(targets["Target_Name"].dropna().astype(object)).tolist()
+        lookups = self.lookups
+        self.get_many(names, lookup, source)
+        return self.lookups - lookups
+
+    def purge(self):
+        """Deletes the expired entries and returns how many there were."""
+        now = self.clock()
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM amino_acid_counts WHERE "
+                "(amino_acid_count IS NOT NULL AND fetched_at <= ?) OR (amino_acid_count IS NULL AND fetched_at <= ?)",
+                (now - self.ttl, now - self.negative_ttl))
+        return cursor.rowcount
+
+    def cache_info(self):
+        return AminoAcidCacheInfo(self.hits, self.misses, self.lookups, self.shared)
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM amino_acid_counts").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
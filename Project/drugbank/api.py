@@ -1,29 +1,69 @@
-from fastapi import FastAPI, HTTPException
+import os
+import sqlite3
+import threading
+from fastapi import Depends, FastAPI, HTTPException
 from pydantic import BaseModel
-from .parsers import parse_pathways
+from .sqlite_export import ensure_database
+from . import queries
 from lxml import etree
 
 app = FastAPI()
 
 relative_file_path = "data/drugbank_partial.xml"
+database_path = "data/drugbank.sqlite"
 
-try:
-    # Parse the input XML.
-    tree = etree.parse(relative_file_path)
-    root = tree.getroot()
-except etree.ParseError as e:
-    print(f"Error parsing XML: {e}")
-    exit(1)
+# The connection to the exported database, opened by get_connection on the first request.
+state = {"connection": None}
+state_lock = threading.Lock()
+
+
+def open_database(xml_path=relative_file_path, db_path=database_path, use_cache=None, refresh=None):
+    """
+    Exports the input XML to SQLite unless the database is up to date, and opens the connection the endpoints
+    query instead of keeping the parsed tables in memory.
+
+    By default, DRUGBANK_NO_CACHE=1 always parses the XML and DRUGBANK_REFRESH_CACHE=1 refreshes the parse cache.
+    """
+    if use_cache is None:
+        use_cache = not os.environ.get("DRUGBANK_NO_CACHE")
+    if refresh is None:
+        refresh = bool(os.environ.get("DRUGBANK_REFRESH_CACHE"))
+
+    with state_lock:
+        if state["connection"] is None:
+            ensure_database(xml_path, db_path, use_cache=use_cache, refresh=refresh)
+            state["connection"] = queries.connect(db_path)
+        return state["connection"]
+
+
+def get_connection():
+    """The database connection of the endpoints, set up on first use so that importing the API does no work."""
+    try:
+        return open_database()
+    except (OSError, etree.ParseError) as e:
+        print(f"Error preparing the database: {e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
 
-# Get pathways and pathway counts
-pathways, drug_pathway_counts = parse_pathways(root)
 
 class DrugRequest(BaseModel):
     drug_id: str
 
+class SearchRequest(BaseModel):
+    query: str
+    limit: int = 10
+
 @app.post("/get_pathway_count/")
-def get_pathway_count(request: DrugRequest):
+def get_pathway_count(request: DrugRequest, connection=Depends(get_connection)):
     drug_id = request.drug_id.strip()
-    if drug_id not in pathways["DrugBank_ID"].values:
+    pathway_count = queries.get_pathway_count(connection, drug_id)
+    if pathway_count is None:
         raise HTTPException(status_code=404, detail="Drug not found")
-    return {"drug_id": drug_id, "pathway_count": drug_pathway_counts[drug_id]}
+    return {"drug_id": drug_id, "pathway_count": pathway_count}
+
+@app.post("/search_drugs/")
+def search_drugs(request: SearchRequest, connection=Depends(get_connection)):
+    try:
+        results = queries.search_drugs(connection, request.query, request.limit)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+    return {"query": request.query, "results": results}
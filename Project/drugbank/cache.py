@@ -0,0 +1,239 @@
+# drugbank/cache.py
+import hashlib
+import json
+import os
+import shutil
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from .parsers import TABLES, PARSER_VERSION, check_tables, parse_all
+from .xml_source import parse_xml
+
+DEFAULT_CACHE_DIR = os.path.join("data", ".cache")
+# The cache is trimmed to this size, evicting the least recently used entries first.
+DEFAULT_MAX_CACHE_BYTES = 1024 ** 3
+
+HASH_INDEX_FILE = "hashes.json"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(path):
+    """Returns the SHA-256 hex digest of the file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_file(path, tables):
+    """Parses the DrugBank XML file (plain or a .zip/.gz/.xz archive) and returns the parse_all results of the given tables."""
+    return parse_all(parse_xml(path), tables)
+
+
+def encode_part(part, file_prefix):
+    """Writes a single part of a table result to disk and returns the metadata needed to read it back."""
+    if isinstance(part, pd.DataFrame):
+        index = [name for name in part.index.names if name is not None]
+        df = part.reset_index() if index else part
+        df.to_parquet(f"{file_prefix}.parquet", index=False)
+        # Parquet loses the dtype of columns without any values and the unused categories, so both are kept aside.
+        return {"kind": "frame", "index": index,
+                "dtypes": {str(name): str(dtype) for name, dtype in df.dtypes.items()},
+                "categories": {str(name): [dtype.categories.tolist(), str(dtype.categories.dtype)]
+                               for name, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)}}
+    if isinstance(part, dict):
+        # Store the items as pairs, so keys which are not strings (e.g. None) survive the JSON round trip.
+        return {"kind": "counts", "items": [[key, value] for key, value in part.items()],
+                "default": isinstance(part, defaultdict)}
+    return {"kind": "value", "value": part}
+
+
+def decode_part(meta, file_prefix):
+    """Reads back a part written by encode_part."""
+    if meta["kind"] == "frame":
+        df = pd.read_parquet(f"{file_prefix}.parquet")
+        # Parquet gives list columns (synonyms, products) back as arrays.
+        for column in df.columns:
+            # An empty categorical column comes back as an object one, so the categories are checked first.
+            if str(column) in meta["categories"]:
+                categories, categories_dtype = meta["categories"][str(column)]
+                df[column] = df[column].astype(pd.CategoricalDtype(pd.Index(categories, dtype=categories_dtype)))
+            elif df[column].dtype == object:
+                df[column] = [value.tolist() if isinstance(value, np.ndarray) else value for value in df[column]]
+            elif str(df[column].dtype) != meta["dtypes"][str(column)]:
+                df[column] = df[column].astype(meta["dtypes"][str(column)])
+        return df.set_index(meta["index"]) if meta["index"] else df
+    if meta["kind"] == "counts":
+        counts = defaultdict(int) if meta["default"] else {}
+        counts.update((key, value) for key, value in meta["items"])
+        return counts
+    return meta["value"]
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed DrugBank tables.
+
+    Every table is stored as Parquet files under cache_dir, in a directory keyed by the size, modification time and
+    content hash of the XML file and by PARSER_VERSION, so any change to the file or to the parsers misses the cache.
+    The content hash of a file is remembered for its size and modification time, so a warm start does not read the
+    whole file again. When the cache grows over max_bytes, the least recently used entries are removed.
+
+    Args:
+        enabled: with enabled=False nothing is read from or written to the cache (the --no-cache switch).
+        refresh: with refresh=True cached tables are ignored and overwritten by freshly parsed ones.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES, enabled=True, refresh=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.refresh = refresh
+
+    def file_hash(self, path):
+        """Returns the content hash of the file, hashing it only if its size or modification time changed."""
+        stat = os.stat(path)
+        index_path = os.path.join(self.cache_dir, HASH_INDEX_FILE)
+        try:
+            with open(index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            index = {}
+
+        absolute_path = os.path.abspath(path)
+        entry = index.get(absolute_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        sha256 = content_hash(path)
+        index[absolute_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(tmp_path, index_path)
+        return sha256
+
+    def key(self, path):
+        """Returns the cache key of the file."""
+        stat = os.stat(path)
+        key = f"{stat.st_size}:{stat.st_mtime_ns}:{self.file_hash(path)}:{PARSER_VERSION}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def entry_dir(self, path):
+        return os.path.join(self.cache_dir, self.key(path))
+
+    def load(self, entry_dir, table):
+        """Returns the cached result of the table, or None if it is not cached."""
+        meta_path = os.path.join(entry_dir, f"{table}.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            parts = [decode_part(part, os.path.join(entry_dir, f"{table}.{i}"))
+                     for i, part in enumerate(meta["parts"])]
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(meta_path):
+                print(f"Could not read cached table {table}: {e}")
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(entry_dir)
+        return tuple(parts) if meta["tuple"] else parts[0]
+
+    def store(self, entry_dir, table, result):
+        """Writes the result of the table to the cache entry."""
+        os.makedirs(entry_dir, exist_ok=True)
+        parts = list(result) if isinstance(result, tuple) else [result]
+        meta = {
+            "tuple": isinstance(result, tuple),
+            "parts": [encode_part(part, os.path.join(entry_dir, f"{table}.{i}")) for i, part in enumerate(parts)],
+        }
+
+        # The metadata is written last and atomically, so a table is only visible once all its parts are written.
+        meta_path = os.path.join(entry_dir, f"{table}.json")
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, meta_path)
+
+    def remove(self, path, tables=TABLES):
+        """Removes the cached results of the given tables for the XML file, so they are parsed again."""
+        if not self.enabled:
+            return
+        entry_dir = self.entry_dir(path)
+        if not os.path.isdir(entry_dir):
+            return
+        for table in tables:
+            # The metadata goes first, so a half removed table is never read back.
+            names = [f"{table}.json"] + [name for name in os.listdir(entry_dir) if name.startswith(f"{table}.")]
+            for name in dict.fromkeys(names):
+                try:
+                    os.remove(os.path.join(entry_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def evict(self, keep=None):
+        """Removes the least recently used entries until the cache fits in max_bytes. The keep entry is never removed."""
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            entries.append((os.stat(entry_dir).st_mtime, entry_dir, size))
+
+        total = sum(size for _, _, size in entries)
+        for _, entry_dir, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.samefile(entry_dir, keep):
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def get_tables(self, path, tables=TABLES, parse=parse_file):
+        """
+        Returns the results of the given tables for the XML file, the same as parse(path, tables) returns.
+        Cached tables are loaded from disk, only the missing ones are parsed and then added to the cache.
+        """
+        tables = tuple(tables)
+        if not self.enabled:
+            return parse(path, tables)
+
+        entry_dir = self.entry_dir(path)
+        results = {}
+        if not self.refresh:
+            for table in tables:
+                result = self.load(entry_dir, table)
+                if result is not None:
+                    results[table] = result
+
+        missing = tuple(table for table in tables if table not in results)
+        if missing:
+            parsed = parse(path, missing)
+            for table in missing:
+                self.store(entry_dir, table, parsed[table])
+                results[table] = parsed[table]
+            self.evict(keep=entry_dir)
+
+        return {table: results[table] for table in tables}
+
+
+def load_tables(path, tables=TABLES, cache_dir=DEFAULT_CACHE_DIR, use_cache=True, refresh=False,
+                max_bytes=DEFAULT_MAX_CACHE_BYTES, parse=parse_file):
+    """
+    Returns the parse_all results of the given tables for the DrugBank XML file, using the on-disk ParseCache.
+
+    Args:
+        use_cache: with use_cache=False the file is always parsed and the cache is left untouched.
+        refresh: with refresh=True the tables are parsed again and the cached ones are replaced.
+        parse: the function parsing the tables missing from the cache, e.g. an IncrementalParser.
+    """
+    tables = check_tables(tables)
+    cache = ParseCache(cache_dir, max_bytes=max_bytes, enabled=use_cache, refresh=refresh)
+    return cache.get_tables(path, tables, parse=parse)
@@ -0,0 +1,132 @@
+# drugbank/database.py
+import threading
+from collections import namedtuple
+
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_CACHE_BYTES, ParseCache
+from .interaction_graph import InteractionGraph
+from .name_index import NAME_TABLES, NameIndex
+from .parsers import TABLES, check_tables, parse_all
+from .xml_source import parse_xml
+
+DatabaseCacheInfo = namedtuple("DatabaseCacheInfo", ["hits", "misses", "passes", "tree_parses", "loaded"])
+
+
+def table_property(table, doc):
+    """Returns a property which computes the table on first access and then returns the memoized result."""
+    return property(lambda self: self.table(table), doc=doc)
+
+
+class DrugBankDatabase:
+    """
+    Lazy view of a DrugBank XML file, which parses a table only when it is first used and then keeps it.
+
+    The tables are exposed as properties (.drugs, .synonyms, .products, .product_table, .pathways, .targets,
+    .interactions, .genes, .approval), each holding the same result as the matching parse_<table> function.
+    The XML tree is parsed at most once and shared by all tables, and load() computes several tables
+    in a single pass over the drugs. With use_cache=True the tables also go through the on-disk ParseCache,
+    so a warm cache does not parse the XML at all.
+
+    Example:
+        database = DrugBankDatabase("data/drugbank_partial.xml")
+        targets, cellular_locations = database.targets  # parsed
+        targets, cellular_locations = database.targets  # memoized
+    """
+
+    def __init__(self, path, use_cache=True, refresh=False, cache_dir=DEFAULT_CACHE_DIR,
+                 max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+        self.path = path
+        self.parse_cache = ParseCache(cache_dir, max_bytes=max_cache_bytes, enabled=use_cache, refresh=refresh)
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.root = None
+        self.graph = None
+        self.names = None
+        self.hits = 0
+        self.misses = 0
+        self.passes = 0
+        self.tree_parses = 0
+
+    def get_root(self):
+        """Returns the root element of the XML file, parsing the file only the first time."""
+        with self.lock:
+            if self.root is None:
+                self.root = parse_xml(self.path)
+                self.tree_parses += 1
+            return self.root
+
+    def parse(self, path, tables):
+        """Computes the tables in a single pass over the drugs of the shared tree."""
+        self.passes += 1
+        return parse_all(self.get_root(), tables)
+
+    def load(self, *tables):
+        """
+        Makes sure the given tables (all of them by default) are loaded, computing the missing ones
+        together in a single pass. Returns a dict with the requested tables.
+        """
+        tables = check_tables(tables or TABLES)
+        with self.lock:
+            missing = tuple(table for table in tables if table not in self.tables)
+            self.hits += len(tables) - len(missing)
+            self.misses += len(missing)
+            if missing:
+                self.tables.update(self.parse_cache.get_tables(self.path, missing, parse=self.parse))
+            return {table: self.tables[table] for table in tables}
+
+    def table(self, table):
+        """Returns the result of a single table, computing it only the first time."""
+        return self.load(table)[table]
+
+    def invalidate(self, *tables):
+        """
+        Forgets the given tables (all of them and the XML tree by default), so they are parsed again on the next
+        access. Their entries in the parse cache are removed as well, otherwise they would just be read back from it.
+        """
+        with self.lock:
+            self.parse_cache.remove(self.path, check_tables(tables or TABLES))
+            if not tables:
+                self.tables.clear()
+                self.root = None
+                self.graph = None
+                self.names = None
+                return
+            for table in check_tables(tables):
+                self.tables.pop(table, None)
+            if "drug_interactions" in tables:
+                self.graph = None
+            if set(NAME_TABLES) & set(tables):
+                self.names = None
+
+    @property
+    def interaction_graph(self):
+        """The drug interaction network as an InteractionGraph, built from .interactions on first access."""
+        with self.lock:
+            if self.graph is None:
+                self.graph = InteractionGraph.from_frame(self.interactions)
+            return self.graph
+
+    @property
+    def name_index(self):
+        """Lookup of DrugBank IDs by drug, synonym and product names as a NameIndex, built on first access."""
+        with self.lock:
+            if self.names is None:
+                tables = self.load(*NAME_TABLES)
+                self.names = NameIndex.from_tables(tables["drugs"], tables["synonyms"], tables["product_table"])
+            return self.names
+
+    def cache_info(self):
+        """Returns the memoization hits and misses, the passes over the drugs, the tree parses and the loaded tables."""
+        with self.lock:
+            return DatabaseCacheInfo(self.hits, self.misses, self.passes, self.tree_parses, tuple(self.tables))
+
+    drugs = table_property("drugs", "Drug details, as returned by parse_drugs.")
+    synonyms = table_property("synonyms", "Drug synonyms, as returned by parse_synonyms.")
+    products = table_property("products", "Products per drug, as returned by parse_products.")
+    product_table = table_property("product_table",
+                                   "Long product table, as returned by parse_products(root, long_format=True).")
+    pathways = table_property("pathways", "(pathways, drug_pathway_counts), as returned by parse_pathways.")
+    targets = table_property("targets", "(targets, cellular_locations), as returned by parse_targets.")
+    interactions = table_property("drug_interactions", "Drug interactions, as returned by parse_drug_interactions.")
+    genes = table_property("genes", "Gene, interacting drug and product rows, as returned by parse_genes.")
+    approval = table_property("approval_status",
+                              "(status, approved_not_withdrawn, status_counts), as returned by parse_approval_status.")
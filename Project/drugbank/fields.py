@@ -0,0 +1,108 @@
+# drugbank/fields.py
+import re
+from functools import lru_cache
+
+# The default namespace URL.
+NS_URL = "{http://www.drugbank.ca}"
+
+# Child element names tested in predicates, e.g. "resource" in "external-identifier[resource='GenAtlas']".
+PREDICATE_TAG_PATTERN = re.compile(r"\[([A-Za-z_][\w.-]*)(?=\]|=|!=)")
+
+
+@lru_cache(maxsize=None)
+def qualify(path):
+    """
+    Puts every step of a slash separated path into the DrugBank namespace, e.g. "dosages/dosage/form",
+    including the child elements tested in predicates. The result is cached, so the namespaced path is built only once per distinct path.
+    """
+    steps = []
+    for step in path.split("/"):
+        if step in ("", ".", "..") or step.startswith("{"):
+            steps.append(step)
+        else:
+            steps.append(PREDICATE_TAG_PATTERN.sub(rf"[{NS_URL}\1", f"{NS_URL}{step}"))
+    return "/".join(steps)
+
+
+def index_children(element):
+    """
+    Maps the tag of each direct child of the element to the first child with that tag,
+    and returns the map with the set of tags more than one direct child has.
+    """
+    index = {}
+    repeated = set()
+    for child in element:
+        if child.tag in index:
+            repeated.add(child.tag)
+        else:
+            index[child.tag] = child
+    return index, repeated
+
+
+def child_index(element):
+    """Maps the tag of each direct child of the element to the first child with that tag."""
+    return index_children(element)[0]
+
+
+def text_of(element, default=None):
+    """Returns the text of the element, or default if there is no element."""
+    return element.text if element is not None else default
+
+
+class ElementFields:
+    """
+    Field extraction helper for a single XML element.
+
+    Indexes the direct children of the element once, so every further field lookup is a dictionary
+    access instead of a scan over the children, and every path is looked up only once instead of
+    once for the `is not None` test and once more for `.text`.
+    Paths are written without the namespace, e.g. fields.text("dosages/dosage/form").
+    The results are the same as of element.find/findall: a path whose first step matches several children
+    (e.g. "a/b" with two <a> children) is searched by ElementPath, since the index only keeps the first one.
+    """
+    __slots__ = ("element", "children", "repeated")
+
+    def __init__(self, element):
+        self.element = element
+        self.children, self.repeated = index_children(element)
+
+    def find(self, path):
+        """Returns the first element matching the path, or None."""
+        first, _, rest = path.partition("/")
+        if "[" in first or first in ("", "."):
+            # Predicates and descendant searches cannot use the child index.
+            return self.element.find(qualify(path))
+
+        tag = qualify(first)
+        if rest and tag in self.repeated:
+            return self.element.find(qualify(path))
+        child = self.children.get(tag)
+        if child is not None and rest:
+            return child.find(qualify(rest))
+        return child
+
+    def findall(self, path):
+        """Returns all elements matching the path."""
+        first, _, rest = path.partition("/")
+        if not rest or "[" in first or first in ("", "."):
+            return self.element.findall(qualify(path))
+
+        tag = qualify(first)
+        if tag in self.repeated:
+            return self.element.findall(qualify(path))
+        child = self.children.get(tag)
+        if child is None:
+            return []
+        return child.findall(qualify(rest))
+
+    def text(self, path, default=None):
+        """Returns the text of the first element matching the path, or default if there is none."""
+        return text_of(self.find(path), default)
+
+    def texts(self, path):
+        """Returns the texts of all elements matching the path."""
+        return [element.text for element in self.findall(path)]
+
+    def attr(self, name, default=None):
+        """Returns an attribute of the element itself."""
+        return self.element.get(name, default)
@@ -0,0 +1,340 @@
+# drugbank/fieldspec.py
+import re
+from collections import namedtuple
+
+from .fields import index_children, qualify
+
+# Multiplicities of a field: the first matching element, a list of all of them,
+# or their texts joined with "; " (None if there are none).
+ONE = "one"
+ALL = "all"
+JOINED = "joined"
+
+JOIN_SEPARATOR = "; "
+
+# Parent elements with at least this many children looked up use a child index instead of iterchildren.
+INDEX_LOOKUPS = 4
+
+# A child step with an attribute predicate, e.g. "drugbank-id[@primary='true']".
+ATTRIBUTE_STEP_PATTERN = re.compile(r"^([\w.-]+)\[@([\w.-]+)=(?:'([^']*)'|\"([^\"]*)\")\]$")
+
+
+class Field(namedtuple("Field", ["name", "path", "source", "multiplicity", "default", "required", "transform"])):
+    """
+    A single column of a table, read from the element found at a path relative to the drug (or row) element.
+
+    Args:
+        name: the column name.
+        path: the path of the element, without the namespace, e.g. "polypeptide/gene-name". "." is the element itself.
+        source: "text" for the text of the element, "@name" for one of its attributes, or a function of the element.
+        multiplicity: ONE, ALL or JOINED.
+        default: the value of a ONE field if the element (or attribute) is missing.
+        required: if the element is missing, the drug (or row) gives no row at all.
+        transform: a function applied to every value which is not None, e.g. str.strip.
+    """
+    __slots__ = ()
+
+    def __new__(cls, name, path, source="text", multiplicity=ONE, default=None, required=False, transform=None):
+        if multiplicity not in (ONE, ALL, JOINED):
+            raise ValueError(f"Unknown multiplicity of field {name}: {multiplicity}")
+        return super().__new__(cls, name, path, source, multiplicity, default, required, transform)
+
+
+class TableSpec(namedtuple("TableSpec", ["drug_fields", "rows", "row_fields", "unique"])):
+    """
+    The declarative form of a table extractor.
+
+    Args:
+        drug_fields: fields read once per drug element, which come first in every row.
+        rows: the path of the row elements relative to the drug, e.g. "targets/target". With None
+            every drug gives a single row of its drug_fields.
+        row_fields: fields read from each row element.
+        unique: drop the duplicate rows of a drug, keeping the first one.
+    """
+    __slots__ = ()
+
+    def __new__(cls, drug_fields, rows=None, row_fields=(), unique=False):
+        return super().__new__(cls, tuple(drug_fields), rows, tuple(row_fields), unique)
+
+    @property
+    def columns(self):
+        return [field.name for field in self.drug_fields + self.row_fields]
+
+
+def compile_value(field):
+    """Returns a function giving the value of a field from a single element, ignoring its multiplicity."""
+    source, default, transform = field.source, field.default, field.transform
+    if callable(source):
+        read = source
+    elif source == "text":
+        def read(element):
+            return element.text
+    elif source.startswith("@"):
+        name = source[1:]
+
+        def read(element):
+            return element.get(name, default)
+    else:
+        raise ValueError(f"Unknown source of field {field.name}: {source}")
+
+    if transform is None:
+        return read
+
+    def value(element):
+        result = read(element)
+        return transform(result) if result is not None else result
+    return value
+
+
+def join_texts(texts):
+    """The value of a JOINED field: the texts joined with "; ", leaving out empty elements, or None if there are none."""
+    return JOIN_SEPARATOR.join(text for text in texts if text is not None) if texts else None
+
+
+def is_plain_step(step):
+    """Whether a path step is a plain child name, which can be looked up without the ElementPath engine."""
+    return step not in ("", ".", "..") and not any(character in step for character in "/[*{")
+
+
+def child_step(step):
+    """
+    Returns (tag, attribute, value) if the step selects children by their tag (and an attribute value)
+    or is the parent step "..", so it can be looked up without the ElementPath engine, else None.
+    """
+    if step == ".." or is_plain_step(step):
+        return qualify(step), None, None
+    match = ATTRIBUTE_STEP_PATTERN.match(step)
+    if match:
+        tag, attribute, value, other_value = match.groups()
+        return qualify(tag), attribute, value if value is not None else other_value
+    return None
+
+
+def split_path(path):
+    """
+    Splits a field path into its steps. A descendant search ("a//b") is kept in a single step,
+    after the child steps in front of it.
+    """
+    if path in ("", "."):
+        return []
+    steps = path.split("/")
+    if "//" not in path:
+        return steps
+    leading = 0
+    while steps[leading] and child_step(steps[leading]):
+        leading += 1
+    rest = "/".join(steps[leading:])
+    return steps[:leading] + ["./" + rest if rest.startswith("/") else rest]
+
+
+class ExtractorWriter:
+    """
+    Writes the Python source of an extractor function out of field specs.
+
+    The source is straight-line code with a local variable per field: every element on the way to the fields is
+    looked up once and shared by all fields below it (e.g. the <polypeptide> of a target by its six fields),
+    plain child steps use lxml's iterchildren instead of the slower ElementPath engine, and there are no
+    per-field function calls or loops left at extraction time. When the element on the way repeats (e.g. two
+    <dosages>), the fields below it are searched by ElementPath, so the values are the same as of find/findall.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.namespace = {"index_children": index_children, "join_texts": join_texts}
+        self.names = 0
+
+    def name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def constant(self, value):
+        """Makes a value available to the generated code and returns its name."""
+        name = self.name("k")
+        self.namespace[name] = value
+        return name
+
+    def write(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def write_value(self, indent, target, element, field):
+        """Writes the assignment of the value of a ONE field read from an existing element."""
+        source = field.source
+        if callable(source):
+            expression = f"{self.constant(source)}({element})"
+        elif source == "text":
+            expression = f"{element}.text"
+        elif source.startswith("@"):
+            expression = f"{element}.get({source[1:]!r}, {self.constant(field.default)})"
+        else:
+            raise ValueError(f"Unknown source of field {field.name}: {source}")
+        self.write(indent, f"{target} = {expression}")
+        if field.transform is not None:
+            self.write(indent, f"if {target} is not None:")
+            self.write(indent + 1, f"{target} = {self.constant(field.transform)}({target})")
+
+    def write_many(self, indent, target, elements, field):
+        """Writes the assignment of the value of an ALL or JOINED field read from an iterable of elements."""
+        if field.source == "text" and field.transform is None:
+            values = f"[element.text for element in {elements}]"
+        else:
+            read = self.constant(compile_value(field))
+            values = f"[{read}(element) for element in {elements}]"
+        self.write(indent, f"{target} = {values}" if field.multiplicity == ALL else f"{target} = join_texts({values})")
+
+    def write_missing(self, indent, slot, field, on_missing):
+        """Writes what happens when the element of a field is missing."""
+        if field.required:
+            self.write(indent, on_missing)
+        elif field.multiplicity == ALL:
+            self.write(indent, f"v{slot} = []")
+        elif field.multiplicity == JOINED:
+            self.write(indent, f"v{slot} = None")
+        else:
+            self.write(indent, f"v{slot} = {self.constant(field.default)}")
+
+    def write_node(self, indent, element, items, on_missing):
+        """
+        Writes the code assigning the fields below an element, given as (slot, remaining path steps, field).
+        The fields are grouped by the first step of their paths, so each child element is looked up only once.
+        on_missing is the statement run when a required element is missing.
+        """
+        groups = {}
+        for slot, steps, field in items:
+            if not steps:
+                self.write_value(indent, f"v{slot}", element, field)
+            elif len(steps) == 1 and field.multiplicity != ONE:
+                if is_plain_step(steps[0]):
+                    elements = f"{element}.iterchildren({self.constant(qualify(steps[0]))})"
+                else:
+                    elements = f"{element}.iterfind({self.constant(qualify(steps[0]))})"
+                self.write_many(indent, f"v{slot}", elements, field)
+            elif child_step(steps[0]):
+                groups.setdefault(child_step(steps[0]), []).append((slot, steps, field))
+            else:
+                found = self.name("e")
+                self.write(indent, f"{found} = {element}.find({self.constant(qualify('/'.join(steps)))})")
+                self.write(indent, f"if {found} is None:")
+                self.write_missing(indent + 1, slot, field, on_missing)
+                self.write(indent, "else:")
+                self.write_value(indent + 1, f"v{slot}", found, field)
+
+        # Indexing the children costs a pass over all of them, which pays off only for many lookups.
+        index = None
+        if sum(tag != ".." and attribute is None for tag, attribute, _ in groups) >= INDEX_LOOKUPS:
+            index = self.name("index")
+            repeated = self.name("repeated")
+            self.write(indent, f"{index}, {repeated} = index_children({element})")
+        for (tag, attribute, value), group in groups.items():
+            child = self.name("e")
+            # A field below the child (e.g. "dosages/dosage/form") is searched in every child with the tag, like
+            # ElementPath does, so a second such child is checked for.
+            deep = tag != ".." and any(len(steps) > 1 for _, steps, _ in group)
+            children = f"{element}.iterchildren({self.constant(tag)})"
+            if deep and not index:
+                iterator = self.name("children")
+                self.write(indent, f"{iterator} = {children}")
+                children = iterator
+            if attribute is not None:
+                self.write(indent, f"for {child} in {children}:")
+                self.write(indent + 1, f"if {child}.get({attribute!r}) == {value!r}:")
+                self.write(indent + 2, "break")
+                self.write(indent, "else:")
+                self.write(indent + 1, f"{child} = None")
+                more = f"any(other.get({attribute!r}) == {value!r} for other in {children})"
+            elif tag == "..":
+                self.write(indent, f"{child} = {element}.getparent()")
+            elif index:
+                self.write(indent, f"{child} = {index}.get({self.constant(tag)})")
+                more = f"{self.constant(tag)} in {repeated}"
+            else:
+                self.write(indent, f"{child} = next({children}, None)")
+                more = f"next({children}, None) is not None"
+            self.write(indent, f"if {child} is None:")
+            for slot, _, field in group:
+                self.write_missing(indent + 1, slot, field, on_missing)
+                if field.required:
+                    break
+            self.write(indent, "else:")
+            below = [(slot, steps[1:], field) for slot, steps, field in group]
+            if not deep:
+                self.write_node(indent + 1, child, below, on_missing)
+                continue
+            self.write(indent + 1, f"if {more}:")
+            self.write_node(indent + 2, child, [item for item in below if not item[1]], on_missing)
+            for slot, steps, field in group:
+                if len(steps) > 1:
+                    self.write_search(indent + 2, slot, element, steps, field, on_missing)
+            self.write(indent + 1, "else:")
+            self.write_node(indent + 2, child, below, on_missing)
+
+    def write_search(self, indent, slot, element, steps, field, on_missing):
+        """Writes the assignment of a field searched by ElementPath, for paths through repeated children."""
+        path = self.constant(qualify("/".join(steps)))
+        if field.multiplicity != ONE:
+            if field.required:
+                self.write(indent, f"if {element}.find({self.constant(qualify('/'.join(steps[:-1])))}) is None:")
+                self.write(indent + 1, on_missing)
+            self.write_many(indent, f"v{slot}", f"{element}.iterfind({path})", field)
+            return
+        found = self.name("e")
+        self.write(indent, f"{found} = {element}.find({path})")
+        self.write(indent, f"if {found} is None:")
+        self.write_missing(indent + 1, slot, field, on_missing)
+        self.write(indent, "else:")
+        self.write_value(indent + 1, f"v{slot}", found, field)
+
+    def build(self, name):
+        """Compiles the written function and returns it, with its source kept in the source attribute."""
+        source = "\n".join(self.lines)
+        exec(compile(source, f"<fieldspec {name}>", "exec"), self.namespace)
+        function = self.namespace[name]
+        function.source = source
+        return function
+
+
+def field_items(fields, first_slot=0):
+    """Numbers the fields with the slots of their variables and splits their paths."""
+    return [(slot, split_path(field.path), field) for slot, field in enumerate(fields, first_slot)]
+
+
+def row_tuple(slots):
+    """The source of a tuple of the field variables in the given slots."""
+    names = [f"v{slot}" for slot in slots]
+    return f"({names[0]},)" if len(names) == 1 else f"({', '.join(names)})"
+
+
+def compile_fields(fields):
+    """
+    Compiles a list of fields into a single function, which returns the tuple of their values for an element,
+    or None if a required element is missing.
+    """
+    fields = tuple(fields)
+    writer = ExtractorWriter()
+    writer.write(0, "def extract_fields(element):")
+    writer.write_node(1, "element", field_items(fields), "return None")
+    writer.write(1, f"return {row_tuple(range(len(fields)))}")
+    return writer.build("extract_fields")
+
+
+def compile_table(spec):
+    """
+    Compiles a TableSpec into an extractor, which turns a single <drug> element into the list of its rows.
+
+    The extractor only uses the given element and its descendants, so it works the same on the drugs of a parsed
+    tree and on the drugs yielded by iterparse.
+    """
+    writer = ExtractorWriter()
+    drug_count = len(spec.drug_fields)
+    writer.write(0, "def extract_rows(drug):")
+    writer.write_node(1, "drug", field_items(spec.drug_fields), "return []")
+
+    if spec.rows is None:
+        writer.write(1, f"return [{row_tuple(range(drug_count))}]")
+        return writer.build("extract_rows")
+
+    writer.write(1, "rows = []")
+    writer.write(1, f"for row in drug.iterfind({writer.constant(qualify(spec.rows))}):")
+    writer.write_node(2, "row", field_items(spec.row_fields, drug_count), "continue")
+    writer.write(2, f"rows.append({row_tuple(range(drug_count + len(spec.row_fields)))})")
+    writer.write(1, "return list(dict.fromkeys(rows))" if spec.unique else "return rows")
+    return writer.build("extract_rows")
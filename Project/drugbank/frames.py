@@ -0,0 +1,83 @@
+# drugbank/frames.py
+import sys
+import pandas as pd
+
+
+class ColumnBuffer:
+    """
+    Collects the rows of a table column by column.
+
+    Every value goes straight into the list of its column, so no list of per-row dicts has to be kept
+    until the dataframe is built, and the dataframe is built from ready columns with explicit dtypes.
+    Iterating over the buffer yields the rows as tuples.
+    """
+    __slots__ = ("columns", "data")
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.data = [[] for _ in self.columns]
+
+    def append(self, row):
+        for column, value in zip(self.data, row):
+            column.append(value)
+
+    def extend(self, rows):
+        if isinstance(rows, ColumnBuffer):
+            for column, values in zip(self.data, rows.data):
+                column.extend(values)
+            return
+        if isinstance(rows, list):
+            # Transposing the rows with zip is much faster than appending them one by one.
+            for column, values in zip(self.data, zip(*rows)):
+                column.extend(values)
+            return
+        for row in rows:
+            self.append(row)
+
+    def column(self, name):
+        return self.data[self.columns.index(name)]
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def __iter__(self):
+        return zip(*self.data)
+
+    def to_frame(self, dtypes=None):
+        """Builds a dataframe out of the columns, using the given dtypes and letting pandas infer the others."""
+        dtypes = dtypes or {}
+        return pd.DataFrame({
+            name: pd.Series(values, dtype=dtypes.get(name), name=name)
+            for name, values in zip(self.columns, self.data)
+        })
+
+
+def to_buffer(rows, columns):
+    """Returns the rows as a ColumnBuffer, copying them into one unless they already are."""
+    if isinstance(rows, ColumnBuffer):
+        return rows
+    buffer = ColumnBuffer(columns)
+    buffer.extend(rows)
+    return buffer
+
+
+def build_frame(rows, columns, dtypes=None):
+    """Builds a dataframe with the given columns and dtypes out of a ColumnBuffer or a list of rows."""
+    return to_buffer(rows, columns).to_frame(dtypes)
+
+
+def concat_frames(frames):
+    """
+    Concatenates dataframes built by build_frame. The categories of the categorical columns are derived again
+    from the joined values, as build_frame would, so they neither get mixed up nor keep values of no row.
+    """
+    df = pd.concat(frames)
+    for name, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[name] = pd.Series(df[name].astype(object).tolist(), index=df.index, dtype="category", name=name)
+    return df
+
+
+def intern_text(value):
+    """Interns a repeated string, so all equal values share one object. None is kept as it is."""
+    return sys.intern(value) if isinstance(value, str) else value
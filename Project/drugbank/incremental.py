@@ -0,0 +1,355 @@
+# drugbank/incremental.py
+import hashlib
+import mmap
+import os
+import pickle
+from collections import defaultdict, namedtuple
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+from .cache import DEFAULT_CACHE_DIR, ParseCache
+from .frames import ColumnBuffer, build_frame, concat_frames
+from .parallel import scan_drug_offsets, read_root_envelope
+from .parsers import (
+    APPROVAL_STATUSES,
+    NS_URL,
+    PARSER_VERSION,
+    PATHWAY_COLUMNS,
+    TABLES,
+    TABLE_PARSERS,
+    TARGET_COLUMNS,
+    TARGET_DTYPES,
+    approval_flags,
+    build_gene_tables,
+    check_tables,
+    explode_gene_tables,
+    iter_drugs,
+)
+from .xml_source import detect_compression, iterparse_xml
+
+# The state is kept as a file in the cache directory, which the eviction of ParseCache (removing only
+# the directories of cache entries) leaves alone.
+STATE_FILE = "incremental.pickle"
+
+# The path of the primary DrugBank ID under <drug>.
+PRIMARY_ID_PATH = f"{NS_URL}drugbank-id[@primary='true']"
+
+IncrementalStats = namedtuple("IncrementalStats", ["drugs", "reused", "extracted", "dropped"])
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).digest()
+
+
+def canonical_fingerprint(drug):
+    """
+    Fingerprints a <drug> element by its exclusive canonical form (C14N), so differences in attribute order,
+    quoting, namespace prefixes or the root element do not make an unchanged drug look changed.
+    """
+    return fingerprint(etree.tostring(drug, method="c14n", exclusive=True))
+
+
+def extract_drug(drug, tables):
+    """Runs the extractor of every given table on a single top-level <drug> element."""
+    return {table: list(TABLE_PARSERS[table][0](drug)) for table in tables}
+
+
+def unique_ids(drug_ids):
+    """Tells if every drug has a primary DrugBank ID of its own, so its rows can be found by the ID."""
+    drug_ids = list(drug_ids)
+    return None not in drug_ids and len(set(drug_ids)) == len(drug_ids)
+
+
+# Every table is kept in the cache entry as a part, which the rows of the changed drugs are patched into.
+# Every frame of a part has the DrugBank ID of the drug its rows come from as its named index or as its
+# DrugBank_ID column. The parts of the tables below are their results; the other tables keep theirs under
+# the name "<table>.incremental".
+RESULT_PARTS = ("drugs", "synonyms", "products", "product_table", "drug_interactions")
+
+
+def part_name(table):
+    return table if table in RESULT_PARTS else f"{table}.incremental"
+
+
+def table_rows(extracted, table):
+    """The rows of the table extracted from the drugs, in document order."""
+    rows = ColumnBuffer(TABLE_PARSERS[table][2])
+    for _, drug_rows in extracted:
+        rows.extend(drug_rows[table])
+    return rows
+
+
+def targets_part(extracted):
+    """The targets in document order, which build_targets sorts by DrugBank ID."""
+    return build_frame(table_rows(extracted, "targets"), TARGET_COLUMNS, TARGET_DTYPES)
+
+
+def pathways_part(extracted):
+    """The pathway edges indexed by the ID of the drug they are listed under, which need not be their DrugBank_ID."""
+    rows = ColumnBuffer(["Listed_Under", *PATHWAY_COLUMNS])
+    for drug_id, drug_rows in extracted:
+        rows.extend([(drug_id, *row) for row in drug_rows["pathways"]])
+    return rows.to_frame(dict.fromkeys(rows.columns, "string")).set_index("Listed_Under")
+
+
+def approval_status_part(extracted):
+    """The approval status flags of every drug (see parsers.approval_flags)."""
+    rows = ColumnBuffer(["DrugBank_ID", *APPROVAL_STATUSES])
+    for drug_id, drug_rows in extracted:
+        for groups, in drug_rows["approval_status"]:
+            status = approval_flags(groups)
+            rows.append((drug_id, *(name in status for name in APPROVAL_STATUSES)))
+    return rows.to_frame({"DrugBank_ID": "string", **dict.fromkeys(APPROVAL_STATUSES, "bool")})
+
+
+def targets_result(part):
+    """The same as build_targets, out of the targets in document order."""
+    df = part.sort_values(by=["DrugBank_ID"], kind="stable")
+    counts = df["Cellular_Location"].astype(object).value_counts(sort=False, dropna=False)
+    cellular_locations = defaultdict(int)
+    for cellular_location, count in counts.items():
+        cellular_locations[None if pd.isna(cellular_location) else cellular_location] = int(count)
+    return df, cellular_locations
+
+
+def pathways_result(part):
+    """The same as build_pathways, out of the pathway edges."""
+    df = part.reset_index(drop=True).drop_duplicates(ignore_index=True)
+    drug_pathway_counts = defaultdict(int)
+    for drug_id, count in df["DrugBank_ID"].value_counts(sort=False).items():
+        drug_pathway_counts[drug_id] = int(count)
+    return df, drug_pathway_counts
+
+
+def approval_status_result(part):
+    """The same as build_approval_status, out of the approval status flags."""
+    flags = part[list(APPROVAL_STATUSES)]
+    counts = flags.sum()
+    first = dict(zip(APPROVAL_STATUSES, flags.to_numpy().argmax(axis=0)))
+    # build_approval_status counts the statuses in the order they first appear in.
+    statuses = sorted((name for name in APPROVAL_STATUSES if counts[name]),
+                      key=lambda name: (first[name], APPROVAL_STATUSES.index(name)))
+
+    status_counts = defaultdict(int)
+    for name in statuses:
+        status_counts[name] = int(counts[name])
+    approved_not_withdrawn = int((part["Approved"] & ~part["Withdrawn"]).sum())
+    df = pd.DataFrame(list(status_counts.items()), columns=["Status", "Count"])
+    return df, approved_not_withdrawn, status_counts
+
+
+def result_table(table):
+    return lambda extracted: TABLE_PARSERS[table][1](table_rows(extracted, table))
+
+
+# Per-table (part builder, result) pairs. The part builder turns the rows extracted from the changed drugs into
+# a part, the result turns the patched part into the same result as parse_<table>.
+TABLE_PARTS = {
+    **{table: (result_table(table), lambda part: part) for table in RESULT_PARTS},
+    "pathways": (pathways_part, pathways_result),
+    "targets": (targets_part, targets_result),
+    "approval_status": (approval_status_part, approval_status_result),
+    "genes": (lambda extracted: build_gene_tables(table_rows(extracted, "genes")), explode_gene_tables),
+}
+
+
+def owners(frame):
+    """The DrugBank IDs of the drugs the rows of a part frame come from."""
+    return frame.index if frame.index.name is not None else frame["DrugBank_ID"]
+
+
+def patch_frame(frame, new_frame, dropped, positions):
+    """
+    Drops the rows of the dropped drugs from the frame, appends the rows of the new frame and puts all of them
+    in the document order of their drugs, given as the positions of their DrugBank IDs.
+    """
+    frame = concat_frames([frame[~owners(frame).isin(dropped)], new_frame])
+    frame = frame.iloc[np.argsort(owners(frame).map(positions).to_numpy(), kind="stable")]
+    return frame if frame.index.name is not None else frame.reset_index(drop=True)
+
+
+def patch_part(part, new_part, dropped, positions):
+    """Patches every frame of a part (see patch_frame)."""
+    if isinstance(new_part, tuple):
+        return type(new_part)(*(patch_frame(frame, new_frame, dropped, positions)
+                                for frame, new_frame in zip(part, new_part)))
+    return patch_frame(part, new_part, dropped, positions)
+
+
+class IncrementalParser:
+    """
+    Parses DrugBank releases incrementally, running the extractors only for the drugs which changed
+    since the previously parsed release.
+
+    Every top-level <drug> element is fingerprinted by its canonicalized bytes, and the fingerprints with the
+    DrugBank IDs of the drugs are kept in a state file next to the cached tables. Every table is stored in the
+    ParseCache entry of the parsed release as a part (see TABLE_PARTS), mostly the table itself. When the next
+    release is parsed, only added or changed drugs are extracted; the parts of the previous release are loaded,
+    the rows of the removed and changed drugs are dropped from them, the rows of the extracted drugs are
+    appended and the parts are stored in the entry of the new release. Unchanged drugs are neither extracted
+    nor turned into rows again. The result is the same as parse_all on the new release.
+
+    For plain XML files the drugs are located by scanning the bytes (see parallel.py) and first compared by
+    the hash of their raw bytes, so unchanged drugs are not even parsed. Archives are read with iterparse
+    and compared by their canonical fingerprint.
+
+    The rows of a drug are found by its primary DrugBank ID, so releases with drugs without one or with
+    repeated IDs are parsed in full, as are tables whose parts of the previous release are not cached.
+
+    The instance can be passed as the parse function of ParseCache.get_tables.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache = ParseCache(cache_dir)
+        self.state_path = os.path.join(cache_dir, STATE_FILE)
+        self.last_stats = None
+
+    def load_state(self):
+        """Returns the stored state, or an empty one if there is none or it was made by other parsers."""
+        empty = {"version": PARSER_VERSION, "namespaces": None, "raw": {}, "drugs": {}, "entry": None}
+        try:
+            with open(self.state_path, "rb") as file:
+                state = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return empty
+        if state.get("version") != PARSER_VERSION:
+            return empty
+        return state
+
+    def save_state(self, state):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.state_path)
+
+    def load_parts(self, state, tables):
+        """Returns the parts of the tables stored for the previously parsed release, or None if any is missing."""
+        if state["entry"] is None or not unique_ids(state["drugs"].values()):
+            return None
+        entry_dir = os.path.join(self.cache.cache_dir, state["entry"])
+        parts = {}
+        for table in tables:
+            parts[table] = self.cache.load(entry_dir, part_name(table))
+            if parts[table] is None:
+                return None
+        return parts
+
+    def scan_plain(self, path, state, new_state, tables):
+        """
+        Fingerprints the drugs of a plain XML file, extracting only the changed ones.
+        Returns the fingerprints of all drugs and the (DrugBank ID, rows) pairs of the extracted ones.
+        """
+        offsets = scan_drug_offsets(path)
+        if not offsets:
+            return [], []
+
+        prefix, suffix = read_root_envelope(path, offsets[0][0])
+        # The raw bytes of a drug only mean the same thing under the same namespace declarations.
+        namespaces = sorted(etree.fromstring(prefix + suffix).nsmap.items(), key=str)
+        raw_index = state["raw"] if state["namespaces"] == namespaces else {}
+        new_state["namespaces"] = namespaces
+
+        order = []
+        unknown = []
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in offsets:
+                raw = fingerprint(data[start:end])
+                canonical = raw_index.get(raw)
+                if canonical is not None and canonical in state["drugs"]:
+                    new_state["raw"][raw] = canonical
+                    new_state["drugs"][canonical] = state["drugs"][canonical]
+                    order.append(canonical)
+                else:
+                    order.append(None)
+                    unknown.append((len(order) - 1, raw, data[start:end]))
+
+        # The drugs whose raw bytes changed are parsed together, and only extracted if their content changed.
+        extracted = []
+        if unknown:
+            root = etree.fromstring(prefix + b"".join(drug for _, _, drug in unknown) + suffix,
+                                    parser=etree.XMLParser(huge_tree=True))
+            for (position, raw, _), drug in zip(unknown, iter_drugs(root)):
+                canonical = canonical_fingerprint(drug)
+                if canonical in state["drugs"]:
+                    new_state["drugs"][canonical] = state["drugs"][canonical]
+                else:
+                    new_state["drugs"][canonical] = drug.findtext(PRIMARY_ID_PATH)
+                    extracted.append((position, new_state["drugs"][canonical], extract_drug(drug, tables)))
+                new_state["raw"][raw] = canonical
+                order[position] = canonical
+        # The drugs were parsed in document order, so the extracted ones are in it as well.
+        return order, [(drug_id, rows) for _, drug_id, rows in extracted]
+
+    def scan_stream(self, path, state, new_state, tables):
+        """Fingerprints the drugs of an archive while streaming it, extracting only the changed ones."""
+        order = []
+        extracted = []
+        for _, drug in iterparse_xml(path, events=("end",), tag=f"{NS_URL}drug", huge_tree=True):
+            parent = drug.getparent()
+            # Skip the <drug> stubs nested in pathways, they are handled together with their drug.
+            if parent is None or parent.getparent() is not None:
+                continue
+
+            canonical = canonical_fingerprint(drug)
+            if canonical in state["drugs"]:
+                new_state["drugs"][canonical] = state["drugs"][canonical]
+            else:
+                new_state["drugs"][canonical] = drug.findtext(PRIMARY_ID_PATH)
+                extracted.append((new_state["drugs"][canonical], extract_drug(drug, tables)))
+            order.append(canonical)
+
+            # Clear element from memory.
+            drug.clear()
+            while drug.getprevious() is not None:
+                del parent[0]
+        return order, extracted
+
+    def parse(self, path, tables=TABLES):
+        """
+        Parses the DrugBank XML file, reusing the tables of the previously parsed release for the drugs which
+        did not change since, and returns the parse_all results of the given tables. The statistics of the update
+        are kept in last_stats as (drugs, reused, extracted, dropped).
+        """
+        tables = check_tables(tables)
+        state = self.load_state()
+        entry_dir = self.cache.entry_dir(path)
+        scan = self.scan_stream if detect_compression(path) else self.scan_plain
+
+        parts = self.load_parts(state, tables)
+        while True:
+            # Without the parts of the previous release every drug has to be extracted.
+            known = state if parts is not None else {"namespaces": None, "raw": {}, "drugs": {}}
+            new_state = {"version": PARSER_VERSION, "namespaces": state["namespaces"], "raw": {}, "drugs": {},
+                         "entry": os.path.basename(entry_dir)}
+            order, extracted = scan(path, known, new_state, tables)
+            drug_ids = [new_state["drugs"][canonical] for canonical in order]
+            if parts is None or unique_ids(drug_ids):
+                break
+            parts = None
+
+        # The rows of the removed drugs and the old rows of the changed ones are dropped.
+        removed = state["drugs"].keys() - new_state["drugs"].keys()
+        dropped = [state["drugs"][canonical] for canonical in removed] + [drug_id for drug_id, _ in extracted]
+        positions = {drug_id: position for position, drug_id in enumerate(drug_ids)}
+
+        results = {}
+        for table in tables:
+            build_part, result = TABLE_PARTS[table]
+            part = build_part(extracted)
+            if parts is not None:
+                part = patch_part(parts[table], part, dropped, positions)
+            self.cache.store(entry_dir, part_name(table), part)
+            results[table] = result(part)
+        self.cache.evict(keep=entry_dir)
+
+        if new_state != state:
+            self.save_state(new_state)
+        self.last_stats = IncrementalStats(len(order), len(order) - len(extracted), len(extracted), len(removed))
+        return results
+
+    __call__ = parse
@@ -0,0 +1,214 @@
+# drugbank/interaction_graph.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import DEFAULT_CACHE_DIR
+
+DEFAULT_GRAPH_DIR = os.path.join(DEFAULT_CACHE_DIR, "interaction_graph")
+
+# The arrays of a saved graph, each stored as <name>.npy in the graph directory.
+GRAPH_ARRAYS = ("ids", "indptr", "indices", "description_index", "description_offsets", "description_data",
+                "name_offsets", "name_data")
+
+
+def pack_strings(strings):
+    """
+    Packs strings into two plain arrays, which unlike an array of Python objects can be memory-mapped:
+    the UTF-8 bytes of all strings and the offset at which each of them starts (with the total length at the end).
+    Missing strings are packed as empty ones.
+    """
+    encoded = [string.encode("utf-8") if isinstance(string, str) else b"" for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+def unpack_string(offsets, data, position):
+    """Returns a single string packed by pack_strings, or None if it is empty."""
+    start, end = offsets[position], offsets[position + 1]
+    return data[start:end].tobytes().decode("utf-8") if end > start else None
+
+
+class InteractionGraph:
+    """
+    The drug-drug interaction network as a CSR (compressed sparse row) adjacency.
+
+    DrugBank IDs are factorized into int32 node numbers (the position of the ID in the sorted ids array).
+    The interactions of node i are indices[indptr[i]:indptr[i + 1]], so the neighbours of a drug are found in
+    O(degree) after a binary search for its ID, without scanning the whole interactions dataframe.
+    Each edge also points into the packed table of distinct descriptions (description_index, -1 if it has none).
+
+    The graph is saved as a directory of .npy files, which load() memory-maps, so several processes
+    reading the same graph share its pages instead of each holding a copy.
+
+    Example:
+        graph = InteractionGraph.from_frame(parse_drug_interactions(root))
+        graph.neighbours("DB00001")
+        graph.k_hop("DB00001", 2)
+    """
+
+    def __init__(self, ids, indptr, indices, description_index, description_offsets, description_data,
+                 name_offsets, name_data):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.description_index = description_index
+        self.description_offsets = description_offsets
+        self.description_data = description_data
+        self.name_offsets = name_offsets
+        self.name_data = name_data
+
+    @classmethod
+    def from_frame(cls, df, symmetric=False):
+        """
+        Builds the graph out of the dataframe returned by parse_drug_interactions. The edges of each drug keep
+        the order of the dataframe. With symmetric=True every interaction is also added in the other direction,
+        unless it is already listed that way.
+        """
+        df = df.dropna(subset=["DrugBank_ID", "Interacting_Drug_ID"])
+        sources = df["DrugBank_ID"].to_numpy(dtype=object)
+        targets = df["Interacting_Drug_ID"].to_numpy(dtype=object)
+        descriptions = df["Description"].astype(object).where(df["Description"].notna(), None).to_numpy()
+
+        if symmetric:
+            listed = set(zip(sources.tolist(), targets.tolist()))
+            reverse = np.array([(target, source) not in listed for source, target in zip(sources, targets)],
+                               dtype=bool)
+            sources, targets = np.concatenate([sources, targets[reverse]]), np.concatenate([targets, sources[reverse]])
+            descriptions = np.concatenate([descriptions, descriptions[reverse]])
+
+        # Factorize the IDs of both ends into node numbers, in the order of the sorted IDs.
+        ids, nodes = np.unique(np.concatenate([sources, targets]).astype(str), return_inverse=True)
+        nodes = nodes.astype(np.int32)
+        source_nodes, target_nodes = nodes[:len(sources)], nodes[len(sources):]
+
+        order = np.argsort(source_nodes, kind="stable")
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source_nodes, minlength=len(ids)), out=indptr[1:])
+
+        # Every distinct description is stored once, the edges only keep its number.
+        present = np.array([description is not None for description in descriptions], dtype=bool)
+        distinct, numbers = np.unique(descriptions[present], return_inverse=True)
+        description_index = np.full(len(descriptions), -1, dtype=np.int32)
+        description_index[present] = numbers
+
+        # The name of a drug is the first one it is listed with, as a drug or as an interacting drug.
+        names = pd.concat([
+            pd.Series(df["Drug"].astype(object).to_numpy(), index=df["DrugBank_ID"].to_numpy(dtype=object)),
+            pd.Series(df["Interacting_Drug"].astype(object).to_numpy(),
+                      index=df["Interacting_Drug_ID"].to_numpy(dtype=object)),
+        ]).dropna()
+        names = names[~names.index.duplicated()].reindex(ids)
+
+        return cls(ids, indptr, target_nodes[order], description_index[order],
+                   *pack_strings(distinct), *pack_strings(names.tolist()))
+
+    @classmethod
+    def load(cls, directory=DEFAULT_GRAPH_DIR, mmap=True):
+        """Loads a graph saved by save(), memory-mapping its arrays unless mmap=False."""
+        mmap_mode = "r" if mmap else None
+        return cls(*(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in GRAPH_ARRAYS))
+
+    def save(self, directory=DEFAULT_GRAPH_DIR):
+        """Saves the arrays of the graph as .npy files, each written to a temporary file first."""
+        os.makedirs(directory, exist_ok=True)
+        for name in GRAPH_ARRAYS:
+            path = os.path.join(directory, f"{name}.npy")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                np.save(file, np.asarray(getattr(self, name)))
+            os.replace(tmp_path, path)
+        return directory
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def node(self, drug_id):
+        """Returns the node number of a DrugBank ID, or None if the drug is not in the graph."""
+        position = int(np.searchsorted(self.ids, drug_id))
+        if position < len(self.ids) and self.ids[position] == drug_id:
+            return position
+        return None
+
+    def name(self, drug_id):
+        """Returns the name of a drug, or None if it is unknown."""
+        node = self.node(drug_id)
+        return unpack_string(self.name_offsets, self.name_data, node) if node is not None else None
+
+    def edges(self, drug_id):
+        """Returns the (start, end) range of the edges of a drug in indices, empty for unknown drugs."""
+        node = self.node(drug_id)
+        if node is None:
+            return 0, 0
+        return int(self.indptr[node]), int(self.indptr[node + 1])
+
+    def neighbours(self, drug_id):
+        """Returns the DrugBank IDs of the drugs a drug interacts with."""
+        start, end = self.edges(drug_id)
+        return self.ids[self.indices[start:end]].tolist()
+
+    def interactions(self, drug_id):
+        """Returns a (Interacting_Drug_ID, Interacting_Drug, Description) tuple for each interaction of a drug."""
+        start, end = self.edges(drug_id)
+        result = []
+        for node, description in zip(self.indices[start:end].tolist(), self.description_index[start:end].tolist()):
+            result.append((str(self.ids[node]), unpack_string(self.name_offsets, self.name_data, node),
+                           unpack_string(self.description_offsets, self.description_data, description)
+                           if description >= 0 else None))
+        return result
+
+    def degree(self, drug_id):
+        start, end = self.edges(drug_id)
+        return end - start
+
+    def degrees(self):
+        """Returns the number of interactions of every drug, as a series indexed by DrugBank ID."""
+        return pd.Series(np.diff(self.indptr), index=pd.Index(self.ids, name="DrugBank_ID"), name="Degree")
+
+    def degree_distribution(self):
+        """Returns the number of drugs with each number of interactions, as a series indexed by the degree."""
+        counts = np.bincount(np.diff(self.indptr))
+        degrees = np.flatnonzero(counts)
+        return pd.Series(counts[degrees], index=pd.Index(degrees, name="Degree"), name="Drugs")
+
+    def expand(self, nodes):
+        """Returns the neighbours of all the given nodes in one array, gathered without a Python loop."""
+        starts = self.indptr[nodes]
+        lengths = self.indptr[nodes + 1] - starts
+        # The position of every edge: the start of its node's range plus its offset within the range.
+        ends = np.cumsum(lengths)
+        positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + lengths, lengths)
+        return self.indices[positions]
+
+    def k_hop(self, drug_id, k=1):
+        """
+        Finds the drugs reachable from a drug in at most k interactions, by a breadth-first search
+        which expands a whole level at a time.
+
+        Returns: a dict mapping the DrugBank ID of each reached drug (without the drug itself) to its distance,
+        ordered by distance.
+        """
+        start = self.node(drug_id)
+        if start is None:
+            return {}
+
+        distances = np.full(len(self.ids), -1, dtype=np.int32)
+        distances[start] = 0
+        frontier = np.array([start], dtype=np.int64)
+        for hop in range(1, k + 1):
+            reached = self.expand(frontier)
+            frontier = np.unique(reached[distances[reached] < 0])
+            if not len(frontier):
+                break
+            distances[frontier] = hop
+
+        found = np.flatnonzero(distances > 0)
+        found = found[np.argsort(distances[found], kind="stable")]
+        return dict(zip(self.ids[found].tolist(), distances[found].tolist()))
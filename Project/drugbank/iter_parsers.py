@@ -1,205 +1,236 @@
 # drugbank/iter_parsers.py
+import pandas as pd
+
+from .fields import ElementFields, qualify
+from .parsers import (
+    APPROVAL_STATUS_COLUMNS,
+    DRUG_COLUMNS,
+    DRUG_INTERACTION_COLUMNS,
+    PATHWAY_COLUMNS,
+    PRODUCT_COLUMNS,
+    PRODUCT_TABLE_COLUMNS,
+    SYNONYM_COLUMNS,
+    TARGET_COLUMNS,
+    approval_flags,
+    extract_approval_status_rows,
+    extract_drug_interaction_rows,
+    extract_drug_rows,
+    extract_pathway_rows,
+    extract_product_rows,
+    extract_product_table_rows,
+    extract_synonym_rows,
+    extract_target_rows,
+)
+from .xml_source import iterparse_xml
 
 # The default namespace URL.
 NS_URL = "{http://www.drugbank.ca}"
 
+# Records of a table are yielded in batches of this many.
+DEFAULT_BATCH_SIZE = 1000
+
+
+class DrugContext(ElementFields):
+    """
+    What every per-drug parser needs from a <drug> element, looked up once: the index of its direct children
+    (see ElementFields), its primary DrugBank ID and its name. The parsers accept either a <drug> element
+    or a DrugContext, so a context built once can be shared by all of them.
+    """
+    __slots__ = ("drug_id", "name")
+
+    def __init__(self, drug):
+        super().__init__(drug)
+        self.drug_id = None
+        for drug_id in drug.iterchildren(qualify("drugbank-id")):
+            if drug_id.get("primary") == "true":
+                self.drug_id = drug_id.text
+                break
+        self.name = self.text("name")
+
+
+def drug_context(drug):
+    """Returns the DrugContext of a <drug> element, or the context itself if it already is one."""
+    return drug if isinstance(drug, DrugContext) else DrugContext(drug)
+
+
+def table_records(drug, extract, columns):
+    """
+    The rows the compiled extractor of a table (see parsers.TABLE_PARSERS) gives for a single <drug> element
+    (or its DrugContext), each as a dict of the table's columns. A drug without a primary DrugBank ID has none.
+    """
+    context = drug_context(drug)
+    if context.drug_id is None:
+        return []
+    return [dict(zip(columns, row)) for row in extract(context.element)]
+
+
+def drug_records(drug):
+    """One record with the details of the drug."""
+    return table_records(drug, extract_drug_rows, DRUG_COLUMNS)
+
+
+def synonym_records(drug):
+    """One record with the synonyms of the drug."""
+    return table_records(drug, extract_synonym_rows, SYNONYM_COLUMNS)
+
+
+def product_records(drug):
+    """One record with the products of the drug."""
+    return table_records(drug, extract_product_rows, PRODUCT_COLUMNS)
+
+
+def product_table_records(drug):
+    """One record per distinct product of the drug, with the ID of the drug."""
+    return table_records(drug, extract_product_table_rows, PRODUCT_TABLE_COLUMNS)
+
+
+def target_records(drug):
+    """One record per polypeptide target of the drug, with the ID and the name of the drug."""
+    return table_records(drug, extract_target_rows, TARGET_COLUMNS)
+
+
+def approval_status_records(drug):
+    """One record with the approval groups and the approval status flags of the drug."""
+    context = drug_context(drug)
+    return [{"DrugBank_ID": context.drug_id, **record, "Status": approval_flags(record["Groups"])}
+            for record in table_records(context, extract_approval_status_rows, APPROVAL_STATUS_COLUMNS)]
+
+
+def drug_interaction_records(drug):
+    """One record per interaction of the drug, with the ID and the name of the drug."""
+    return table_records(drug, extract_drug_interaction_rows, DRUG_INTERACTION_COLUMNS)
+
+
+def pathway_records(drug):
+    """
+    One record per pathway edge listed under the drug: the DrugBank ID of every drug of every pathway,
+    which need not be the drug itself, with the name of the pathway.
+    """
+    return table_records(drug, extract_pathway_rows, PATHWAY_COLUMNS)
+
+
+def single_record(records):
+    return records[0] if records else None
+
 
 def parse_drug(drug):
-    """Parse a single <drug> element and return a dict of its details."""
-    try:
-        drug_id_element = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-        if drug_id_element is None:
-            return None
-        drug_id = drug_id_element.text
-        name = drug.find(f"{NS_URL}name").text if drug.find(f"{NS_URL}name") is not None else None
-        drug_type = drug.get("type")
-        description = drug.find(f"{NS_URL}description").text if drug.find(f"{NS_URL}description") is not None else None
-        dosage_form = (
-            drug.find(f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form").text
-            if drug.find(f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form") is not None
-            else None
-        )
-        indications = (
-            drug.find(f"{NS_URL}indication").text
-            if drug.find(f"{NS_URL}indication") is not None
-            else None
-        )
-        mechanism_of_action = (
-            drug.find(f"{NS_URL}mechanism-of-action").text
-            if drug.find(f"{NS_URL}mechanism-of-action") is not None
-            else None
-        )
-        food_interactions = [
-            fi.text for fi in drug.findall(f".//{NS_URL}food-interactions/{NS_URL}food-interaction")
-        ]
-        food_interactions = "; ".join(food_interactions) if food_interactions else None
-
-        return {
-            "DrugBank_ID": drug_id,
-            "Name": name,
-            "Type": drug_type,
-            "Description": description,
-            "Dosage Form": dosage_form,
-            "Indications": indications,
-            "Mechanism of Action": mechanism_of_action,
-            "Food Interactions": food_interactions,
-        }
-    except Exception as e:
-        print(f"Error processing drug element: {e}")
-        return None
+    """Parse a single <drug> element (or its DrugContext) and return a dict of its details."""
+    return single_record(drug_records(drug))
 
 
 def parse_synonyms_for_drug(drug):
-    """Parse synonyms from a single <drug> element."""
-    primary_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-    if primary_id is None:
-        return None
-
-    drug_id = primary_id.text
-    synonyms = drug.findall(f"{NS_URL}synonyms/{NS_URL}synonym")
-    synonym_list = [syn.text for syn in synonyms] if synonyms else []
-    return {"DrugBank_ID": drug_id, "Synonyms": synonym_list}
+    """Parse synonyms from a single <drug> element (or its DrugContext)."""
+    return single_record(synonym_records(drug))
 
 
 def parse_products_for_drug(drug):
-    """Parse product information from a single <drug> element."""
-    primary_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-    if primary_id is None:
-        return None
-
-    drug_id = primary_id.text
-    products = drug.findall(f"{NS_URL}products/{NS_URL}product")
-    product_list = []
-
-    for product in products:
-        product_name = product.find(f"{NS_URL}name")
-        manufacturer = product.find(f"{NS_URL}manufacturer")
-        ndc_code = product.find(f"{NS_URL}ndc-id")
-        form = product.find(f"{NS_URL}dosage-form")
-        route = product.find(f"{NS_URL}route")
-        strength = product.find(f"{NS_URL}strength")
-        country = product.find(f"{NS_URL}country")
-        agency = product.find(f"{NS_URL}approval-agency")
-        product_dict = {
-            "Product Name": product_name.text if product_name is not None else None,
-            "Manufacturer": manufacturer.text if manufacturer is not None else None,
-            "NDC Code": ndc_code.text if ndc_code is not None else None,
-            "Form": form.text if form is not None else None,
-            "Route": route.text if route is not None else None,
-            "Strength": strength.text if strength is not None else None,
-            "Country": country.text if country is not None else None,
-            "Approval Agency": agency.text if agency is not None else None,
-        }
-        product_list.append(product_dict)
-
-    return {"DrugBank_ID": drug_id, "Products": product_list}
-
-
-def parse_polypeptide(polypeptide):
-    """Helper function to extract polypeptide information."""
-    source = polypeptide.get("source", "Unknown")
-    ext_id = polypeptide.get("id", "Unknown")
-    polypeptide_name = polypeptide.find(f"{NS_URL}name").text if polypeptide.find(f"{NS_URL}name") is not None else "Unknown"
-    gene_name = polypeptide.find(f"{NS_URL}gene-name").text if polypeptide.find(f"{NS_URL}gene-name") is not None else "Unknown"
-    chromosome = polypeptide.find(f"{NS_URL}chromosome-location").text if polypeptide.find(
-        f"{NS_URL}chromosome-location") is not None else "Unknown"
-    cellular_location = polypeptide.find(f"{NS_URL}cellular-location").text if polypeptide.find(
-        f"{NS_URL}cellular-location") is not None else "Unknown"
-
-    return source, ext_id, polypeptide_name, gene_name, chromosome, cellular_location
-
-
-def parse_genatlas_id(polypeptide):
-    """Helper function to extract GenAtlas ID from the external-identifier tags under polypeptide."""
-    genatlas_id = "Unknown"
-    external_identifiers = polypeptide.findall(f".//{NS_URL}external-identifier")
-
-    for ext_id in external_identifiers:
-        resource = ext_id.find(f"{NS_URL}resource").text if ext_id.find(f"{NS_URL}resource") is not None else ""
-        if resource == "GenAtlas":
-            genatlas_id = ext_id.find(f"{NS_URL}identifier").text if ext_id.find(
-                f"{NS_URL}identifier") is not None else "Unknown"
-            break
-    return genatlas_id
+    """Parse product information from a single <drug> element (or its DrugContext)."""
+    return single_record(product_records(drug))
 
 
 def parse_targets_for_drug(drug):
-    """Extract target details from a single <drug> element."""
-    target_data = []
-    for target in drug.findall(f".//{NS_URL}target"):
-        target_id = target.find(f"{NS_URL}id")
-        target_name = target.find(f"{NS_URL}name")
-        if target_id is None or target_name is None:
-            continue
-        t_id = target_id.text if target_id.text is not None else ""
-        t_name = target_name.text if target_name.text is not None else ""
-
-        polypeptide = target.find(f"{NS_URL}polypeptide")
-        if polypeptide is not None:
-            source, ext_id, poly_name, gene_name, chromosome, cellular_location = parse_polypeptide(polypeptide)
-            genatlas_id = parse_genatlas_id(polypeptide)
-            target_data.append({
-                "Target_ID": t_id,
-                "Target_Name": t_name,
-                "Source": source,
-                "External_ID": ext_id,
-                "Polypeptide_Name": poly_name,
-                "Gene_Name": gene_name,
-                "GenAtlas_ID": genatlas_id,
-                "Chromosome": chromosome,
-                "Cellular_Location": cellular_location
-            })
-    drug_id_elem = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-    if drug_id_elem is None or drug_id_elem.text is None:
+    """Extract target details from a single <drug> element (or its DrugContext)."""
+    context = drug_context(drug)
+    if context.drug_id is None:
         return None
-
-    drug_id = drug_id_elem.text
-    return {"DrugBank_ID": drug_id, "Drug": drug.find(f"{NS_URL}name").text
-            if drug.find(f"{NS_URL}name") is not None else None, "Targets": target_data}
+    return {"DrugBank_ID": context.drug_id, "Drug": context.name, "Targets": target_records(context)}
 
 
 def parse_approval_status_for_drug(drug):
-    """Extract approval status information from a single <drug> element."""
-    groups = [group.text for group in drug.findall(f".//{NS_URL}group")]
-    status = {}
-    if "approved" in groups:
-        status["Approved"] = 1
-    if "withdrawn" in groups:
-        status["Withdrawn"] = 1
-    if "experimental" in groups or "investigational" in groups:
-        status["Experimental/Investigational"] = 1
-    if "veterinary" in groups:
-        status["Veterinary"] = 1
-
-    drug_id_elem = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-    if drug_id_elem is None or drug_id_elem.text is None:
-        return None
-    drug_id = drug_id_elem.text
-
-    return {"DrugBank_ID": drug_id, "Status": status}
+    """Extract approval status information from a single <drug> element (or its DrugContext)."""
+    return single_record(approval_status_records(drug))
 
 
 def parse_drug_interactions_for_drug(drug):
-    """Extract drug interaction information from a single <drug> element."""
-    interactions = []
-    drug_name_el = drug.find(f"{NS_URL}name")
-    drug_name = drug_name_el.text if drug_name_el is not None else None
-
-    for interaction in drug.findall(f".//{NS_URL}drug-interaction"):
-        interacting_drug_id = interaction.find(f"{NS_URL}drugbank-id")
-        interacting_drug_name = interaction.find(f"{NS_URL}name")
-        interaction_desc = interaction.find(f"{NS_URL}description")
-        interactions.append({
-            "Drug": drug_name,
-            "Interacting_Drug_ID": interacting_drug_id.text if interacting_drug_id is not None else None,
-            "Interacting_Drug": interacting_drug_name.text if interacting_drug_name is not None else None,
-            "Description": interaction_desc.text if interaction_desc is not None else None,
-        })
-
-    drug_id_elem = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-    if drug_id_elem is None or drug_id_elem.text is None:
+    """Extract drug interaction information from a single <drug> element (or its DrugContext)."""
+    context = drug_context(drug)
+    if context.drug_id is None:
         return None
-    drug_id = drug_id_elem.text
+    return {"DrugBank_ID": context.drug_id, "Interactions": drug_interaction_records(context)}
 
-    return {"DrugBank_ID": drug_id, "Interactions": interactions}
 
+def parse_pathways_for_drug(drug):
+    """Extract the pathway edges listed under a single <drug> element (or its DrugContext), see pathway_records."""
+    context = drug_context(drug)
+    if context.drug_id is None:
+        return None
+    return {"DrugBank_ID": context.drug_id, "Pathways": pathway_records(context)}
+
+
+# The tables iter_records can stream, each with the function giving the records of a single <drug>.
+# They are the parse_all tables except genes, which needs the products of other drugs (see iter_tables).
+RECORD_TABLES = {
+    "drugs": drug_records,
+    "synonyms": synonym_records,
+    "products": product_records,
+    "product_table": product_table_records,
+    "targets": target_records,
+    "approval_status": approval_status_records,
+    "drug_interactions": drug_interaction_records,
+    "pathways": pathway_records,
+}
+
+
+def release(drug):
+    """Frees a processed top-level <drug> and the drugs before it, so the tree does not grow while streaming."""
+    drug.clear()
+    parent = drug.getparent()
+    while drug.getprevious() is not None:
+        del parent[0]
+
+
+def iter_drug_contexts(path):
+    """
+    Streams the DrugContexts of the top-level drugs with a primary ID out of a DrugBank XML file
+    (plain or a .zip/.gz/.xz archive). The file is read with iterparse and every <drug> is freed as soon as
+    the loop over the contexts moves on, so the tree does not grow with the file. The <drug> elements nested
+    in pathways are left to their top-level drug.
+    """
+    for _, drug in iterparse_xml(path, memory_map=False, events=("end",), tag=f"{NS_URL}drug"):
+        parent = drug.getparent()
+        if parent is None or parent.getparent() is not None:
+            continue
+        context = DrugContext(drug)
+        if context.drug_id is not None:
+            yield context
+        release(drug)
+
+
+def iter_records(path, tables=tuple(RECORD_TABLES), batch_size=DEFAULT_BATCH_SIZE, frames=False):
+    """
+    Streams the records of the given tables out of a DrugBank XML file (plain or a .zip/.gz/.xz archive).
+
+    The drugs are read by iter_drug_contexts, which frees every <drug> as soon as its records are extracted,
+    so memory use depends on batch_size and not on the size of the file. The context of a drug is shared by
+    all the extractors, and drugs without a primary ID are skipped before any work.
+
+    Yields:
+        (table, batch) pairs, where batch is a list of at most batch_size record dicts of the table
+        (a DataFrame of them with frames=True). The batches of different tables are interleaved.
+
+    Example:
+        for table, batch in iter_records("data/drugbank_partial_generated.xml", tables=("drugs", "targets")):
+            ...
+    """
+    unknown = [table for table in tables if table not in RECORD_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(unknown)}")
+    if batch_size < 1:
+        raise ValueError("The batch size has to be positive.")
+
+    extractors = [(table, RECORD_TABLES[table]) for table in tables]
+    batches = {table: [] for table in tables}
+
+    def emit(table, size):
+        batch, batches[table] = batches[table][:size], batches[table][size:]
+        return table, pd.DataFrame(batch) if frames else batch
+
+    for context in iter_drug_contexts(path):
+        for table, extract in extractors:
+            batches[table].extend(extract(context))
+            while len(batches[table]) >= batch_size:
+                yield emit(table, batch_size)
+
+    for table in tables:
+        if batches[table]:
+            yield emit(table, len(batches[table]))
@@ -0,0 +1,199 @@
+# drugbank/iter_tables.py
+import itertools
+import os
+import sqlite3
+import tempfile
+
+from .frames import ColumnBuffer
+from .iter_parsers import DEFAULT_BATCH_SIZE, iter_drug_contexts
+from .parsers import (
+    GENE_COLUMNS,
+    GENE_DTYPES,
+    PATHWAY_COLUMNS,
+    build_pathways,
+    extract_gene_interactions,
+    extract_gene_names,
+    extract_gene_products,
+    extract_pathway_rows,
+)
+
+SCHEMA = """
+DROP TABLE IF EXISTS products;
+CREATE TABLE products (
+    drug_id TEXT NOT NULL,
+    product_name TEXT,
+    product_id TEXT NOT NULL,
+    product_id_type TEXT NOT NULL
+);
+CREATE INDEX products_drug_id ON products (drug_id);
+DROP TABLE IF EXISTS genes;
+CREATE TABLE genes (
+    drug_id TEXT NOT NULL,
+    drug_name TEXT,
+    gene TEXT
+);
+DROP TABLE IF EXISTS interactions;
+CREATE TABLE interactions (
+    drug_id TEXT NOT NULL,
+    interacting_drug TEXT,
+    interacting_drug_id TEXT
+);
+CREATE INDEX interactions_drug_id ON interactions (drug_id);
+"""
+
+# The join of explode_gene_tables: every gene of a drug with every drug it interacts with and every product of
+# that drug. The genes and interactions of all the entries with the same DrugBank ID count, without repeats
+# (GROUP BY, like drop_duplicates, treats NULLs as equal), and a row repeated by different drugs is kept only
+# the first time, so the rows and their order are the same as in parse_genes.
+GENE_ROWS_QUERY = """
+WITH gene AS (
+    SELECT drug_id, drug_name, gene, MIN(rowid) AS position FROM genes GROUP BY drug_id, drug_name, gene
+), interaction AS (
+    SELECT drug_id, interacting_drug, interacting_drug_id, MIN(rowid) AS position
+    FROM interactions GROUP BY drug_id, interacting_drug, interacting_drug_id
+), row AS (
+    SELECT gene.gene, gene.drug_name, interaction.interacting_drug, products.product_name, products.product_id,
+           products.product_id_type, gene.position AS gene_position, interaction.position AS interaction_position,
+           products.rowid AS product_position,
+           ROW_NUMBER() OVER (
+               PARTITION BY gene.gene, gene.drug_name, interaction.interacting_drug, products.product_name,
+                            products.product_id, products.product_id_type
+               ORDER BY gene.position, interaction.position, products.rowid) AS occurrence
+    FROM gene
+    JOIN interaction ON interaction.drug_id = gene.drug_id
+    JOIN products ON products.drug_id = interaction.interacting_drug_id
+)
+SELECT gene, drug_name, interacting_drug, product_name, product_id, product_id_type FROM row
+WHERE occurrence = 1
+ORDER BY gene_position, interaction_position, product_position
+"""
+
+
+class ProductIndex:
+    """
+    Disk-backed DrugBank_ID -> products index, the first phase of the streaming gene table: parse_genes needs
+    the products of the drugs a drug interacts with, which may come anywhere in the file, so instead of keeping
+    every drug in memory the products, genes and interactions of every drug are written to a SQLite file in one
+    pass, and gene_rows joins them in SQLite afterwards.
+
+    Like in parse_genes, only the last drug with a given DrugBank ID keeps its products and the products of
+    a drug are (product name, product id, product id type) tuples without repeats.
+
+    Without a path the index is a temporary file, removed when the index is closed.
+    """
+
+    def __init__(self, path=None):
+        self.temporary = path is None
+        if self.temporary:
+            descriptor, path = tempfile.mkstemp(prefix="products_", suffix=".sqlite")
+            os.close(descriptor)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # The index is rebuilt from the XML file whenever it is lost, so it does not need to survive a crash.
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, drug_id, products):
+        """Stores the products of a drug, replacing the products stored for an earlier drug with the same ID."""
+        self.connection.execute("DELETE FROM products WHERE drug_id = ?", (drug_id,))
+        self.connection.executemany(
+            "INSERT INTO products (drug_id, product_name, product_id, product_id_type) VALUES (?, ?, ?, ?)",
+            [(drug_id, *product) for product in dict.fromkeys(products)])
+
+    def add_genes(self, drug_id, drug_name, gene_names, interactions):
+        """Stores the gene names and the (interacting drug name, interacting drug id) tuples of a drug."""
+        self.connection.executemany("INSERT INTO genes (drug_id, drug_name, gene) VALUES (?, ?, ?)",
+                                    [(drug_id, drug_name, gene_name) for gene_name in gene_names])
+        self.connection.executemany(
+            "INSERT INTO interactions (drug_id, interacting_drug, interacting_drug_id) VALUES (?, ?, ?)",
+            [(drug_id, *interaction) for interaction in interactions])
+
+    def add_drug(self, context):
+        """Stores the products, genes and interactions of a DrugContext."""
+        self.add(context.drug_id, extract_gene_products(context))
+        self.add_genes(context.drug_id, context.name, extract_gene_names(context), extract_gene_interactions(context))
+
+    def add_drugs(self, contexts):
+        """Stores the products, genes and interactions of every DrugContext and commits them."""
+        for context in contexts:
+            self.add_drug(context)
+        self.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def gene_rows(self):
+        """
+        The second phase of the streaming gene table: yields the rows of parse_genes, joined from the stored
+        genes, interactions and products. SQLite sorts on disk, so the rows are not all kept in memory.
+        """
+        yield from self.connection.execute(GENE_ROWS_QUERY)
+
+    def close(self):
+        self.connection.close()
+        if self.temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def build_product_index(path, index_path=None):
+    """The first phase of the streaming gene table: streams the XML file into a ProductIndex."""
+    index = ProductIndex(index_path)
+    try:
+        index.add_drugs(iter_drug_contexts(path))
+    except BaseException:
+        index.close()
+        raise
+    return index
+
+
+def gene_batches(index, batch_size=DEFAULT_BATCH_SIZE):
+    """Yields the gene rows of the ProductIndex (see ProductIndex.gene_rows) in lists of at most batch_size records."""
+    rows = index.gene_rows()
+    while True:
+        batch = [dict(zip(GENE_COLUMNS, row)) for row in itertools.islice(rows, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+def iter_genes(path, batch_size=DEFAULT_BATCH_SIZE, index_path=None):
+    """
+    Streams the rows of parse_genes (the gene -> interacting drug -> product table) out of a DrugBank XML file
+    (plain or a .zip/.gz/.xz archive) in two phases: a single pass over the file writes the products, genes and
+    interactions of every drug to a ProductIndex on disk, then SQLite joins them. Memory use depends on
+    batch_size, not on the size of the file.
+
+    Yields:
+        lists of at most batch_size record dicts with the GENE_COLUMNS.
+    """
+    with build_product_index(path, index_path) as index:
+        yield from gene_batches(index, batch_size)
+
+
+def parse_genes_streaming(path, index_path=None):
+    """
+    Streaming version of parse_genes(root): the same gene -> interacting drug -> product dataframe,
+    built from the XML file without keeping the tree in memory (see iter_genes).
+    """
+    rows = ColumnBuffer(GENE_COLUMNS)
+    with build_product_index(path, index_path) as index:
+        rows.extend(index.gene_rows())
+    return rows.to_frame(GENE_DTYPES)
+
+
+def parse_pathways_streaming(path):
+    """
+    Streaming version of parse_pathways(root): the same pathways dataframe and per-drug pathway counts,
+    built from the XML file without keeping the tree in memory.
+    """
+    rows = ColumnBuffer(PATHWAY_COLUMNS)
+    for context in iter_drug_contexts(path):
+        rows.extend(extract_pathway_rows(context.element))
+    return build_pathways(rows)
@@ -0,0 +1,273 @@
+# drugbank/name_index.py
+import hashlib
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import namedtuple
+
+import numpy as np
+
+from .cache import DEFAULT_CACHE_DIR, ParseCache
+from .interaction_graph import pack_strings, unpack_string
+
+# Tables of parse_all the index is built from.
+NAME_TABLES = ("drugs", "synonyms", "product_table")
+
+# The arrays of a saved index, each stored as name_index.<name>.npy.
+INDEX_ARRAYS = ("key_offsets", "key_data", "label_offsets", "label_data", "posting_offsets", "postings", "drug_ids",
+                "delete_hashes", "delete_keys", "max_distance")
+INDEX_PREFIX = "name_index"
+
+# Fuzzy lookups find names up to this many edits away unless the index is built for more. Every extra edit
+# multiplies the size of the index by about the length of the names.
+DEFAULT_MAX_DISTANCE = 1
+
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+NameMatch = namedtuple("NameMatch", ["name", "drugbank_ids", "distance"])
+
+
+def normalize(text):
+    """Normalizes a name for lookups: case folded, without accents and with punctuation turned into single spaces."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(character for character in text if not unicodedata.combining(character))
+    return NON_WORD_PATTERN.sub(" ", text.casefold()).strip()
+
+
+def key_hash(text):
+    """A 64-bit hash of the text which, unlike hash(), is the same in every process."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def deletions(text, distance):
+    """Returns the text and every string made of it by deleting at most distance characters."""
+    result = {text}
+    level = {text}
+    for _ in range(distance):
+        level = {word[:i] + word[i + 1:] for word in level for i in range(len(word))}
+        result |= level
+    return result
+
+
+def edit_distance(a, b, bound):
+    """Returns the Levenshtein distance of a and b, or bound + 1 if it is larger than bound."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    # The common prefix and suffix cost nothing, which usually leaves only a few characters for the table below.
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return max(len(a), len(b)) if max(len(a), len(b)) <= bound else bound + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1] if previous[-1] <= bound else bound + 1
+
+
+class PackedStrings:
+    """Read-only sequence view of strings packed by pack_strings, so bisect can search them without unpacking all."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return unpack_string(self.offsets, self.data, position) or ""
+
+
+class NameIndex:
+    """
+    Lookup of DrugBank IDs by drug names, synonyms and product (brand) names.
+
+    The names are normalized (see normalize) and kept sorted, each with the IDs of the drugs it names, so:
+        exact(name)   finds a name by binary search,
+        prefix(text)  lists the names starting with the text, which are next to each other in the sorted keys,
+        fuzzy(text)   finds names up to max_distance edits away through a deletion neighbourhood: every name is
+                      indexed under the hashes of all strings made of it by deleting up to max_distance characters,
+                      and two strings within that edit distance always share one of them, so a lookup only checks
+                      the few names sharing a hash with the query instead of all of them.
+    All arrays are plain numpy arrays, saved as .npy files and memory-mapped when loaded.
+
+    Example:
+        index = NameIndex.from_tables(drugs, synonyms, product_table)
+        index.exact("Refludan")      # ["DB00001"]
+        index.fuzzy("lepirudn")      # [NameMatch(name="Lepirudin", drugbank_ids=["DB00001"], distance=1)]
+    """
+
+    def __init__(self, key_offsets, key_data, label_offsets, label_data, posting_offsets, postings, drug_ids,
+                 delete_hashes, delete_keys, max_distance):
+        self.key_offsets = key_offsets
+        self.key_data = key_data
+        self.label_offsets = label_offsets
+        self.label_data = label_data
+        self.posting_offsets = posting_offsets
+        self.postings = postings
+        self.drug_ids = drug_ids
+        self.delete_hashes = delete_hashes
+        self.delete_keys = delete_keys
+        self.max_distance = max_distance
+        self.keys = PackedStrings(key_offsets, key_data)
+
+    @classmethod
+    def from_names(cls, names, max_distance=DEFAULT_MAX_DISTANCE):
+        """Builds the index out of (name, DrugBank ID) pairs. Empty names and missing values are skipped."""
+        entries = {}
+        labels = {}
+        for name, drug_id in names:
+            if not isinstance(name, str) or not isinstance(drug_id, str):
+                continue
+            key = normalize(name)
+            if key:
+                # Keep the IDs of each key in order without duplicates, and the first spelling of the name.
+                entries.setdefault(key, {})[drug_id] = None
+                labels.setdefault(key, name)
+
+        keys = sorted(entries)
+        drug_ids = np.array(sorted({drug_id for ids in entries.values() for drug_id in ids}), dtype=str)
+        numbers = {drug_id: number for number, drug_id in enumerate(drug_ids.tolist())}
+        posting_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(entries[key]) for key in keys], out=posting_offsets[1:])
+        postings = np.array([numbers[drug_id] for key in keys for drug_id in entries[key]], dtype=np.int32)
+
+        deletes = [(key_hash(variant), number) for number, key in enumerate(keys)
+                   for variant in deletions(key, max_distance)]
+        deletes.sort()
+        delete_hashes = np.array([hash_value for hash_value, _ in deletes], dtype=np.uint64)
+        delete_keys = np.array([number for _, number in deletes], dtype=np.int32)
+
+        return cls(*pack_strings(keys), *pack_strings([labels[key] for key in keys]), posting_offsets, postings,
+                   drug_ids, delete_hashes, delete_keys, np.array(max_distance))
+
+    @classmethod
+    def from_tables(cls, drugs=None, synonyms=None, product_table=None, max_distance=DEFAULT_MAX_DISTANCE):
+        """Builds the index out of the parse_drugs, parse_synonyms and long parse_products dataframes."""
+        names = []
+        if drugs is not None:
+            names += zip(drugs["Name"].tolist(), drugs["DrugBank_ID"].tolist())
+        if synonyms is not None:
+            names += ((synonym, drug_id) for drug_id, drug_synonyms in
+                      zip(synonyms["DrugBank_ID"].tolist(), synonyms["Synonyms"].tolist())
+                      for synonym in drug_synonyms)
+        if product_table is not None:
+            names += zip(product_table["Product Name"].tolist(), product_table["DrugBank_ID"].tolist())
+        return cls.from_names(names, max_distance)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Loads an index saved by save(), memory-mapping its arrays unless mmap=False."""
+        mmap_mode = "r" if mmap else None
+        # Plain array views of the mapped files skip the overhead np.memmap adds to every indexing operation.
+        return cls(*(np.load(os.path.join(directory, f"{INDEX_PREFIX}.{name}.npy"), mmap_mode=mmap_mode)
+                     .view(np.ndarray) for name in INDEX_ARRAYS))
+
+    def save(self, directory):
+        """Saves the arrays of the index as .npy files, each written to a temporary file first."""
+        os.makedirs(directory, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            path = os.path.join(directory, f"{INDEX_PREFIX}.{name}.npy")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                np.save(file, np.asarray(getattr(self, name)))
+            os.replace(tmp_path, path)
+        return directory
+
+    def __len__(self):
+        return len(self.keys)
+
+    def match(self, number, distance=0):
+        """Returns the NameMatch of the key with the given number."""
+        start, end = self.posting_offsets[number], self.posting_offsets[number + 1]
+        return NameMatch(unpack_string(self.label_offsets, self.label_data, number),
+                         self.drug_ids[self.postings[start:end]].tolist(), distance)
+
+    def find(self, key):
+        """Returns the number of a normalized key, or None if it is not indexed."""
+        number = bisect_left(self.keys, key)
+        if number < len(self.keys) and self.keys[number] == key:
+            return number
+        return None
+
+    def exact(self, name):
+        """Returns the DrugBank IDs of the drugs with the given name, synonym or product name."""
+        number = self.find(normalize(name))
+        return self.match(number).drugbank_ids if number is not None else []
+
+    def prefix(self, text, limit=10):
+        """Returns NameMatches for up to limit names starting with the text, in alphabetical order."""
+        prefix = normalize(text)
+        matches = []
+        number = bisect_left(self.keys, prefix)
+        while number < len(self.keys) and len(matches) < limit and self.keys[number].startswith(prefix):
+            matches.append(self.match(number))
+            number += 1
+        return matches
+
+    def fuzzy(self, text, max_distance=None, limit=10):
+        """
+        Returns NameMatches for up to limit names at most max_distance edits away from the text (by default, and
+        at most, the distance the index was built for), closest first.
+        """
+        built_for = int(self.max_distance)
+        max_distance = built_for if max_distance is None else min(max_distance, built_for)
+        query = normalize(text)
+
+        hashes = np.array(sorted(key_hash(variant) for variant in deletions(query, max_distance)), dtype=np.uint64)
+        starts = np.searchsorted(self.delete_hashes, hashes, side="left")
+        ends = np.searchsorted(self.delete_hashes, hashes, side="right")
+        candidates = {number for start, end in zip(starts.tolist(), ends.tolist())
+                      for number in self.delete_keys[start:end].tolist()}
+
+        matches = []
+        for number in candidates:
+            key = self.keys[number]
+            distance = edit_distance(query, key, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, key, number))
+        matches.sort()
+        return [self.match(number, distance) for distance, _, number in matches[:limit]]
+
+    def lookup(self, text, limit=10):
+        """Returns the exact match of the text if there is one, else the names starting with it, else fuzzy matches."""
+        number = self.find(normalize(text))
+        if number is not None:
+            return [self.match(number)]
+        return self.prefix(text, limit) or self.fuzzy(text, limit=limit)
+
+
+def load_name_index(xml_path, cache_dir=DEFAULT_CACHE_DIR, use_cache=True, refresh=False,
+                    max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Returns the NameIndex of the DrugBank XML file. The index is saved in the parse cache entry of the file,
+    next to the cached tables it is built from, so it is only built again when the file or the parsers change.
+    """
+    cache = ParseCache(cache_dir, enabled=use_cache, refresh=refresh)
+    if use_cache:
+        entry_dir = cache.entry_dir(xml_path)
+        if not refresh:
+            try:
+                index = NameIndex.load(entry_dir)
+                if int(index.max_distance) == max_distance:
+                    return index
+            except (OSError, ValueError):
+                pass
+
+    tables = cache.get_tables(xml_path, NAME_TABLES)
+    index = NameIndex.from_tables(tables["drugs"], tables["synonyms"], tables["product_table"], max_distance)
+    if use_cache:
+        index.save(entry_dir)
+    return index
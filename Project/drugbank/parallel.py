@@ -0,0 +1,137 @@
+# drugbank/parallel.py
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+from .frames import ColumnBuffer
+from .parsers import TABLES, TABLE_PARSERS, check_tables, extract_rows, build_tables, iter_drugs, parse_all
+from .xml_source import detect_compression, parse_xml
+
+# Matches <drug ...> and </drug>, but not <drugbank-id>, <drugs> or <drug-interaction>.
+DRUG_TAG_PATTERN = re.compile(rb"<(/?)drug(?=[\s/>])")
+ROOT_TAG_PATTERN = re.compile(rb"<([^?!/\s>][^\s/>]*)")
+
+# Each worker gets a few shards, so a slow shard does not leave the other workers idle.
+SHARDS_PER_WORKER = 4
+
+
+def scan_drug_offsets(path):
+    """
+    Scans the DrugBank XML file once for the byte offsets of the top-level <drug> elements.
+    The <drug> stubs nested in pathways are skipped by keeping track of the <drug> nesting depth.
+
+    Returns: a list of (start, end) byte offsets, where end points just after the closing </drug> tag.
+    """
+    offsets = []
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return offsets
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            depth = 0
+            start = None
+            for match in DRUG_TAG_PATTERN.finditer(data):
+                if match.group(1):
+                    depth -= 1
+                    if depth == 0:
+                        offsets.append((start, data.find(b">", match.end()) + 1))
+                    continue
+
+                # Self-closing <drug/> elements do not change the depth.
+                tag_end = data.find(b">", match.end())
+                if data[tag_end - 1:tag_end] == b"/":
+                    continue
+                if depth == 0:
+                    start = match.start()
+                depth += 1
+    return offsets
+
+
+def read_root_envelope(path, first_drug_start):
+    """
+    Reads everything in front of the first top-level <drug> element (the XML declaration and the start tag
+    of the root element with its namespaces) and builds the matching closing tag.
+    """
+    with open(path, "rb") as file:
+        prefix = file.read(first_drug_start)
+
+    # Skip the XML declaration, comments and the doctype to find the root element.
+    root_tag = ROOT_TAG_PATTERN.search(prefix).group(1)
+    return prefix, b"</" + root_tag + b">"
+
+
+def split_shards(offsets, shard_count):
+    """Splits the drug offsets into contiguous (start, end) byte ranges of roughly equal size."""
+    if not offsets:
+        return []
+
+    total_size = offsets[-1][1] - offsets[0][0]
+    target_size = max(1, total_size // max(1, shard_count))
+    shards = []
+    shard_start = None
+    for start, end in offsets:
+        if shard_start is None:
+            shard_start = start
+        if end - shard_start >= target_size:
+            shards.append((shard_start, end))
+            shard_start = None
+    if shard_start is not None:
+        shards.append((shard_start, offsets[-1][1]))
+    return shards
+
+
+def parse_shard(path, prefix, suffix, start, end, tables):
+    """Parses the drugs between the given byte offsets, wrapped in the root element of the file."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    root = etree.fromstring(prefix + data + suffix, parser=etree.XMLParser(huge_tree=True))
+    return extract_rows(iter_drugs(root), tables)
+
+
+def parse_all_parallel(path, tables=TABLES, workers=None):
+    """
+    Parses a DrugBank XML file into several tables using a pool of worker processes.
+
+    The file is split into contiguous shards of top-level <drug> elements, each worker parses its shards and
+    runs the extractors of parse_all on them, and the rows of all shards are joined in document order before
+    building the tables, so the result is the same as parse_all(etree.parse(path).getroot(), tables).
+
+    Archives (.zip, .gz, .xz) cannot be split into shards without decompressing them first,
+    so they are parsed in the current process.
+
+    Args:
+        workers: the number of worker processes, by default the number of CPUs. With workers=1 the file is
+            parsed in the current process.
+    """
+    tables = check_tables(tables)
+    if detect_compression(path):
+        return parse_all(parse_xml(path), tables)
+
+    workers = workers or os.cpu_count() or 1
+
+    offsets = scan_drug_offsets(path)
+    rows = {table: ColumnBuffer(TABLE_PARSERS[table][2]) for table in tables}
+    if not offsets:
+        return build_tables(rows, tables)
+
+    prefix, suffix = read_root_envelope(path, offsets[0][0])
+    shards = split_shards(offsets, workers * SHARDS_PER_WORKER if workers > 1 else 1)
+
+    if workers == 1:
+        results = [parse_shard(path, prefix, suffix, start, end, tables) for start, end in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(parse_shard, path, prefix, suffix, start, end, tables)
+                       for start, end in shards]
+            # Collect the shards in submission order, which is the document order.
+            results = [future.result() for future in futures]
+
+    for result in results:
+        for table in tables:
+            rows[table].extend(result[table])
+
+    return build_tables(rows, tables)
@@ -1,70 +1,85 @@
 # drugbank/parsers.py
 import re
 import time
+from urllib.parse import quote_plus
 import pandas as pd
-from collections import defaultdict
-from selenium import webdriver
+from collections import defaultdict, namedtuple
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+import lxml.html
+
+from .fieldspec import ALL, JOINED, Field, TableSpec, compile_fields, compile_table
+from .fields import ElementFields
+from .frames import ColumnBuffer, build_frame, intern_text, to_buffer
+from .webdriver_pool import chrome_driver
 
 # The default namespace URL.
 NS_URL = "{http://www.drugbank.ca}"
 
+# Bump whenever a change to the parsers changes their results, so cached tables get parsed again.
+PARSER_VERSION = 6
+
+
+def iter_drugs(root):
+    """Yields only the top-level <drug> elements of the DrugBank XML."""
+    return root.iterfind(f"{NS_URL}drug")
+
+
+# The tables below are declared as field specs (see fieldspec.py) and compiled into their extractors,
+# so a new column is a new Field instead of another loop over the elements.
+PRIMARY_ID = Field("DrugBank_ID", "drugbank-id[@primary='true']", required=True)
+
+DRUG_SPEC = TableSpec([
+    PRIMARY_ID,
+    Field("Name", "name"),
+    Field("Type", ".", "@type"),
+    Field("State", "state"),
+    Field("Description", "description"),
+    Field("Dosage Form", "dosages/dosage/form"),
+    Field("Indications", "indication"),
+    Field("Mechanism of Action", "mechanism-of-action"),
+    Field("Food Interactions", ".//food-interactions/food-interaction", multiplicity=JOINED),
+])
+DRUG_COLUMNS = DRUG_SPEC.columns
+DRUG_DTYPES = {"DrugBank_ID": "string", "Name": "string", "Type": "category", "State": "category",
+               "Description": "string", "Dosage Form": "category", "Indications": "string",
+               "Mechanism of Action": "string", "Food Interactions": "string"}
+
+# Extracts the drug details row of a single top-level <drug> element.
+extract_drug_rows = compile_table(DRUG_SPEC)
+
+
+def build_drugs(rows):
+    """Builds the drug details dataframe out of the extracted rows."""
+    df = build_frame(rows, DRUG_COLUMNS, DRUG_DTYPES)
+    df = df.drop_duplicates(subset=["DrugBank_ID"])
+
+    return df
+
 
 def parse_drugs(root):
     """Parses DrugBank XML and extracts drug details."""
-    data = []
+    rows = ColumnBuffer(DRUG_COLUMNS)
 
     # Only process top-level <drug> elements
-    for drug in root.findall(f"{NS_URL}drug"):
-        try:
-            # Get only the primary drugbank-id
-            drug_id_element = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-            if drug_id_element is None:
-                continue
-            drug_id = drug_id_element.text if drug_id_element is not None else None
-
-            name = drug.find(f"{NS_URL}name").text \
-                if drug.find(f"{NS_URL}name") is not None else None
-            drug_type = drug.get("type")
-            state = drug.find(f"{NS_URL}state").text \
-                if drug.find(f"{NS_URL}state") is not None else None
-            description = drug.find(f"{NS_URL}description").text \
-                if drug.find(f"{NS_URL}description") is not None else None
-            dosage_form = drug.find(f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form").text \
-                if drug.find(f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form") is not None else None
-            indications = drug.find(f"{NS_URL}indication").text \
-                if drug.find(f"{NS_URL}indication") is not None else None
-            mechanism_of_action = drug.find(f"{NS_URL}mechanism-of-action").text \
-                if drug.find(f"{NS_URL}mechanism-of-action") is not None else None
-
-            food_interactions = [
-                fi.text for fi in drug.findall(f".//{NS_URL}food-interactions/{NS_URL}food-interaction")
-            ]
-            food_interactions = "; ".join(food_interactions) \
-                if food_interactions else None
-
-            data.append({
-                "DrugBank_ID": drug_id,
-                "Name": name,
-                "Type": drug_type,
-                "State": state,
-                "Description": description,
-                "Dosage Form": dosage_form,
-                "Indications": indications,
-                "Mechanism of Action": mechanism_of_action,
-                "Food Interactions": food_interactions
-            })
-        except Exception as e:
-            print(f"Error processing drug: {e}")
-            continue
+    for drug in iter_drugs(root):
+        rows.extend(extract_drug_rows(drug))
 
-    df = pd.DataFrame(data)
-    df = df.drop_duplicates(subset=["DrugBank_ID"])
+    return build_drugs(rows)
 
-    return df
+
+SYNONYM_SPEC = TableSpec([PRIMARY_ID, Field("Synonyms", "synonyms/synonym", multiplicity=ALL)])
+SYNONYM_COLUMNS = SYNONYM_SPEC.columns
+
+# Extracts the synonyms row of a single top-level <drug> element.
+extract_synonym_rows = compile_table(SYNONYM_SPEC)
+
+
+def build_synonyms(rows):
+    """Builds the synonyms dataframe out of the extracted rows."""
+    return build_frame(rows, SYNONYM_COLUMNS, {"DrugBank_ID": "string", "Synonyms": object})
 
 
 def parse_synonyms(root):
@@ -73,70 +88,131 @@ def parse_synonyms(root):
 
     Returns: a dataframe with columns ["DrugBank_ID", "Synonyms"], where "Synonyms" is a list of synonyms.
     """
-    data = []
+    rows = ColumnBuffer(SYNONYM_COLUMNS)
 
     # Only process top-level <drug> elements
-    for drug in root.findall(f"{NS_URL}drug"):
-        primary_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-        synonyms = drug.findall(f"{NS_URL}synonyms/{NS_URL}synonym")
+    for drug in iter_drugs(root):
+        rows.extend(extract_synonym_rows(drug))
 
-        if primary_id is not None:
-            drug_id = primary_id.text
-            synonym_list = [syn.text for syn in synonyms] if synonyms else []
-            data.append({"DrugBank_ID": drug_id, "Synonyms": synonym_list})
+    return build_synonyms(rows)
 
-    return pd.DataFrame(data)
 
+PRODUCT_COLUMNS = ["DrugBank_ID", "Products"]
 
-def parse_products(root):
-    """Extracts product information from XML."""
-    data = []
+# Product fields and the child elements of <product> they are read from.
+PRODUCT_FIELDS = [("Product Name", "name"), ("Manufacturer", "manufacturer"), ("NDC Code", "ndc-id"),
+                  ("Form", "dosage-form"), ("Route", "route"), ("Strength", "strength"), ("Country", "country"),
+                  ("Approval Agency", "approval-agency")]
+PRODUCT_FIELD_NAMES = [name for name, _ in PRODUCT_FIELDS]
+
+# Product fields which repeat across many products, so their values are interned.
+REPEATED_PRODUCT_FIELDS = ("Manufacturer", "Form", "Route", "Country", "Approval Agency")
 
-    for drug in root.findall(f"{NS_URL}drug"):
-        primary_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-        products = drug.findall(f"{NS_URL}products/{NS_URL}product")
+# Columns of the long product table, with one row per product instead of a list of products per drug.
+PRODUCT_TABLE_COLUMNS = ["DrugBank_ID"] + PRODUCT_FIELD_NAMES
+PRODUCT_TABLE_DTYPES = {name: "category" if name in REPEATED_PRODUCT_FIELDS else "string"
+                        for name in PRODUCT_TABLE_COLUMNS}
 
-        if primary_id is not None:
-            drug_id = primary_id.text
-            product_list = []
+PRODUCT_FIELD_SPECS = [Field(name, path, transform=intern_text if name in REPEATED_PRODUCT_FIELDS else None)
+                       for name, path in PRODUCT_FIELDS]
+PRODUCT_TABLE_SPEC = TableSpec([PRIMARY_ID], rows="products/product", row_fields=PRODUCT_FIELD_SPECS, unique=True)
 
-            for product in products:
-                product_name = product.find(f"{NS_URL}name")
-                manufacturer = product.find(f"{NS_URL}manufacturer")
-                ndc_code = product.find(f"{NS_URL}ndc-id")
-                form = product.find(f"{NS_URL}dosage-form")
-                route = product.find(f"{NS_URL}route")
-                strength = product.find(f"{NS_URL}strength")
-                country = product.find(f"{NS_URL}country")
-                agency = product.find(f"{NS_URL}approval-agency")
+# Extracts the PRODUCT_FIELDS values of a single <product> element.
+extract_product_fields = compile_fields(PRODUCT_FIELD_SPECS)
 
-                product_dict = {
-                    "Product Name": product_name.text if product_name is not None else None,
-                    "Manufacturer": manufacturer.text if manufacturer is not None else None,
-                    "NDC Code": ndc_code.text if ndc_code is not None else None,
-                    "Form": form.text if form is not None else None,
-                    "Route": route.text if route is not None else None,
-                    "Strength": strength.text if strength is not None else None,
-                    "Country": country.text if country is not None else None,
-                    "Approval Agency": agency.text if agency is not None else None
-                }
 
-                # Append the product to the list for this drug
-                product_list.append(product_dict)
+def extract_products(drug):
+    """
+    Extracts the DrugBank ID and the products of a single top-level <drug> element, each product as a tuple of
+    the PRODUCT_FIELDS values. Duplicate products are dropped, keeping the first one.
+
+    Returns: (drug_id, products), or None if the drug has no primary DrugBank ID.
+    """
+    primary_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
+    if primary_id is None:
+        return None
+
+    products = [extract_product_fields(product) for product in drug.iterfind(f"{NS_URL}products/{NS_URL}product")]
+
+    # The products are hashed as tuples, so the duplicates are dropped in one pass keeping the original order.
+    return primary_id.text, list(dict.fromkeys(products))
+
 
-            product_list = pd.DataFrame(product_list).drop_duplicates().to_dict(orient="records")
+def extract_product_rows(drug):
+    """Extracts the products row of a single top-level <drug> element."""
+    extracted = extract_products(drug)
+    if extracted is None:
+        return []
 
-            # Append the drug_id and its associated product list
-            data.append({"DrugBank_ID": drug_id, "Products": product_list})
+    drug_id, products = extracted
+    # The drug_id and its associated product list
+    return [(drug_id, [dict(zip(PRODUCT_FIELD_NAMES, product)) for product in products])]
 
-    df = pd.DataFrame(data)
 
-    if not df.empty:
-        df.set_index("DrugBank_ID", inplace=True)
+# Extracts a row of the long product table for each product of a single top-level <drug> element.
+extract_product_table_rows = compile_table(PRODUCT_TABLE_SPEC)
+
+
+def build_products(rows):
+    """Builds the products dataframe out of the extracted rows."""
+    df = build_frame(rows, PRODUCT_COLUMNS, {"DrugBank_ID": "string", "Products": object})
+    df.set_index("DrugBank_ID", inplace=True)
 
     return df
 
 
+def build_product_table(rows):
+    """Builds the long product table out of the rows extracted by extract_product_table_rows."""
+    return build_frame(rows, PRODUCT_TABLE_COLUMNS, PRODUCT_TABLE_DTYPES)
+
+
+def parse_products(root, long_format=False):
+    """
+    Extracts product information from XML.
+
+    Returns: by default a dataframe indexed by DrugBank_ID with a list of product dicts per drug.
+    With long_format=True a flat dataframe with the DrugBank_ID and the product fields, one row per product,
+    which is much cheaper to store and filter.
+    """
+    extract, build, columns = (extract_product_table_rows, build_product_table, PRODUCT_TABLE_COLUMNS) \
+        if long_format else (extract_product_rows, build_products, PRODUCT_COLUMNS)
+    rows = ColumnBuffer(columns)
+
+    for drug in iter_drugs(root):
+        rows.extend(extract(drug))
+
+    return build(rows)
+
+
+# A [DrugBank_ID, Pathway] edge for each drug listed under the <drugs> element of each pathway.
+PATHWAY_SPEC = TableSpec([], rows="pathways/pathway/drugs/drug", row_fields=[
+    Field("DrugBank_ID", "drugbank-id", required=True, transform=str.strip),
+    Field("Pathway", "../../name", required=True),
+])
+PATHWAY_COLUMNS = PATHWAY_SPEC.columns
+
+# Extracts the pathway edges of a single top-level <drug> element.
+extract_pathway_rows = compile_table(PATHWAY_SPEC)
+
+
+def build_pathways(rows):
+    """Builds the pathways dataframe and the per-drug pathway counts out of the extracted edges."""
+    data = []
+    drug_pathway_counts = defaultdict(int)
+    seen_pairs = set()  # Set to keep track of already seen drug-pathway pairs
+
+    for drug_id, pathway_name in rows:
+        # Check if this (drug_id, pathway_name) pair has been seen before
+        pair = (drug_id, pathway_name)
+        if pair not in seen_pairs:
+            data.append([drug_id, pathway_name])
+            drug_pathway_counts[drug_id] += 1
+            seen_pairs.add(pair)
+
+    df = build_frame(data, PATHWAY_COLUMNS, {"DrugBank_ID": "string", "Pathway": "string"})
+    return df, drug_pathway_counts
+
+
 def parse_pathways(root):
     """
     Parses DrugBank XML and creates edges from each pathway to each drug
@@ -149,50 +225,23 @@ def parse_pathways(root):
         drug_pathway_counts: A defaultdict(int) counting the number of pathway connections
             per drug ID.
     """
-    data = []
-    drug_pathway_counts = defaultdict(int)
-    seen_pairs = set()  # Set to keep track of already seen drug-pathway pairs
+    rows = ColumnBuffer(PATHWAY_COLUMNS)
 
-    # Find all pathway elements anywhere in the XML
-    for pathway in root.findall(f".//{NS_URL}pathway"):
-        pathway_name_el = pathway.find(f"{NS_URL}name")
-        if pathway_name_el is None:
-            continue
-        pathway_name = pathway_name_el.text
-
-        # Look for a <drugs> element within the pathway
-        drugs_element = pathway.find(f"{NS_URL}drugs")
-        if drugs_element is None:
-            continue
+    for drug in iter_drugs(root):
+        rows.extend(extract_pathway_rows(drug))
 
-        # For each inner drug listed under <drugs>, extract its DrugBank ID from the element text.
-        for inner_drug in drugs_element.findall(f"{NS_URL}drug"):
-            drug_id = inner_drug.find(f"{NS_URL}drugbank-id")
-            if drug_id is None:
-                continue
-            drug_id = drug_id.text.strip()
-
-            # Check if this (drug_id, pathway_name) pair has been seen before
-            pair = (drug_id, pathway_name)
-            if pair not in seen_pairs:
-                data.append([drug_id, pathway_name])
-                drug_pathway_counts[drug_id] += 1
-                seen_pairs.add(pair)
-
-    df = pd.DataFrame(data, columns=["DrugBank_ID", "Pathway"])
-    return df, drug_pathway_counts
+    return build_pathways(rows)
 
 
 def parse_polypeptide(polypeptide):
     """Helper function to extract polypeptide information."""
-    source = polypeptide.get("source", "Unknown")
-    ext_id = polypeptide.get("id", "Unknown")
-    polypeptide_name = polypeptide.find(f"{NS_URL}name").text if polypeptide.find(f"{NS_URL}name") is not None else "Unknown"
-    gene_name = polypeptide.find(f"{NS_URL}gene-name").text if polypeptide.find(f"{NS_URL}gene-name") is not None else "Unknown"
-    chromosome = polypeptide.find(f"{NS_URL}chromosome-location").text if polypeptide.find(
-        f"{NS_URL}chromosome-location") is not None else "Unknown"
-    cellular_location = polypeptide.find(f"{NS_URL}cellular-location").text if polypeptide.find(
-        f"{NS_URL}cellular-location") is not None else "Unknown"
+    fields = ElementFields(polypeptide)
+    source = fields.attr("source", "Unknown")
+    ext_id = fields.attr("id", "Unknown")
+    polypeptide_name = fields.text("name", "Unknown")
+    gene_name = fields.text("gene-name", "Unknown")
+    chromosome = fields.text("chromosome-location", "Unknown")
+    cellular_location = fields.text("cellular-location", "Unknown")
 
     return source, ext_id, polypeptide_name, gene_name, chromosome, cellular_location
 
@@ -203,264 +252,610 @@ def parse_genatlas_id(polypeptide):
     external_identifiers = polypeptide.findall(f".//{NS_URL}external-identifier")
 
     for ext_id in external_identifiers:
-        resource = ext_id.find(f"{NS_URL}resource").text if ext_id.find(f"{NS_URL}resource") is not None else ""
-        if resource == "GenAtlas":
-            genatlas_id = ext_id.find(f"{NS_URL}identifier").text if ext_id.find(
-                f"{NS_URL}identifier") is not None else "Unknown"
+        fields = ElementFields(ext_id)
+        if fields.text("resource", "") == "GenAtlas":
+            genatlas_id = fields.text("identifier", "Unknown")
             break
     return genatlas_id
 
 
+def sequence_length(sequence):
+    """
+    Returns the number of amino acids in a polypeptide sequence given in the FASTA format (or as a bare sequence),
+    leaving out the ">" header lines, whitespace and the "*" stop codon. Returns None for an empty sequence.
+    """
+    residues = 0
+    for line in sequence.splitlines():
+        if not line.startswith(">"):
+            residues += len("".join(line.split()).replace("*", ""))
+    return residues or None
+
+
+# A row for each target with a polypeptide.
+TARGET_SPEC = TableSpec([PRIMARY_ID, Field("Drug", "name")], rows="targets/target", row_fields=[
+    Field("Target_ID", "id"),
+    Field("Target_Name", "name"),
+    Field("Source", "polypeptide", "@source", default="Unknown", required=True),
+    Field("External_ID", "polypeptide", "@id", default="Unknown"),
+    Field("Polypeptide_Name", "polypeptide/name", default="Unknown"),
+    Field("Gene_Name", "polypeptide/gene-name", default="Unknown"),
+    Field("GenAtlas_ID", "polypeptide//external-identifier[resource='GenAtlas']/identifier", default="Unknown"),
+    Field("Chromosome", "polypeptide/chromosome-location", default="Unknown"),
+    Field("Cellular_Location", "polypeptide/cellular-location", default="Unknown"),
+    Field("Amino_Acid_Count", "polypeptide/amino-acid-sequence", transform=sequence_length),
+])
+TARGET_COLUMNS = TARGET_SPEC.columns
+TARGET_DTYPES = {"DrugBank_ID": "string", "Drug": "string", "Target_ID": "string", "Target_Name": "string",
+                 "Source": "category", "External_ID": "string", "Polypeptide_Name": "string", "Gene_Name": "string",
+                 "GenAtlas_ID": "string", "Chromosome": "category", "Cellular_Location": "category",
+                 "Amino_Acid_Count": "Int64"}
+
+# Extracts a row for each polypeptide target of a single top-level <drug> element.
+extract_target_rows = compile_table(TARGET_SPEC)
+
+
+def build_targets(rows):
+    """Builds the targets dataframe and the cellular location counts out of the extracted rows."""
+    rows = to_buffer(rows, TARGET_COLUMNS)
+
+    cellular_locations = defaultdict(int)
+    for cellular_location in rows.column("Cellular_Location"):
+        cellular_locations[cellular_location] += 1
+
+    df = rows.to_frame(TARGET_DTYPES)
+
+    # A stable sort keeps the targets of a drug in document order.
+    df.sort_values(by=["DrugBank_ID"], kind="stable", inplace=True)
+
+    return df, cellular_locations
+
+
 def parse_targets(root):
     """Parses DrugBank XML and targets."""
-    target_data = []
-    cellular_locations = defaultdict(int)
+    rows = ColumnBuffer(TARGET_COLUMNS)
 
-    for drug in root.findall(f".//{NS_URL}drug"):
-        drug_id_element = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
-        if drug_id_element is None:
-            continue
-        drug_id = drug_id_element.text if drug_id_element is not None else None
-        drug_name = drug.find(f"{NS_URL}name").text if drug.find(f"{NS_URL}name") is not None else None
-        targets = drug.findall(f".//{NS_URL}target")
+    for drug in iter_drugs(root):
+        rows.extend(extract_target_rows(drug))
 
-        for target in targets:
-            target_id = target.find(f"{NS_URL}id").text if target.find(f"{NS_URL}id") is not None else None
-            target_name = target.find(f"{NS_URL}name").text if target.find(f"{NS_URL}name") is not None else None
+    return build_targets(rows)
 
-            polypeptide = target.find(f"{NS_URL}polypeptide")
-            if polypeptide is not None:
-                source, ext_id, polypeptide_name, gene_name, chromosome, cellular_location = parse_polypeptide(
-                    polypeptide)
 
-                genatlas_id = parse_genatlas_id(polypeptide)
+APPROVAL_STATUS_SPEC = TableSpec([Field("Groups", "groups/group", multiplicity=ALL)])
+APPROVAL_STATUS_COLUMNS = APPROVAL_STATUS_SPEC.columns
 
-                target_data.append(
-                    [drug_id, drug_name, target_id, target_name, source, ext_id, polypeptide_name, gene_name, genatlas_id,
-                     chromosome, cellular_location]
-                )
-                cellular_locations[cellular_location] += 1
+# Extracts the list of approval groups of a single top-level <drug> element.
+extract_approval_status_rows = compile_table(APPROVAL_STATUS_SPEC)
 
-    df = pd.DataFrame(target_data,
-                      columns=["DrugBank_ID", "Drug", "Target_ID", "Target_Name", "Source", "External_ID",
-                               "Polypeptide_Name", "Gene_Name", "GenAtlas_ID", "Chromosome", "Cellular_Location"])
 
-    df.sort_values(by=["DrugBank_ID"], inplace=True)
+# The approval statuses approval_flags can give, in the order it checks them.
+APPROVAL_STATUSES = ("Approved", "Withdrawn", "Experimental/Investigational", "Veterinary")
 
-    return df, cellular_locations
 
+def approval_flags(groups):
+    """Maps each approval status the groups of a drug give to 1, e.g. {"Approved": 1, "Withdrawn": 1}."""
+    status = {}
+    if "approved" in groups:
+        status["Approved"] = 1
+    if "withdrawn" in groups:
+        status["Withdrawn"] = 1
+    if "experimental" in groups or "investigational" in groups:
+        status["Experimental/Investigational"] = 1
+    if "veterinary" in groups:
+        status["Veterinary"] = 1
+    return status
 
-def parse_approval_status(root):
-    """Parses DrugBank XML and extracts information on drugs' approval statuses."""
+
+def build_approval_status(rows):
+    """Builds the approval status dataframe and counts out of the extracted groups."""
     status_counts = defaultdict(int)
     approved_not_withdrawn = 0
 
-    for drug in root.findall(f".//{NS_URL}drug"):
-        groups = [group.text for group in drug.findall(f".//{NS_URL}group")]
-
-        if "approved" in groups:
-            status_counts["Approved"] += 1
-            if "withdrawn" not in groups:
-                approved_not_withdrawn += 1
-        if "withdrawn" in groups:
-            status_counts["Withdrawn"] += 1
-        if "experimental" in groups or "investigational" in groups:
-            status_counts["Experimental/Investigational"] += 1
-        if "veterinary" in groups:
-            status_counts["Veterinary"] += 1
+    for groups, in rows:
+        status = approval_flags(groups)
+        for name in status:
+            status_counts[name] += 1
+        if "Approved" in status and "Withdrawn" not in status:
+            approved_not_withdrawn += 1
 
     df = pd.DataFrame(list(status_counts.items()), columns=["Status", "Count"])
 
     return df, approved_not_withdrawn, status_counts
 
 
+def parse_approval_status(root):
+    """Parses DrugBank XML and extracts information on drugs' approval statuses."""
+    rows = ColumnBuffer(APPROVAL_STATUS_COLUMNS)
+
+    for drug in iter_drugs(root):
+        rows.extend(extract_approval_status_rows(drug))
+
+    return build_approval_status(rows)
+
+
+DRUG_INTERACTION_SPEC = TableSpec(
+    [Field("DrugBank_ID", "drugbank-id[@primary='true']"), Field("Drug", "name")],
+    rows="drug-interactions/drug-interaction",
+    row_fields=[Field("Interacting_Drug_ID", "drugbank-id"), Field("Interacting_Drug", "name"),
+                Field("Description", "description")],
+)
+DRUG_INTERACTION_COLUMNS = DRUG_INTERACTION_SPEC.columns
+
+# Extracts a row for each interaction of a single top-level <drug> element with another drug.
+extract_drug_interaction_rows = compile_table(DRUG_INTERACTION_SPEC)
+
+
+def build_drug_interactions(rows):
+    """Builds the drug interactions dataframe out of the extracted rows."""
+    return build_frame(rows, DRUG_INTERACTION_COLUMNS, dict.fromkeys(DRUG_INTERACTION_COLUMNS, "string"))
+
+
 def parse_drug_interactions(root):
     """Parses DrugBank XML and extracts information on drugs' interactions with other drugs."""
-    interaction_data = []
+    rows = ColumnBuffer(DRUG_INTERACTION_COLUMNS)
 
-    for drug in root.findall(f".//{NS_URL}drug"):
-        drug_name = drug.find(f"{NS_URL}name").text
-        interactions = drug.findall(f".//{NS_URL}drug-interaction")
+    for drug in iter_drugs(root):
+        rows.extend(extract_drug_interaction_rows(drug))
 
-        for interaction in interactions:
-            interacting_drug_id = interaction.find(f"{NS_URL}drugbank-id").text
-            interacting_drug_name = interaction.find(f"{NS_URL}name").text
-            interaction_desc = interaction.find(f"{NS_URL}description").text
+    return build_drug_interactions(rows)
 
-            interaction_data.append([drug_name, interacting_drug_id, interacting_drug_name, interaction_desc])
 
-    df = pd.DataFrame(interaction_data,
-                                   columns=["Drug", "Interacting_Drug_ID", "Interacting_Drug", "Description"])
+# Product identifiers used by parse_genes, in order of preference.
+PRODUCT_ID_TYPES = ("ndc-id", "ndc-product-code", "dpd-id", "ema-ma-number")
 
-    return df
 
-def parse_genes(root):
-    """Extracts drug-gene interactions and their related drug products from XML."""
-    data = []
+GENE_ROW_COLUMNS = ["DrugBank_ID", "Products", "Drug", "Gene_Names", "Interactions"]
 
-    drug_products_dict = {}
 
-    # First, collect all drugs and their associated products into a dictionary
-    for drug in root.findall(f"{NS_URL}drug"):
-        drug_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']").text
-
-        products = []
-        for product in drug.findall(f"{NS_URL}products/{NS_URL}product"):
-            product_name = product.find(f"{NS_URL}name").text
-
-            product_id = None
-            product_id_type = None
-
-            if product.find(f"{NS_URL}ndc-id") is not None and product.find(f"{NS_URL}ndc-id").text:
-                product_id = product.find(f"{NS_URL}ndc-id").text
-                product_id_type = "ndc-id"
-            elif product.find(f"{NS_URL}ndc-product-code") is not None and product.find(
-                    f"{NS_URL}ndc-product-code").text:
-                product_id = product.find(f"{NS_URL}ndc-product-code").text
-                product_id_type = "ndc-product-code"
-            elif product.find(f"{NS_URL}dpd-id") is not None and product.find(f"{NS_URL}dpd-id").text:
-                product_id = product.find(f"{NS_URL}dpd-id").text
-                product_id_type = "dpd-id"
-            elif product.find(f"{NS_URL}ema-ma-number") is not None and product.find(
-                    f"{NS_URL}ema-ma-number").text:
-                product_id = product.find(f"{NS_URL}ema-ma-number").text
-                product_id_type = "ema-ma-number"
+def extract_gene_products(fields):
+    """The (product name, product id, product id type) tuples of a drug, from the ElementFields of its <drug>."""
+    products = []
+    for product in fields.findall("products/product"):
+        product_fields = ElementFields(product)
+        product_name = product_fields.find("name").text
 
+        # Use the first product identifier which is present and not empty.
+        for product_id_type in PRODUCT_ID_TYPES:
+            product_id = product_fields.text(product_id_type)
             if product_id:
                 products.append((product_name, product_id, product_id_type))
+                break
+    return products
+
+
+def extract_gene_names(fields):
+    """The gene names of the targets of a drug, from the ElementFields of its <drug>."""
+    gene_names = []
+    for target in fields.findall("targets/target"):
+        gene_name_tag = ElementFields(target).find("polypeptide/gene-name")
+        if gene_name_tag is not None:
+            gene_names.append(gene_name_tag.text)
+    return gene_names
+
+
+def extract_gene_interactions(fields):
+    """The (interacting drug name, interacting drug id) tuples of a drug, from the ElementFields of its <drug>."""
+    interactions = []
+    for interaction in fields.findall("drug-interactions/drug-interaction"):
+        interaction_fields = ElementFields(interaction)
+        interactions.append((interaction_fields.find("name").text, interaction_fields.find("drugbank-id").text))
+    return interactions
+
+
+def extract_gene_rows(drug):
+    """
+    Extracts everything parse_genes needs from a single top-level <drug> element.
 
+    Returns: a single [DrugBank_ID, products, drug name, gene names, interactions] row, where products is a
+    list of (product name, product id, product id type) tuples and interactions is a list of
+    (interacting drug name, interacting drug id) tuples.
+    """
+    fields = ElementFields(drug)
+    drug_id = fields.text("drugbank-id[@primary='true']")
+    drug_name = fields.find("name").text
+    return [(drug_id, extract_gene_products(fields), drug_name, extract_gene_names(fields),
+             extract_gene_interactions(fields))]
+
+
+# The normalized tables behind parse_genes:
+#   genes: ["DrugBank_ID", "Drug", "Gene"], one row per gene a drug interacts with,
+#   interactions: ["DrugBank_ID", "Interacting_Drug", "Interacting_Drug_ID"], one row per interacting drug,
+#   products: ["Product_Name", "Product_ID", "Product_ID_Type"] indexed by the DrugBank_ID of the drug in the product.
+GeneTables = namedtuple("GeneTables", ["genes", "interactions", "products"])
+
+GENE_COLUMNS = ["Gene", "Drug", "Interacting_Drug", "Product_Name", "Product_ID", "Product_ID_Type"]
+GENE_DTYPES = {"DrugBank_ID": "string", "Drug": "string", "Gene": "string", "Interacting_Drug": "string",
+               "Interacting_Drug_ID": "string", "Product_Name": "string", "Product_ID": "string",
+               "Product_ID_Type": "category"}
+
+
+def build_gene_tables(rows):
+    """Builds the normalized drug -> gene, drug -> interacting drug and drug -> product tables."""
+    gene_data = ColumnBuffer(["DrugBank_ID", "Drug", "Gene"])
+    interaction_data = ColumnBuffer(["DrugBank_ID", "Interacting_Drug", "Interacting_Drug_ID"])
+    product_data = ColumnBuffer(["DrugBank_ID", "Product_Name", "Product_ID", "Product_ID_Type"])
+    drug_products_dict = {}
+
+    for drug_id, products, drug_name, gene_names, interactions in rows:
+        # Only the last drug with a given DrugBank ID keeps its products.
         drug_products_dict[drug_id] = products
+        gene_data.extend((drug_id, drug_name, gene_name) for gene_name in gene_names)
+        interaction_data.extend((drug_id, name, interaction_id) for name, interaction_id in interactions)
+
+    product_data.extend((drug_id, *product) for drug_id, products in drug_products_dict.items() for product in products)
+
+    genes = gene_data.to_frame(GENE_DTYPES).drop_duplicates()
+    interactions = interaction_data.to_frame(GENE_DTYPES).drop_duplicates()
+    products = product_data.to_frame(GENE_DTYPES).drop_duplicates().set_index("DrugBank_ID")
+
+    return GeneTables(genes, interactions, products)
+
+
+def explode_gene_tables(tables):
+    """
+    Joins the normalized gene tables into the gene -> interacting drug -> product dataframe.
+
+    Returns: a dataframe with columns ["Gene", "Drug", "Interacting_Drug", "Product_Name", "Product_ID",
+    "Product_ID_Type"] with a row for each product of each drug interacting with a drug targeting the gene.
+    """
+    # Only interactions with drugs having products can produce a row, so drop the others before joining genes.
+    interactions = tables.interactions[tables.interactions["Interacting_Drug_ID"].isin(tables.products.index)]
+    pairs = tables.genes.merge(interactions, on="DrugBank_ID", sort=False)
+    df = pairs.join(tables.products, on="Interacting_Drug_ID", how="inner")
+
+    # Drugs with different IDs can still give the same rows, e.g. two entries with the same name and products.
+    return df[GENE_COLUMNS].drop_duplicates().reset_index(drop=True)
+
+
+def build_genes(rows, explode=True):
+    """Builds the gene -> interacting drug -> product dataframe, or its normalized tables, out of the extracted rows."""
+    tables = build_gene_tables(rows)
+    return explode_gene_tables(tables) if explode else tables
+
+
+def parse_genes(root, explode=True):
+    """
+    Extracts drug-gene interactions and their related drug products from XML.
+
+    Returns: the gene -> interacting drug -> product dataframe, or with explode=False the normalized GeneTables
+    (genes, interactions, products) it is joined from, which avoid materializing every combination.
+    """
+    rows = ColumnBuffer(GENE_ROW_COLUMNS)
+
+    for drug in iter_drugs(root):
+        rows.extend(extract_gene_rows(drug))
+
+    return build_genes(rows, explode)
+
+
+# Per-table (extractor, builder, row columns) triples. The extractor turns a single top-level <drug> element
+# into a list of rows, the builder turns the rows of all drugs into the same result as parse_<table>.
+TABLE_PARSERS = {
+    "drugs": (extract_drug_rows, build_drugs, DRUG_COLUMNS),
+    "synonyms": (extract_synonym_rows, build_synonyms, SYNONYM_COLUMNS),
+    "products": (extract_product_rows, build_products, PRODUCT_COLUMNS),
+    "product_table": (extract_product_table_rows, build_product_table, PRODUCT_TABLE_COLUMNS),
+    "pathways": (extract_pathway_rows, build_pathways, PATHWAY_COLUMNS),
+    "targets": (extract_target_rows, build_targets, TARGET_COLUMNS),
+    "approval_status": (extract_approval_status_rows, build_approval_status, APPROVAL_STATUS_COLUMNS),
+    "drug_interactions": (extract_drug_interaction_rows, build_drug_interactions, DRUG_INTERACTION_COLUMNS),
+    "genes": (extract_gene_rows, build_genes, GENE_ROW_COLUMNS),
+}
+
+TABLES = tuple(TABLE_PARSERS)
+
 
-    for drug in root.findall(f"{NS_URL}drug"):
-        drug_name = drug.find(f"{NS_URL}name").text
+def check_tables(tables):
+    """Makes sure every requested table has a parser and returns the tables as a tuple."""
+    tables = tuple(tables)
+    unknown = [table for table in tables if table not in TABLE_PARSERS]
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(unknown)}. Available tables: {', '.join(TABLES)}")
+    return tables
 
-        # Extract interacting genes
-        for target in drug.findall(f"{NS_URL}targets/{NS_URL}target"):
-            gene_name_tag = target.find(f"{NS_URL}polypeptide/{NS_URL}gene-name")
-            if gene_name_tag is not None:
-                gene_name = gene_name_tag.text
 
-                # Extract interacting drugs
-                interactions = [interaction.find(f"{NS_URL}name").text for interaction in
-                                drug.findall(f"{NS_URL}drug-interactions/{NS_URL}drug-interaction")]
-                interaction_ids = [interaction.find(f"{NS_URL}drugbank-id").text for interaction in
-                                   drug.findall(f"{NS_URL}drug-interactions/{NS_URL}drug-interaction")]
+def extract_rows(drugs, tables=TABLES):
+    """
+    Runs the extractor of every requested table on each of the given <drug> elements.
+
+    Returns: a dict mapping each table name to a ColumnBuffer with the rows extracted from all drugs.
+    """
+    tables = check_tables(tables)
+    extractors = [(TABLE_PARSERS[table][0], ColumnBuffer(TABLE_PARSERS[table][2])) for table in tables]
+
+    for drug in drugs:
+        for extractor, rows in extractors:
+            rows.extend(extractor(drug))
 
-                # Extract products for each interaction drug
-                for interaction, interaction_id in zip(interactions, interaction_ids):
-                    if interaction_id in drug_products_dict:
-                        products = drug_products_dict[interaction_id]
-                        for product_name, product_id, product_id_type in products:
-                            data.append((gene_name, drug_name, interaction, product_name, product_id, product_id_type))
+    return {table: rows for table, (_, rows) in zip(tables, extractors)}
 
-    df = pd.DataFrame(data,
-                      columns=["Gene", "Drug", "Interacting_Drug", "Product_Name", "Product_ID", "Product_ID_Type"])
 
-    return df.drop_duplicates()
+def build_tables(rows, tables=TABLES):
+    """Builds the result of every requested table out of the rows returned by extract_rows."""
+    return {table: TABLE_PARSERS[table][1](rows[table]) for table in check_tables(tables)}
 
 
-def get_uniprot_cards_page(query, sleep_time=2):
+def parse_all(root, tables=TABLES):
+    """
+    Parses DrugBank XML into several tables at once, visiting each top-level <drug> element only once.
+
+    Returns: a dict mapping each requested table name to the same result as its parse_<table> function,
+    e.g. parse_all(root, tables=("drugs", "targets"))["targets"] == parse_targets(root).
+    """
+    tables = check_tables(tables)
+    return build_tables(extract_rows(iter_drugs(root), tables), tables)
+
+
+UNIPROT_SEARCH_URL = "https://www.uniprot.org/uniprotkb"
+HUMAN_TAXON_ID = 9606
+
+# Targets looked up with a single query. All their cards have to fit on the first page of the results.
+UNIPROT_BATCH_SIZE = 5
+
+# A lookup gives up after UNIPROT_TIMEOUT seconds in total, and each wait for an element after UNIPROT_STEP_TIMEOUT.
+UNIPROT_TIMEOUT = 30
+UNIPROT_STEP_TIMEOUT = 10
+# How often an explicit wait checks the page.
+WAIT_POLL_SECONDS = 0.05
+
+CARDS_RADIO_XPATH = "//span[@role='radiogroup']//label[span[normalize-space()='Cards']]//input[@type='radio']"
+VIEW_RESULTS_XPATH = ("//button[contains(@class, 'button') and contains(@class, 'primary') and @type='submit' "
+                      "and normalize-space()='View results']")
+CARD_XPATH = "//section[contains(concat(' ', normalize-space(@class), ' '), ' card ')]"
+
+
+def wait_until(driver, condition, deadline, step_timeout=UNIPROT_STEP_TIMEOUT):
+    """
+    Waits until the expected condition holds and returns its value, for at most step_timeout seconds
+    and never past the deadline (a time.monotonic() value). Raises TimeoutException otherwise.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutException("The lookup timed out.")
+    return WebDriverWait(driver, min(step_timeout, remaining), poll_frequency=WAIT_POLL_SECONDS).until(condition)
+
+
+def get_uniprot_cards_page(query, timeout=UNIPROT_TIMEOUT, driver=None, base_url=UNIPROT_SEARCH_URL,
+                           step_timeout=UNIPROT_STEP_TIMEOUT, headless=True):
     """
     Opens UniProt search results for the given query, switches to the "Cards" view
     by clicking the radio button, clicks the "View results" button, and returns the rendered HTML.
+
+    Every step waits only until its element is there (the radio button, the submit button and finally the
+    rendered cards), at most step_timeout seconds each and timeout seconds in total. If the cards do not show up
+    in time, the page is returned as it is.
+
+    With a driver (e.g. a session of a WebDriverPool) the page is opened in it and the driver is left open,
+    otherwise a new Chrome (headless unless headless=False) is started for this query only.
     """
-    options = webdriver.ChromeOptions()
-    # Uncomment the next line to run headless:
-    # options.add_argument("--headless")
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()),
-                              options=options)
+    if driver is None:
+        driver = chrome_driver(headless=headless)
+        try:
+            return get_uniprot_cards_page(query, timeout, driver, base_url, step_timeout)
+        finally:
+            driver.quit()
 
-    url = f"https://www.uniprot.org/uniprotkb?query={query.replace(' ', '+')}"
+    deadline = time.monotonic() + timeout
+    url = f"{base_url}?query={quote_plus(query)}"
     driver.get(url)
-    time.sleep(sleep_time)
 
     try:
         # Click on the "Cards" radio button.
-        cards_radio = driver.find_element(
-            By.XPATH,
-            "//span[@role='radiogroup']//label[span[normalize-space()='Cards']]//input[@type='radio']"
-        )
+        cards_radio = wait_until(driver, EC.element_to_be_clickable((By.XPATH, CARDS_RADIO_XPATH)), deadline,
+                                 step_timeout)
         if not cards_radio.is_selected():
             cards_radio.click()
-    except Exception as e:
+    except WebDriverException as e:
         print("Could not switch to Cards view:", e)
 
     try:
         # Click the "View results" button.
-        view_results_btn = driver.find_element(
-            By.XPATH,
-            "//button[contains(@class, 'button') and contains(@class, 'primary') and @type='submit' and normalize-space()='View results']"
-        )
+        view_results_btn = wait_until(driver, EC.element_to_be_clickable((By.XPATH, VIEW_RESULTS_XPATH)), deadline,
+                                      step_timeout)
         view_results_btn.click()
-        time.sleep(sleep_time)
-    except Exception as e:
+    except WebDriverException as e:
         print("Could not click 'View results' button:", e)
 
-    html = driver.page_source
-    driver.quit()
-    return html
+    try:
+        wait_until(driver, EC.presence_of_all_elements_located((By.XPATH, CARD_XPATH)), deadline, step_timeout)
+    except WebDriverException as e:
+        print(f"No cards rendered for '{query}':", e)
+
+    return driver.page_source
 
 
-def get_amino_acid_count_from_html(html, target_name):
+UniProtCard = namedtuple("UniProtCard", ["entry", "protein_name", "organism", "length", "text"])
+
+HUMAN_PATTERN = re.compile("Homo sapiens", re.IGNORECASE)
+AMINO_ACIDS_PATTERN = re.compile(r"(\d+)\s+amino\s+acids", re.IGNORECASE)
+CARD_SEPARATOR_PATTERN = re.compile(r"\s*·\s*")
+
+
+def class_xpath(tag, class_name):
+    """An XPath step selecting the tag elements having class_name among their classes."""
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+def normalize_protein_name(text):
+    """Case folds a protein name and collapses its whitespace, so the names of the cards and targets can be compared."""
+    return " ".join(text.casefold().split())
+
+
+def parse_uniprot_cards(html):
     """
-    Parse the provided HTML using BeautifulSoup to search for a UniProt card matching target_name
-    and extract the amino acid count.
+    Parses every card of a UniProt results page (in the "Cards" view) with lxml.
 
     Returns:
-        aa_count (int): The amino acid count for the given target_name.
+        list of UniProtCard(entry, protein_name, organism, length, text), where text is the normalized text
+        of the card content and length the amino acid count (None if the card has none).
     """
-    soup = BeautifulSoup(html, "html.parser")
-    # UniProt cards are contained in <section class="card"> elements.
-    cards = soup.find_all("section", class_="card")
-    if not cards:
-        print("No cards found on the page. The layout may have changed.")
-        return None
-
-    for card in cards:
-        # Extract entry title from the header
-        header = card.find("h2", class_="small")
+    if not html or not html.strip():
+        return []
+    cards = []
+    for card in lxml.html.fromstring(html).xpath(CARD_XPATH):
+        header = card.xpath(class_xpath("h2", "small"))
         if not header:
             continue
+        content = card.xpath(class_xpath("div", "card__content"))
+        text = " ".join(content[0].text_content().split()) if content else ""
 
-        # Extract full card content (where the full protein name appears)
-        card_content = card.find("div", class_="card__content")
-        card_text = card_content.get_text(" ", strip=True) if card_content else ""
+        # The organism is the taxonomy link of the card, or any link with a title.
+        organism = card.xpath(".//a[contains(@href, '/taxonomy/')]/@title") or card.xpath(".//a/@title")
+        length = AMINO_ACIDS_PATTERN.search(text)
+        cards.append(UniProtCard(CARD_SEPARATOR_PATTERN.split(header[0].text_content().strip())[0],
+                                 CARD_SEPARATOR_PATTERN.split(text)[0], organism[0] if organism else None,
+                                 int(length.group(1)) if length else None, normalize_protein_name(text)))
+    return cards
 
-        if target_name.lower() not in card_text.lower():
-            continue  # Skip this entry if the name is not found in card content
 
-        # Ensure the organism is Homo sapiens
-        organism_tag = card.find("a", title=re.compile("Homo sapiens", re.IGNORECASE))
-        if organism_tag is None:
-            continue
+class UniProtCardIndex:
+    """
+    The cards of a UniProt results page indexed by their normalized protein names, so every target of a batched
+    query is resolved with a dictionary lookup instead of searching the text of every card again.
 
-        # Extract amino acid count
-        match = re.search(r"(\d+)\s+amino\s+acids", card_text, re.IGNORECASE)
-        if match:
-            aa_count = int(match.group(1))
-            print(f"Found target '{target_name}' with {aa_count} amino acids.")
-            return aa_count
+    A target resolves to the first human card with a length whose protein name is the target name, or else
+    whose content mentions the target name (e.g. a gene name or an alternative name).
+    """
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.by_name = {}
+        for card in cards:
+            self.by_name.setdefault(normalize_protein_name(card.protein_name), []).append(
+                (card.organism, card.length))
+
+    @classmethod
+    def from_html(cls, html):
+        return cls(parse_uniprot_cards(html))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def amino_acid_count(self, target_name):
+        """Returns the amino acid count of the human protein with the given name, or None if there is none."""
+        name = normalize_protein_name(target_name)
+        for organism, length in self.by_name.get(name, []):
+            if organism and HUMAN_PATTERN.search(organism) and length is not None:
+                return length
+        for card in self.cards:
+            if name in card.text and card.organism and HUMAN_PATTERN.search(card.organism) \
+                    and card.length is not None:
+                return card.length
+        return None
 
-    print(f"No matching UniProt entry found for target '{target_name}'.")
-    return None
 
+def get_amino_acid_count_from_html(html, target_name):
+    """
+    Parse the provided HTML to search for a UniProt card matching target_name
+    and extract the amino acid count.
 
-def get_amino_acid_count_for_target(target_name):
+    Returns:
+        aa_count (int): The amino acid count for the given target_name.
+    """
+    index = UniProtCardIndex.from_html(html)
+    if not len(index):
+        print("No cards found on the page. The layout may have changed.")
+        return None
+
+    aa_count = index.amino_acid_count(target_name)
+    if aa_count is not None:
+        print(f"Found target '{target_name}' with {aa_count} amino acids.")
+    else:
+        print(f"No matching UniProt entry found for target '{target_name}'.")
+    return aa_count
+
+
+def get_amino_acid_count_for_target(target_name, pool=None):
     """
     Combines the functionality: queries UniProt for the target name, clicks the "Cards" radio button,
     then clicks the "View results" button, and returns the amino acid count.
+    With a WebDriverPool the lookup runs in one of its sessions instead of a new browser.
 
     Returns:
         aa_count (int): The amino acid count for the given target_name.
     """
+    if pool is not None:
+        return pool.run(lookup_amino_acid_count, target_name)
     html = get_uniprot_cards_page(target_name)
     aa_count = get_amino_acid_count_from_html(html, target_name)
     return aa_count
 
 
-def get_target_amino_acid_count_for_drug(drug_id, targets):
+def lookup_amino_acid_count(driver, target_name, timeout=UNIPROT_TIMEOUT, base_url=UNIPROT_SEARCH_URL,
+                            step_timeout=UNIPROT_STEP_TIMEOUT):
+    """Looks the amino acid count of the target up on UniProt in an open WebDriver session (see WebDriverPool.run)."""
+    html = get_uniprot_cards_page(target_name, timeout, driver, base_url, step_timeout)
+    return get_amino_acid_count_from_html(html, target_name)
+
+
+def batch_query(target_names):
+    """A single UniProt query finding the human proteins with any of the target names."""
+    phrases = " OR ".join(f'"{name.replace(chr(34), " ")}"' for name in target_names)
+    return f"({phrases}) AND (organism_id:{HUMAN_TAXON_ID})"
+
+
+def batches(items, size):
+    """Splits the list into consecutive lists of at most size items."""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def count_targets(html, target_names):
+    """Resolves every target name against the cards of a single results page."""
+    index = UniProtCardIndex.from_html(html)
+    counts = [index.amino_acid_count(target_name) for target_name in target_names]
+    print(f"Found {sum(count is not None for count in counts)} of {len(target_names)} targets "
+          f"in {len(index)} UniProt cards.")
+    return counts
+
+
+def get_amino_acid_counts_for_targets(target_names):
+    """
+    Looks the amino acid counts of several targets up with one UniProt query and one results page.
+
+    Returns:
+        list of the amino acid counts (None for the targets which were not found), in the order of target_names.
+    """
+    html = get_uniprot_cards_page(batch_query(target_names))
+    return count_targets(html, target_names)
+
+
+def lookup_amino_acid_counts(driver, target_names, timeout=UNIPROT_TIMEOUT, base_url=UNIPROT_SEARCH_URL,
+                             step_timeout=UNIPROT_STEP_TIMEOUT):
+    """Looks the amino acid counts of several targets up with one UniProt query in an open WebDriver session."""
+    html = get_uniprot_cards_page(batch_query(target_names), timeout, driver, base_url, step_timeout)
+    return count_targets(html, target_names)
+
+
+# The count a lookup gives for a target it could not look up (e.g. its WebDriver session failed), unlike None for
+# a target UniProt does not have. An AminoAcidCache does not store it, so the target is looked up again next time.
+LOOKUP_FAILED = object()
+
+
+def amino_acid_lookup(pool=None, batch_size=UNIPROT_BATCH_SIZE):
+    """
+    Returns a function looking up the amino acid counts of a list of target names on UniProt, batch_size targets
+    per query, in the sessions of the WebDriverPool if there is one. It is the lookup used with an AminoAcidCache.
+    The targets of a batch whose session failed on every attempt get LOOKUP_FAILED instead of a count.
+    """
+    def lookup(target_names):
+        chunks = batches(list(target_names), batch_size)
+        if pool is not None:
+            # A batch whose session failed on every attempt gives None.
+            results = pool.map(lookup_amino_acid_counts, chunks)
+        else:
+            results = [get_amino_acid_counts_for_targets(chunk) for chunk in chunks]
+        return [count for chunk, counts in zip(chunks, results)
+                for count in (counts if counts is not None else [LOOKUP_FAILED] * len(chunk))]
+    return lookup
+
+
+def get_target_amino_acid_count_for_drug(drug_id, targets, pool=None, cache=None):
     """
     Gets amino acid count for each target for a given drug and records in a data frame.
+    The counts parsed from the polypeptide sequences in the XML (the "Amino_Acid_Count" column of parse_targets)
+    are used as they are, UniProt is only searched for the targets without a sequence.
+    The targets are looked up UNIPROT_BATCH_SIZE at a time, with a single query each. With a WebDriverPool
+    those lookups reuse its sessions and run in parallel, and with an AminoAcidCache only the targets which
+    are not cached are looked up.
 
     Returns:
         DataFrame["DrugBank_ID", "Target_Name", "Amino_Acid_count"]
@@ -470,9 +865,23 @@ def get_target_amino_acid_count_for_drug(drug_id, targets):
         return None
 
     print(f"Finding amino acid counts for targets for DrugBank_ID {drug_id}:")
+    drug_targets = targets[targets["DrugBank_ID"] == drug_id]
+    parsed_counts = drug_targets["Amino_Acid_Count"] if "Amino_Acid_Count" in drug_targets \
+        else pd.Series(pd.NA, index=drug_targets.index)
+
+    target_names = drug_targets["Target_Name"].tolist()
+    counts = [None if pd.isna(aa_count) else int(aa_count) for aa_count in parsed_counts]
+    # Targets without a name cannot be looked up and get no count, like in AminoAcidCache.get_many.
+    missing = [target_name for target_name, aa_count in zip(target_names, counts)
+               if aa_count is None and not pd.isna(target_name)]
+    lookup = amino_acid_lookup(pool)
+    found = iter(cache.get_many(missing, lookup) if cache is not None else
+                 [None if count is LOOKUP_FAILED else count for count in lookup(missing)])
+
     data = []
-    for target_name in targets.loc[targets["DrugBank_ID"] == drug_id, "Target_Name"].values:
-        aa_count = get_amino_acid_count_for_target(target_name)
+    for target_name, aa_count in zip(target_names, counts):
+        if aa_count is None and not pd.isna(target_name):
+            aa_count = next(found)
         data.append((drug_id, target_name, aa_count))
 
     return pd.DataFrame(data, columns=["DrugBank_ID", "Target_Name", "Amino_Acid_Count"])
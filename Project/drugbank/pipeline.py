@@ -0,0 +1,221 @@
+# drugbank/pipeline.py
+import multiprocessing
+import os
+import queue
+import traceback
+
+from lxml import etree
+
+from .iter_parsers import NS_URL, RECORD_TABLES, DrugContext
+from .parallel import DRUG_TAG_PATTERN, ROOT_TAG_PATTERN
+from .xml_source import open_xml
+
+# The reader reads the file in chunks of this many bytes.
+READ_CHUNK_SIZE = 1 << 20
+# Number of drugs sent to a worker at once.
+DEFAULT_PIPELINE_BATCH_SIZE = 200
+# Number of batches waiting for a worker. When the queue is full, the reader waits.
+DEFAULT_QUEUE_DEPTH = 8
+# Bytes kept from the end of a chunk while outside of a drug, so a tag cut by the chunk boundary is scanned again.
+TAG_OVERLAP = 16
+# Seconds to wait for a result before checking that the reader and the workers are still alive.
+RESULT_POLL_SECONDS = 1.0
+
+
+def read_envelope(path):
+    """
+    Reads the start of the DrugBank XML file (plain or a .zip/.gz/.xz archive) up to the first <drug> element:
+    the XML declaration and the start tag of the root element with its namespaces, and builds the matching
+    closing tag. Every block of drugs is wrapped in them, so it parses the same as in the whole file.
+    """
+    head = b""
+    with open_xml(path, memory_map=False) as file:
+        while True:
+            chunk = file.read(READ_CHUNK_SIZE)
+            head += chunk
+            match = DRUG_TAG_PATTERN.search(head)
+            if match or not chunk:
+                break
+    prefix = head[:match.start()] if match else head
+    root_tag = ROOT_TAG_PATTERN.search(prefix)
+    if root_tag is None:
+        raise ValueError(f"No root element found in {path}.")
+    return prefix, b"</" + root_tag.group(1) + b">"
+
+
+def iter_drug_blocks(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Streams the raw bytes of the top-level <drug>...</drug> elements out of the DrugBank XML file
+    (plain or a .zip/.gz/.xz archive), without parsing them. Like scan_drug_offsets, the <drug> stubs nested
+    in pathways stay inside their top-level drug, but the file is read in chunks, so it does not have to be
+    a plain file and only the drug being read is kept in memory.
+    """
+    with open_xml(path, memory_map=False) as file:
+        buffer = b""
+        position = 0
+        depth = 0
+        start = None
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            cut_tag = None
+            for match in DRUG_TAG_PATTERN.finditer(buffer, position):
+                tag_end = buffer.find(b">", match.end())
+                if tag_end == -1:
+                    # The tag continues in the next chunk.
+                    cut_tag = match.start()
+                    break
+                position = tag_end + 1
+                if match.group(1):
+                    depth -= 1
+                    if depth == 0:
+                        yield buffer[start:position]
+                        start = None
+                elif buffer[tag_end - 1:tag_end] != b"/":
+                    if depth == 0:
+                        start = match.start()
+                    depth += 1
+
+            # Keep the drug being read, or only the end of the chunk between drugs.
+            if start is not None:
+                keep = start
+            elif cut_tag is not None:
+                keep = cut_tag
+            else:
+                keep = max(position, len(buffer) - TAG_OVERLAP)
+            if cut_tag is not None:
+                position = cut_tag
+            buffer = buffer[keep:]
+            position -= keep
+            if start is not None:
+                start = 0
+
+
+def batches(blocks, batch_size):
+    batch = []
+    for block in blocks:
+        batch.append(block)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_drug_blocks(prefix, suffix, blocks, tables):
+    """Parses a batch of <drug> blocks wrapped in the root element and extracts the records of the tables."""
+    root = etree.fromstring(prefix + b"".join(blocks) + suffix, parser=etree.XMLParser(huge_tree=True))
+    extractors = [(table, RECORD_TABLES[table]) for table in tables]
+    records = {table: [] for table in tables}
+    for drug in root.iterchildren(f"{NS_URL}drug"):
+        context = DrugContext(drug)
+        if context.drug_id is None:
+            continue
+        for table, extract in extractors:
+            records[table].extend(extract(context))
+    return records
+
+
+def read_batches(path, batch_size, tasks, credits, results, workers):
+    """The reader process: puts the numbered batches of drug blocks on the task queue, then one stop per worker."""
+    try:
+        for index, batch in enumerate(batches(iter_drug_blocks(path), batch_size)):
+            credits.acquire()
+            tasks.put((index, batch))
+    except Exception:
+        results.put(("error", "reader", traceback.format_exc()))
+    finally:
+        for _ in range(workers):
+            tasks.put(None)
+
+
+def parse_batches(prefix, suffix, tables, tasks, results):
+    """A worker process: parses batches from the task queue until it gets a stop."""
+    while True:
+        task = tasks.get()
+        if task is None:
+            results.put(("done", None, None))
+            return
+        index, blocks = task
+        try:
+            results.put(("batch", index, parse_drug_blocks(prefix, suffix, blocks, tables)))
+        except Exception:
+            results.put(("error", index, traceback.format_exc()))
+            return
+
+
+def iter_records_parallel(path, tables=tuple(RECORD_TABLES), workers=None, batch_size=DEFAULT_PIPELINE_BATCH_SIZE,
+                          queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    Streams the records of the given tables out of a DrugBank XML file (plain or a .zip/.gz/.xz archive)
+    with a pipeline of processes:
+
+    - a reader process cuts the raw <drug>...</drug> blocks out of the file and puts them, batch_size drugs
+      at a time, on a task queue of at most queue_depth batches,
+    - worker processes parse the batches and run the iter_parsers extractors on them,
+    - the results are put back in document order by a reorder buffer in the calling process.
+
+    The reader may be at most queue_depth + workers batches ahead of the consumer, so a slow consumer or worker
+    holds the reader back instead of letting the results pile up in memory. An error in the reader or a worker,
+    or a process which dies, raises RuntimeError.
+
+    Yields:
+        (table, records) pairs like iter_records, one per table and batch of drugs that has records.
+        The records of every table come in the same order as from iter_records.
+    """
+    unknown = [table for table in tables if table not in RECORD_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(unknown)}")
+    if batch_size < 1 or queue_depth < 1:
+        raise ValueError("The batch size and the queue depth have to be positive.")
+    workers = workers or os.cpu_count() or 1
+    tables = tuple(tables)
+
+    prefix, suffix = read_envelope(path)
+    tasks = multiprocessing.Queue(queue_depth)
+    results = multiprocessing.Queue()
+    credits = multiprocessing.Semaphore(queue_depth + workers)
+    processes = [multiprocessing.Process(target=read_batches, daemon=True,
+                                         args=(path, batch_size, tasks, credits, results, workers))]
+    processes += [multiprocessing.Process(target=parse_batches, daemon=True,
+                                          args=(prefix, suffix, tables, tasks, results))
+                  for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    try:
+        pending = {}
+        next_index = 0
+        running = workers
+        while running:
+            try:
+                kind, index, value = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                # A process killed (e.g. by the OOM killer) sends neither its results nor its stop.
+                for process in processes:
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError(f"The pipeline {'reader' if process is processes[0] else 'worker'} "
+                                           f"died with exit code {process.exitcode}.")
+                continue
+            if kind == "done":
+                running -= 1
+                continue
+            if kind == "error":
+                raise RuntimeError(f"The pipeline failed on {'the reader' if index == 'reader' else f'batch {index}'}:"
+                                   f"\n{value}")
+
+            pending[index] = value
+            while next_index in pending:
+                records = pending.pop(next_index)
+                credits.release()
+                next_index += 1
+                for table in tables:
+                    if records[table]:
+                        yield table, records[table]
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
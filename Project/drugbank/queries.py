@@ -0,0 +1,87 @@
+# drugbank/queries.py
+import sqlite3
+
+
+def connect(db_path):
+    """Opens the exported DrugBank database read-only. Rows are returned as sqlite3.Row."""
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def fetch_all(connection, query, parameters=()):
+    return [dict(row) for row in connection.execute(query, parameters)]
+
+
+def get_drug(connection, drug_id):
+    """Returns the details of the drug as a dict, or None if there is no such drug."""
+    row = connection.execute("SELECT * FROM drugs WHERE drugbank_id = ?", (drug_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_pathway_count(connection, drug_id):
+    """Returns the number of pathways the drug takes part in, or None if the drug is not in any pathway."""
+    count = connection.execute("SELECT COUNT(*) FROM pathways WHERE drugbank_id = ?", (drug_id,)).fetchone()[0]
+    return count or None
+
+
+def get_pathways(connection, drug_id):
+    """Returns the names of the pathways the drug takes part in."""
+    return [row[0] for row in connection.execute(
+        "SELECT pathway FROM pathways WHERE drugbank_id = ? ORDER BY pathway", (drug_id,))]
+
+
+def get_synonyms(connection, drug_id):
+    return [row[0] for row in connection.execute(
+        "SELECT synonym FROM synonyms WHERE drugbank_id = ? ORDER BY synonym", (drug_id,))]
+
+
+def get_products(connection, drug_id):
+    return fetch_all(connection, "SELECT * FROM products WHERE drugbank_id = ? ORDER BY id", (drug_id,))
+
+
+def get_targets(connection, drug_id):
+    return fetch_all(connection, "SELECT * FROM targets WHERE drugbank_id = ? ORDER BY id", (drug_id,))
+
+
+def get_target_drugs(connection, target_id):
+    """Returns the drugs which act on the target with the given DrugBank target ID."""
+    return fetch_all(connection, """
+        SELECT DISTINCT drugs.drugbank_id, drugs.name FROM targets
+        JOIN drugs ON drugs.drugbank_id = targets.drugbank_id
+        WHERE targets.target_id = ? ORDER BY drugs.drugbank_id""", (target_id,))
+
+
+def get_gene_drugs(connection, gene_name):
+    """Returns the drugs whose targets are encoded by the gene."""
+    return fetch_all(connection, """
+        SELECT DISTINCT drugs.drugbank_id, drugs.name, targets.target_id, targets.target_name FROM targets
+        JOIN drugs ON drugs.drugbank_id = targets.drugbank_id
+        WHERE targets.gene_name = ? ORDER BY drugs.drugbank_id""", (gene_name,))
+
+
+def get_interactions(connection, drug_id):
+    """Returns the interactions listed for the drug."""
+    return fetch_all(connection, """
+        SELECT interacting_drug_id, interacting_drug, description FROM drug_interactions
+        WHERE drugbank_id = ? ORDER BY id""", (drug_id,))
+
+
+def get_interacting_drugs(connection, drug_id):
+    """Returns the drugs which list an interaction with the given drug."""
+    return fetch_all(connection, """
+        SELECT drug_interactions.drugbank_id, drugs.name, drug_interactions.description FROM drug_interactions
+        LEFT JOIN drugs ON drugs.drugbank_id = drug_interactions.drugbank_id
+        WHERE drug_interactions.interacting_drug_id = ? ORDER BY drug_interactions.id""", (drug_id,))
+
+
+def search_drugs(connection, text, limit=10):
+    """
+    Full-text search over the description, indications and mechanism of action of the drugs,
+    best matches first. The text uses the SQLite FTS5 query syntax, e.g. "thrombin inhibitor" or "coagul*".
+    """
+    return fetch_all(connection, """
+        SELECT drugs.drugbank_id, drugs.name,
+               snippet(drugs_fts, -1, '[', ']', '...', 12) AS snippet
+        FROM drugs_fts JOIN drugs ON drugs.id = drugs_fts.rowid
+        WHERE drugs_fts MATCH ? ORDER BY bm25(drugs_fts) LIMIT ?""", (text, limit))
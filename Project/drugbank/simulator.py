@@ -1,6 +1,7 @@
 import random
 from datetime import date
 from lxml import etree
+from .xml_source import parse_xml
 
 # The default namespace URL.
 NS_URL = "http://www.drugbank.ca"
@@ -88,12 +89,33 @@ def set_primary_drugbank_id(drug, primary_value=None):
                 del other.attrib["primary"]
 
 
+def write_repeated_drugs(input_file, output_file, total_drugs):
+    """
+    Writes a DrugBank file of total_drugs drugs, made by repeating the top-level drugs of the input file
+    with new consecutive primary IDs (DB000001, DB000002, ...). The drugs are written one at a time,
+    so the output can be far larger than memory, e.g. to check that a streaming parser runs in bounded memory.
+    """
+    templates = parse_xml(input_file).findall(f"{{{NS_URL}}}drug")
+    if not templates:
+        print("No <drug> elements found in the input file.")
+        return
+
+    with etree.xmlfile(output_file, encoding="UTF-8") as xf:
+        xf.write_declaration()
+        with xf.element(f"{{{NS_URL}}}drugbank", nsmap={None: NS_URL}, version="5.1"):
+            for i in range(total_drugs):
+                drug = templates[i % len(templates)]
+                set_primary_drugbank_id(drug, primary_value=f"DB{i + 1:06d}")
+                xf.write(drug)
+                xf.write("\n")
+    print(f"Wrote {total_drugs} drugs to '{output_file}'.")
+
+
 def main(total_drugs, total_consecutive_ids):
     input_file = "data/drugbank_partial.xml"
     output_file = "data/drugbank_partial_generated.xml"
 
-    tree = etree.parse(input_file)
-    root = tree.getroot()
+    root = parse_xml(input_file)
 
     # Use the namespace mapping to find all <drug> elements.
     ns = {"db": NS_URL}
@@ -0,0 +1,224 @@
+# drugbank/sinks.py
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .iter_parsers import RECORD_TABLES, iter_drug_contexts
+from .iter_tables import ProductIndex, gene_batches
+from .parsers import APPROVAL_STATUSES, GENE_COLUMNS, PRODUCT_FIELD_NAMES
+
+# The sinks write out the records they collected every this many drugs.
+DEFAULT_FLUSH_DRUGS = 1000
+
+# The gene table needs the products of other drugs, so it is joined in a ProductIndex (see iter_tables.iter_genes)
+# and written after the per-drug tables of RECORD_TABLES.
+GENE_TABLE = "genes"
+TABLES = (*RECORD_TABLES, GENE_TABLE)
+
+
+def string_schema(*names):
+    return pa.schema([(name, pa.string()) for name in names])
+
+
+# The columns of the records of every table of iter_records, with their Parquet types. A fixed schema keeps
+# every row group of a table the same, whatever values its first batch happens to have.
+RECORD_SCHEMAS = {
+    "drugs": string_schema("DrugBank_ID", "Name", "Type", "State", "Description", "Dosage Form", "Indications",
+                           "Mechanism of Action", "Food Interactions"),
+    "synonyms": pa.schema([("DrugBank_ID", pa.string()), ("Synonyms", pa.list_(pa.string()))]),
+    "products": pa.schema([("DrugBank_ID", pa.string()),
+                           ("Products", pa.list_(pa.struct([(name, pa.string()) for name in PRODUCT_FIELD_NAMES])))]),
+    "product_table": string_schema("DrugBank_ID", *PRODUCT_FIELD_NAMES),
+    "targets": pa.schema([*string_schema("DrugBank_ID", "Drug", "Target_ID", "Target_Name", "Source", "External_ID",
+                                         "Polypeptide_Name", "Gene_Name", "GenAtlas_ID", "Chromosome",
+                                         "Cellular_Location"),
+                          ("Amino_Acid_Count", pa.int64())]),
+    "approval_status": pa.schema([("DrugBank_ID", pa.string()), ("Groups", pa.list_(pa.string())),
+                                  ("Status", pa.struct([(name, pa.int8()) for name in APPROVAL_STATUSES]))]),
+    "drug_interactions": string_schema("DrugBank_ID", "Drug", "Interacting_Drug_ID", "Interacting_Drug",
+                                       "Description"),
+    "pathways": string_schema("DrugBank_ID", "Pathway"),
+    GENE_TABLE: string_schema(*GENE_COLUMNS),
+}
+
+
+class Sink(ABC):
+    """
+    Writes the records of iter_parsers tables to one file per table, in the directory.
+
+    Records are collected by add() and written out by flush(), so the memory used only depends on how often
+    flush() is called. Every file is written under a temporary name and gets its final name (<table>.<extension>)
+    when the sink is closed, so an interrupted conversion does not leave complete-looking files behind.
+    """
+    extension = None
+
+    def __init__(self, directory, tables=TABLES):
+        self.directory = directory
+        self.tables = tuple(tables)
+        self.buffers = {table: [] for table in self.tables}
+        self.counts = dict.fromkeys(self.tables, 0)
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+    def path(self, table):
+        return os.path.join(self.directory, f"{table}.{self.extension}")
+
+    def tmp_path(self, table):
+        return f"{self.path(table)}.{os.getpid()}.tmp"
+
+    def add(self, table, records):
+        self.buffers[table].extend(records)
+
+    def flush(self):
+        """Writes out the collected records of every table."""
+        for table in self.tables:
+            records = self.buffers[table]
+            if records:
+                self.write(table, records)
+                self.counts[table] += len(records)
+                self.buffers[table] = []
+
+    @abstractmethod
+    def write(self, table, records):
+        """Writes out a batch of records of a table to its temporary file."""
+
+    @abstractmethod
+    def finish(self, table):
+        """Completes the temporary file of a table, creating it if the table had no records."""
+
+    def close(self, complete=True):
+        """Writes out the rest of the records and gives the files their final names, or deletes them if not complete."""
+        if complete:
+            self.flush()
+        for table in self.tables:
+            self.finish(table)
+            if complete:
+                os.replace(self.tmp_path(table), self.path(table))
+            elif os.path.exists(self.tmp_path(table)):
+                os.remove(self.tmp_path(table))
+
+
+class ParquetSink(Sink):
+    """Writes every flush of a table as a new row group of its Parquet file."""
+    extension = "parquet"
+
+    def __init__(self, directory, tables=TABLES):
+        super().__init__(directory, tables)
+        self.writers = {}
+
+    def writer(self, table):
+        if table not in self.writers:
+            self.writers[table] = pq.ParquetWriter(self.tmp_path(table), RECORD_SCHEMAS[table])
+        return self.writers[table]
+
+    def write(self, table, records):
+        self.writer(table).write_table(pa.Table.from_pylist(records, schema=RECORD_SCHEMAS[table]))
+
+    def finish(self, table):
+        self.writer(table).close()
+
+
+def csv_value(value):
+    """Lists and dicts (synonyms, products, statuses) are written to CSV cells as JSON."""
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+
+
+class CsvSink(Sink):
+    """Appends every flush of a table to its CSV file, which starts with a header row."""
+    extension = "csv"
+
+    def __init__(self, directory, tables=TABLES):
+        super().__init__(directory, tables)
+        self.files = {}
+
+    def file(self, table):
+        if table not in self.files:
+            file = open(self.tmp_path(table), "w", newline="", encoding="utf-8")
+            csv.writer(file).writerow(RECORD_SCHEMAS[table].names)
+            self.files[table] = file
+        return self.files[table]
+
+    def write(self, table, records):
+        columns = RECORD_SCHEMAS[table].names
+        csv.writer(self.file(table)).writerows([csv_value(record.get(column)) for column in columns]
+                                               for record in records)
+
+    def finish(self, table):
+        self.file(table).close()
+
+
+class NdjsonSink(Sink):
+    """Appends every flush of a table to its NDJSON file, one JSON object per record and line."""
+    extension = "ndjson"
+
+    def __init__(self, directory, tables=TABLES):
+        super().__init__(directory, tables)
+        self.files = {}
+
+    def file(self, table):
+        if table not in self.files:
+            self.files[table] = open(self.tmp_path(table), "w", encoding="utf-8")
+        return self.files[table]
+
+    def write(self, table, records):
+        self.file(table).writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def finish(self, table):
+        self.file(table).close()
+
+
+SINKS = {
+    "parquet": ParquetSink,
+    "csv": CsvSink,
+    "ndjson": NdjsonSink,
+}
+
+
+def convert(xml_path, directory, file_format="parquet", tables=TABLES, flush_drugs=DEFAULT_FLUSH_DRUGS):
+    """
+    Streams the DrugBank XML file (plain or a .zip/.gz/.xz archive) into one file per table in the directory,
+    in the given format (see SINKS). The records are written out every flush_drugs drugs, so the memory used
+    does not grow with the size of the file. With the gene table, the products, genes and interactions of every
+    drug are also written to a temporary ProductIndex, and the gene rows joined from it are written at the end.
+
+    Returns:
+        dict mapping each table to the number of records written.
+    """
+    if file_format not in SINKS:
+        raise ValueError(f"Unknown format: {file_format}. Use one of: {', '.join(SINKS)}")
+    unknown = [table for table in tables if table not in TABLES]
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(unknown)}")
+    if flush_drugs < 1:
+        raise ValueError("The number of drugs between flushes has to be positive.")
+
+    extractors = [(table, RECORD_TABLES[table]) for table in tables if table in RECORD_TABLES]
+    with SINKS[file_format](directory, tables) as sink:
+        index = ProductIndex() if GENE_TABLE in tables else None
+        try:
+            for number, context in enumerate(iter_drug_contexts(xml_path), 1):
+                for table, extract in extractors:
+                    sink.add(table, extract(context))
+                if index is not None:
+                    index.add_drug(context)
+                if number % flush_drugs == 0:
+                    sink.flush()
+
+            if index is not None:
+                index.commit()
+                for batch in gene_batches(index):
+                    sink.add(GENE_TABLE, batch)
+                    sink.flush()
+        finally:
+            if index is not None:
+                index.close()
+    return sink.counts
@@ -0,0 +1,227 @@
+# drugbank/sqlite_export.py
+import os
+import sqlite3
+
+import pandas as pd
+
+from .cache import DEFAULT_CACHE_DIR, load_tables, parse_file
+from .incremental import IncrementalParser
+from .parsers import PARSER_VERSION
+
+DEFAULT_DATABASE_PATH = os.path.join("data", "drugbank.sqlite")
+
+# Tables of parse_all which are written to the database.
+EXPORT_TABLES = ("drugs", "synonyms", "product_table", "pathways", "targets", "drug_interactions")
+
+SCHEMA = """
+CREATE TABLE metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE drugs (
+    id INTEGER PRIMARY KEY,
+    drugbank_id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    type TEXT,
+    state TEXT,
+    description TEXT,
+    dosage_form TEXT,
+    indications TEXT,
+    mechanism_of_action TEXT,
+    food_interactions TEXT
+);
+
+CREATE TABLE synonyms (
+    drugbank_id TEXT NOT NULL REFERENCES drugs (drugbank_id),
+    synonym TEXT NOT NULL,
+    PRIMARY KEY (drugbank_id, synonym)
+);
+
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY,
+    drugbank_id TEXT NOT NULL REFERENCES drugs (drugbank_id),
+    product_name TEXT,
+    manufacturer TEXT,
+    ndc_code TEXT,
+    form TEXT,
+    route TEXT,
+    strength TEXT,
+    country TEXT,
+    approval_agency TEXT
+);
+
+CREATE TABLE pathways (
+    drugbank_id TEXT NOT NULL,
+    pathway TEXT NOT NULL,
+    PRIMARY KEY (drugbank_id, pathway)
+);
+
+CREATE TABLE targets (
+    id INTEGER PRIMARY KEY,
+    drugbank_id TEXT NOT NULL REFERENCES drugs (drugbank_id),
+    target_id TEXT,
+    target_name TEXT,
+    source TEXT,
+    external_id TEXT,
+    polypeptide_name TEXT,
+    gene_name TEXT,
+    genatlas_id TEXT,
+    chromosome TEXT,
+    cellular_location TEXT
+);
+
+CREATE TABLE drug_interactions (
+    id INTEGER PRIMARY KEY,
+    drugbank_id TEXT NOT NULL REFERENCES drugs (drugbank_id),
+    interacting_drug_id TEXT,
+    interacting_drug TEXT,
+    description TEXT
+);
+
+CREATE VIRTUAL TABLE drugs_fts USING fts5(
+    description, indications, mechanism_of_action,
+    content='drugs', content_rowid='id'
+);
+"""
+
+# Secondary indexes, created after the rows are inserted, which is faster than keeping them up to date on every insert.
+INDEXES = """
+CREATE INDEX products_drugbank_id ON products (drugbank_id);
+CREATE INDEX targets_drugbank_id ON targets (drugbank_id);
+CREATE INDEX targets_target_id ON targets (target_id);
+CREATE INDEX targets_gene_name ON targets (gene_name);
+CREATE INDEX drug_interactions_drugbank_id ON drug_interactions (drugbank_id);
+CREATE INDEX drug_interactions_interacting_drug_id ON drug_interactions (interacting_drug_id);
+"""
+
+# Columns of the parsed dataframes written to each database table, in the order of the table's columns.
+TABLE_COLUMNS = {
+    "drugs": ["DrugBank_ID", "Name", "Type", "State", "Description", "Dosage Form", "Indications",
+              "Mechanism of Action", "Food Interactions"],
+    "synonyms": ["DrugBank_ID", "Synonym"],
+    "products": ["DrugBank_ID", "Product Name", "Manufacturer", "NDC Code", "Form", "Route", "Strength", "Country",
+                 "Approval Agency"],
+    "pathways": ["DrugBank_ID", "Pathway"],
+    "targets": ["DrugBank_ID", "Target_ID", "Target_Name", "Source", "External_ID", "Polypeptide_Name", "Gene_Name",
+                "GenAtlas_ID", "Chromosome", "Cellular_Location"],
+    "drug_interactions": ["DrugBank_ID", "Interacting_Drug_ID", "Interacting_Drug", "Description"],
+}
+
+INSERTS = {
+    "drugs": "INSERT OR IGNORE INTO drugs (drugbank_id, name, type, state, description, dosage_form, indications, "
+             "mechanism_of_action, food_interactions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "synonyms": "INSERT OR IGNORE INTO synonyms (drugbank_id, synonym) VALUES (?, ?)",
+    "products": "INSERT INTO products (drugbank_id, product_name, manufacturer, ndc_code, form, route, strength, "
+                "country, approval_agency) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "pathways": "INSERT OR IGNORE INTO pathways (drugbank_id, pathway) VALUES (?, ?)",
+    "targets": "INSERT INTO targets (drugbank_id, target_id, target_name, source, external_id, polypeptide_name, "
+               "gene_name, genatlas_id, chromosome, cellular_location) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "drug_interactions": "INSERT INTO drug_interactions (drugbank_id, interacting_drug_id, interacting_drug, "
+                         "description) VALUES (?, ?, ?, ?)",
+}
+
+
+def frame_rows(df, columns):
+    """Yields the given columns of the dataframe as tuples, with missing values as None."""
+    data = [df[column].astype(object).tolist() for column in columns]
+    for row in zip(*data):
+        yield tuple(None if value is None or value is pd.NA or value != value else value for value in row)
+
+
+def flatten_tables(tables):
+    """
+    Turns the parse_all results into dataframes with one row per database row:
+    one row per synonym instead of a list of them per drug, and the long product table.
+    """
+    flat = {}
+    if "drugs" in tables:
+        flat["drugs"] = tables["drugs"]
+    if "synonyms" in tables:
+        flat["synonyms"] = tables["synonyms"].explode("Synonyms").dropna().rename(columns={"Synonyms": "Synonym"})
+    if "product_table" in tables:
+        flat["products"] = tables["product_table"]
+    if "pathways" in tables:
+        flat["pathways"] = tables["pathways"][0]
+    if "targets" in tables:
+        flat["targets"] = tables["targets"][0]
+    if "drug_interactions" in tables:
+        flat["drug_interactions"] = tables["drug_interactions"].dropna(subset=["DrugBank_ID"])
+    return flat
+
+
+def write_database(tables, db_path, metadata=None):
+    """
+    Writes the parse_all results to a new SQLite database at db_path, replacing the old one.
+
+    The database is built in a temporary file which replaces db_path only when it is complete,
+    so readers never see a half-written database.
+    """
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(SCHEMA)
+        with connection:
+            for table, df in flatten_tables(tables).items():
+                connection.executemany(INSERTS[table], frame_rows(df, TABLE_COLUMNS[table]))
+            connection.executescript(INDEXES)
+            connection.execute("INSERT INTO drugs_fts (drugs_fts) VALUES ('rebuild')")
+            connection.executemany("INSERT INTO metadata (key, value) VALUES (?, ?)",
+                                   [(key, str(value)) for key, value in (metadata or {}).items()])
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, db_path)
+
+
+def source_metadata(xml_path):
+    """Returns what identifies the XML file a database was exported from."""
+    stat = os.stat(xml_path)
+    return {"source": os.path.abspath(xml_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "parser_version": PARSER_VERSION}
+
+
+def read_metadata(db_path):
+    """Returns the metadata of the database, or None if there is no readable database at db_path."""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return dict(connection.execute("SELECT key, value FROM metadata"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+
+
+def export_sqlite(xml_path, db_path=DEFAULT_DATABASE_PATH, use_cache=True, refresh=False,
+                  cache_dir=DEFAULT_CACHE_DIR, incremental=False):
+    """
+    Parses the DrugBank XML file (through the parse cache) and exports it to an SQLite database.
+    With incremental=True only the drugs changed since the previously parsed release are extracted.
+    """
+    parse = IncrementalParser(cache_dir) if incremental else parse_file
+    tables = load_tables(xml_path, EXPORT_TABLES, cache_dir=cache_dir, use_cache=use_cache, refresh=refresh,
+                         parse=parse)
+    write_database(tables, db_path, source_metadata(xml_path))
+    return db_path
+
+
+def ensure_database(xml_path, db_path=DEFAULT_DATABASE_PATH, use_cache=True, refresh=False,
+                    cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns the path of an SQLite database exported from the XML file, exporting it again
+    only if it is missing, was exported from a different version of the file, or refresh is set.
+    """
+    expected = {key: str(value) for key, value in source_metadata(xml_path).items()}
+    if refresh or read_metadata(db_path) != expected:
+        export_sqlite(xml_path, db_path, use_cache=use_cache, refresh=refresh, cache_dir=cache_dir)
+    return db_path
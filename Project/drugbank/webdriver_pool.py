@@ -0,0 +1,202 @@
+# drugbank/webdriver_pool.py
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service as ChromeService
+from webdriver_manager.chrome import ChromeDriverManager
+
+DEFAULT_POOL_SIZE = 2
+
+# A crashed session is replaced by a new one and the lookup is tried again this many times.
+DEFAULT_RETRIES = 1
+
+ACQUIRE_POLL_SECONDS = 0.1
+
+LookupTiming = namedtuple("LookupTiming", ["item", "seconds", "ok", "attempts"])
+PoolStats = namedtuple("PoolStats", ["lookups", "failures", "sessions_started", "restarts", "total_seconds",
+                                     "mean_seconds", "max_seconds"])
+
+
+# Resources the lookups never look at, so the browser does not download them.
+BLOCKED_URL_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+                        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    """Installs the chromedriver matching the local Chrome once per process and returns its path."""
+    return ChromeDriverManager().install()
+
+
+def chrome_options(headless=True, block_resources=True):
+    """
+    The options of the Chrome sessions: headless by default, without images, and returning from get() as soon as
+    the document is parsed ("eager"), since the lookups wait for the elements they need explicitly.
+    """
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = "eager"
+    if headless:
+        options.add_argument("--headless=new")
+    if block_resources:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    return options
+
+
+def chrome_driver(headless=True, block_resources=True):
+    """Starts a new Chrome WebDriver session, headless and blocking images and fonts by default."""
+    driver = webdriver.Chrome(service=ChromeService(chromedriver_path()),
+                              options=chrome_options(headless, block_resources))
+    if block_resources:
+        # Fonts cannot be switched off by an option, so their requests are blocked through the DevTools protocol.
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+class WebDriverPool:
+    """
+    A pool of reusable WebDriver sessions, so a lookup does not pay for starting and quitting a browser.
+
+    Sessions are started lazily, up to size of them, and handed out one lookup at a time. A session which raises
+    a WebDriverException (e.g. the browser crashed or the session is gone) is quit and replaced by a new one,
+    and the lookup is retried. The time of every lookup is recorded in timings and summarized by stats().
+
+    Args:
+        size: the maximum number of sessions, which is also the number of lookups run in parallel by map().
+        driver_factory: a function starting a new session, chrome_driver (headless Chrome) by default.
+        retries: how many times a lookup is retried on a new session after its session failed.
+
+    Example:
+        with WebDriverPool(size=3) as pool:
+            counts = pool.map(lookup_amino_acid_count, target_names)
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, driver_factory=chrome_driver, retries=DEFAULT_RETRIES):
+        if size < 1:
+            raise ValueError("The pool needs at least one session.")
+        self.size = size
+        self.driver_factory = driver_factory
+        self.retries = retries
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.open_sessions = 0
+        self.sessions_started = 0
+        self.restarts = 0
+        self.timings = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def acquire(self):
+        """Returns an idle session, starting a new one if there is none and the pool is not full, else waits for one."""
+        while True:
+            if self.closed:
+                raise RuntimeError("The WebDriver pool is closed.")
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self.lock:
+                start_new = self.open_sessions < self.size
+                if start_new:
+                    self.open_sessions += 1
+            if start_new:
+                break
+            # Wake up now and then, as a broken session frees its place without going back to the idle queue.
+            try:
+                return self.idle.get(timeout=ACQUIRE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            with self.lock:
+                self.open_sessions -= 1
+            raise
+        with self.lock:
+            self.sessions_started += 1
+        return driver
+
+    def release(self, driver, broken=False):
+        """Gives a session back to the pool, or quits it if it is broken, so a new one gets started in its place."""
+        if not broken and not self.closed:
+            self.idle.put(driver)
+            return
+
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Could not quit a WebDriver session: {e}")
+        with self.lock:
+            self.open_sessions -= 1
+            if broken:
+                self.restarts += 1
+
+    def run(self, function, item):
+        """
+        Calls function(driver, item) with a session of the pool and returns its result. If the session fails,
+        it is replaced and the call retried; if every attempt fails, the error is printed and None returned.
+        """
+        start = time.perf_counter()
+        attempts = 0
+        result = None
+        ok = False
+        while attempts <= self.retries:
+            attempts += 1
+            driver = self.acquire()
+            try:
+                result = function(driver, item)
+            except WebDriverException as e:
+                self.release(driver, broken=True)
+                print(f"WebDriver session failed while looking up {item!r} (attempt {attempts}): {e}")
+                continue
+            except Exception:
+                self.release(driver)
+                raise
+            self.release(driver)
+            ok = True
+            break
+
+        with self.lock:
+            self.timings.append(LookupTiming(item, time.perf_counter() - start, ok, attempts))
+        return result
+
+    def map(self, function, items):
+        """Runs function(driver, item) for every item, up to size of them in parallel. Returns the results in order."""
+        items = list(items)
+        if self.size == 1 or len(items) <= 1:
+            return [self.run(function, item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.size, len(items))) as executor:
+            return list(executor.map(lambda item: self.run(function, item), items))
+
+    def stats(self):
+        """Summarizes the recorded lookups."""
+        with self.lock:
+            seconds = [timing.seconds for timing in self.timings]
+            failures = sum(not timing.ok for timing in self.timings)
+            total = sum(seconds)
+            return PoolStats(len(seconds), failures, self.sessions_started, self.restarts, total,
+                             total / len(seconds) if seconds else 0.0, max(seconds, default=0.0))
+
+    def close(self):
+        """Quits all idle sessions. Sessions still in use are quit when they are released."""
+        self.closed = True
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.release(driver)
@@ -0,0 +1,90 @@
+# drugbank/xml_source.py
+import gzip
+import io
+import lzma
+import mmap
+import zipfile
+from contextlib import contextmanager
+
+from lxml import etree
+
+# Leading bytes of the supported archive formats.
+COMPRESSION_MAGIC = {
+    "gz": b"\x1f\x8b",
+    "xz": b"\xfd7zXZ\x00",
+    "zip": b"PK\x03\x04",
+}
+
+# Decompressed data is handed to lxml in blocks of this size.
+READ_BUFFER_SIZE = 1 << 20
+
+
+def detect_compression(path):
+    """Returns "gz", "xz" or "zip" if the file is such an archive (judging by its content, not its name), else None."""
+    with open(path, "rb") as file:
+        head = file.read(6)
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def zip_member(archive):
+    """Returns the name of the XML file inside a zip archive, the way DrugBank releases are packed (one XML file)."""
+    names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    xml_names = [name for name in names if name.lower().endswith(".xml")]
+    if xml_names:
+        return xml_names[0]
+    if len(names) == 1:
+        return names[0]
+    raise ValueError(f"No XML file found in the zip archive {archive.filename}")
+
+
+@contextmanager
+def open_xml(path, memory_map=True):
+    """
+    Opens a DrugBank XML file for reading and yields a binary file object.
+
+    .zip, .gz and .xz archives are decompressed while they are read, through a buffered reader, and plain files
+    are memory-mapped, so no temporary file is written and the uncompressed bytes are never copied into memory whole.
+    With memory_map=False plain files are read through a buffered reader too, so a single pass over a large file
+    does not keep its pages mapped into the process.
+    """
+    compression = detect_compression(path)
+
+    if compression == "zip":
+        with zipfile.ZipFile(path) as archive, archive.open(zip_member(archive)) as member:
+            yield io.BufferedReader(member, READ_BUFFER_SIZE)
+    elif compression in ("gz", "xz"):
+        opener = gzip.open if compression == "gz" else lzma.open
+        with opener(path, "rb") as stream:
+            yield io.BufferedReader(stream, READ_BUFFER_SIZE)
+    elif not memory_map:
+        with open(path, "rb", buffering=READ_BUFFER_SIZE) as file:
+            yield file
+    else:
+        with open(path, "rb") as file:
+            try:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped.
+                yield file
+                return
+            with mapping:
+                yield mapping
+
+
+def parse_xml(path, parser=None):
+    """Parses a DrugBank XML file, plain or compressed, and returns its root element."""
+    with open_xml(path) as source:
+        if isinstance(source, mmap.mmap):
+            # lxml parses straight from the mapped pages.
+            with memoryview(source) as view:
+                return etree.fromstring(view, parser)
+        return etree.parse(source, parser).getroot()
+
+
+def iterparse_xml(path, memory_map=True, **kwargs):
+    """Works like etree.iterparse(path, **kwargs), but also reads compressed files."""
+    with open_xml(path, memory_map) as source:
+        yield from etree.iterparse(source, **kwargs)
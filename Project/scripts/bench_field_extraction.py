@@ -0,0 +1,89 @@
+# scripts/bench_field_extraction.py
+import sys
+import os
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lxml import etree
+
+from drugbank.parsers import NS_URL, iter_drugs, extract_drug_rows, extract_target_rows
+
+relative_file_path = "data/drugbank_partial.xml"
+REPEATS = 5
+
+
+def legacy_drug_row(drug):
+    """The drug details extraction before drugbank.fields: every field is looked up twice."""
+    drug_id_element = drug.find(f"{NS_URL}drugbank-id[@primary='true']")
+    if drug_id_element is None:
+        return None
+    food_interactions = [
+        fi.text for fi in drug.findall(f".//{NS_URL}food-interactions/{NS_URL}food-interaction")
+    ]
+    return {
+        "DrugBank_ID": drug_id_element.text,
+        "Name": drug.find(f"{NS_URL}name").text
+        if drug.find(f"{NS_URL}name") is not None else None,
+        "Type": drug.get("type"),
+        "State": drug.find(f"{NS_URL}state").text
+        if drug.find(f"{NS_URL}state") is not None else None,
+        "Description": drug.find(f"{NS_URL}description").text
+        if drug.find(f"{NS_URL}description") is not None else None,
+        "Dosage Form": drug.find(f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form").text
+        if drug.find(f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form") is not None else None,
+        "Indications": drug.find(f"{NS_URL}indication").text
+        if drug.find(f"{NS_URL}indication") is not None else None,
+        "Mechanism of Action": drug.find(f"{NS_URL}mechanism-of-action").text
+        if drug.find(f"{NS_URL}mechanism-of-action") is not None else None,
+        "Food Interactions": "; ".join(food_interactions) if food_interactions else None,
+    }
+
+
+def legacy_target_rows(drug):
+    """The target extraction before drugbank.fields."""
+    rows = []
+    drug_id = drug.find(f"{NS_URL}drugbank-id[@primary='true']").text
+    drug_name = drug.find(f"{NS_URL}name").text if drug.find(f"{NS_URL}name") is not None else None
+    for target in drug.findall(f".//{NS_URL}target"):
+        target_id = target.find(f"{NS_URL}id").text if target.find(f"{NS_URL}id") is not None else None
+        target_name = target.find(f"{NS_URL}name").text if target.find(f"{NS_URL}name") is not None else None
+        polypeptide = target.find(f"{NS_URL}polypeptide")
+        if polypeptide is None:
+            continue
+        row = [drug_id, drug_name, target_id, target_name, polypeptide.get("source", "Unknown"),
+               polypeptide.get("id", "Unknown")]
+        for tag in ("name", "gene-name", "chromosome-location", "cellular-location"):
+            row.append(polypeptide.find(f"{NS_URL}{tag}").text
+                       if polypeptide.find(f"{NS_URL}{tag}") is not None else "Unknown")
+        genatlas_id = "Unknown"
+        for ext_id in polypeptide.findall(f".//{NS_URL}external-identifier"):
+            resource = ext_id.find(f"{NS_URL}resource").text if ext_id.find(f"{NS_URL}resource") is not None else ""
+            if resource == "GenAtlas":
+                genatlas_id = ext_id.find(f"{NS_URL}identifier").text if ext_id.find(
+                    f"{NS_URL}identifier") is not None else "Unknown"
+                break
+        row.append(genatlas_id)
+        rows.append(row)
+    return rows
+
+
+def per_drug_cost(function, drugs):
+    """Returns the best average time in microseconds of running the function on every drug."""
+    best = min(timeit.repeat(lambda: [function(drug) for drug in drugs], number=1, repeat=REPEATS))
+    return best / len(drugs) * 1e6
+
+
+if __name__ == "__main__":
+    file_path = sys.argv[1] if len(sys.argv) > 1 else relative_file_path
+    root = etree.parse(file_path).getroot()
+    drugs = list(iter_drugs(root))
+    print(f"Benchmarking field extraction on {len(drugs)} drugs from {file_path}:")
+
+    for name, old, new in (
+            ("drug details", legacy_drug_row, extract_drug_rows),
+            ("targets", legacy_target_rows, extract_target_rows),
+    ):
+        old_cost = per_drug_cost(old, drugs)
+        new_cost = per_drug_cost(new, drugs)
+        print(f"{name:>12}: old {old_cost:8.2f} us/drug, new {new_cost:8.2f} us/drug, speedup {old_cost / new_cost:.2f}x")
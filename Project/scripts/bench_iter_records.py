@@ -0,0 +1,52 @@
+# scripts/bench_iter_records.py
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from drugbank.iter_parsers import iter_records
+from drugbank.simulator import write_repeated_drugs
+
+relative_file_path = "data/drugbank_partial.xml"
+DEFAULT_SIZES = (20000, 200000)
+
+
+def measure(path):
+    """Streams every table of the file, dropping the batches, and prints the record count, time and peak RSS."""
+    start = time.perf_counter()
+    records = sum(len(batch) for _, batch in iter_records(path))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux.
+    print(records, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Checks that iter_records streams files in bounded memory.")
+    parser.add_argument("--source", default=relative_file_path, help="file whose drugs are repeated")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of drugs to test")
+    parser.add_argument("--directory", default=os.path.join("data", ".cache"), help="where the files are written")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.measure:
+        measure(args.measure)
+        sys.exit(0)
+
+    os.makedirs(args.directory, exist_ok=True)
+    for size in args.sizes:
+        path = os.path.join(args.directory, f"repeated_{size}.xml")
+        if not os.path.exists(path):
+            write_repeated_drugs(args.source, path, size)
+        # Every size is measured in a fresh process, so the peak RSS is its own.
+        output = subprocess.run([sys.executable, __file__, "--measure", path], check=True, capture_output=True,
+                                text=True).stdout.split()
+        records, elapsed, peak_kb = int(output[0]), float(output[1]), int(output[2])
+        print(f"{size:>8} drugs ({os.path.getsize(path) / 2 ** 20:7.1f} MiB): {records:>9} records "
+              f"in {elapsed:6.1f} s, peak RSS {peak_kb / 1024:6.1f} MiB")
@@ -0,0 +1,52 @@
+# scripts/bench_pipeline.py
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from drugbank.iter_parsers import iter_records
+from drugbank.pipeline import DEFAULT_PIPELINE_BATCH_SIZE, DEFAULT_QUEUE_DEPTH, iter_records_parallel
+from drugbank.simulator import write_repeated_drugs
+
+relative_file_path = "data/drugbank_partial.xml"
+DEFAULT_SIZE = 20000
+
+
+def measure(records):
+    """Drains the (table, records) pairs and returns the number of records and the time it took."""
+    start = time.perf_counter()
+    count = sum(len(batch) for _, batch in records)
+    return count, time.perf_counter() - start
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measures the throughput of the multiprocess pipeline "
+                                                 "for 1 to N worker processes.")
+    parser.add_argument("--source", default=relative_file_path, help="file whose drugs are repeated")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="number of drugs in the tested file")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=list(range(1, (os.cpu_count() or 1) + 1)), help="numbers of workers to test")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_PIPELINE_BATCH_SIZE, help="drugs per batch")
+    parser.add_argument("--queue-depth", type=int, default=DEFAULT_QUEUE_DEPTH, help="batches waiting for a worker")
+    parser.add_argument("--directory", default=os.path.join("data", ".cache"), help="where the file is written")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    os.makedirs(args.directory, exist_ok=True)
+    path = os.path.join(args.directory, f"repeated_{args.size}.xml")
+    if not os.path.exists(path):
+        write_repeated_drugs(args.source, path, args.size)
+
+    print(f"{args.size} drugs, {os.cpu_count()} CPUs, batches of {args.batch_size} drugs, "
+          f"queue depth {args.queue_depth}")
+    records, serial = measure(iter_records(path))
+    print(f"{'iter_records':>14}: {records:>9} records in {serial:6.1f} s, {args.size / serial:8.0f} drugs/s")
+    for workers in args.workers:
+        records, elapsed = measure(iter_records_parallel(path, workers=workers, batch_size=args.batch_size,
+                                                         queue_depth=args.queue_depth))
+        print(f"{workers:>6} workers: {records:>9} records in {elapsed:6.1f} s, {args.size / elapsed:8.0f} drugs/s, "
+              f"{serial / elapsed:4.2f}x iter_records")
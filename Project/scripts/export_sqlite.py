@@ -0,0 +1,35 @@
+# scripts/export_sqlite.py
+import argparse
+import sys
+import os
+from lxml import etree
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from drugbank.cache import DEFAULT_CACHE_DIR
+from drugbank.sqlite_export import export_sqlite, DEFAULT_DATABASE_PATH
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Exports the parsed DrugBank tables to an SQLite database.")
+    parser.add_argument("xml_path", nargs="?", default="data/drugbank_partial.xml", help="DrugBank XML file, plain or packed in a .zip/.gz/.xz archive")
+    parser.add_argument("-o", "--output", default=DEFAULT_DATABASE_PATH, help="path of the SQLite database")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the XML, do not use the parse cache")
+    parser.add_argument("--refresh", action="store_true", help="parse the XML again and refresh the parse cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="directory of the parse cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="extract only the drugs changed since the previously parsed release")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    try:
+        export_sqlite(args.xml_path, args.output, use_cache=not args.no_cache, refresh=args.refresh,
+                      cache_dir=args.cache_dir, incremental=args.incremental)
+    except etree.ParseError as e:
+        print(f"Error parsing XML: {e}")
+        exit(1)
+
+    print(f"Exported {args.xml_path} to {args.output}")
@@ -1,10 +1,26 @@
+import argparse
 import uvicorn
 import sys
 import os
 
+from lxml import etree
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from drugbank.api import *
+
+from drugbank.api import app, open_database
 
 # Task 15
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Runs the DrugBank pathway count server.")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the XML, do not use the parse cache")
+    parser.add_argument("--refresh", action="store_true", help="parse the XML again and refresh the parse cache")
+    args = parser.parse_args()
+
+    # Prepare the database before serving, so a broken input file stops the server right away.
+    try:
+        open_database(use_cache=not args.no_cache, refresh=args.refresh)
+    except etree.ParseError as e:
+        print(f"Error parsing XML: {e}")
+        sys.exit(1)
+
+    uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -1,4 +1,5 @@
 # scripts/run_drugbank_partial.py
+import argparse
 import sys
 import os
 from lxml import etree
@@ -6,17 +7,13 @@ from lxml import etree
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from drugbank.parsers import (
-    parse_drugs,
-    parse_synonyms,
-    parse_pathways,
-    parse_genes,
-    parse_products,
-    parse_targets,
-    parse_drug_interactions,
-    parse_approval_status,
     get_target_amino_acid_count_for_drug,
     pd
 )
+from drugbank.amino_acid_cache import AminoAcidCache
+from drugbank.cache import DEFAULT_CACHE_DIR
+from drugbank.database import DrugBankDatabase
+from drugbank.webdriver_pool import WebDriverPool
 
 from drugbank.visualisers import (
     visualise_synonyms,
@@ -30,23 +27,36 @@ from drugbank.visualisers import (
 
 relative_file_path = "data/drugbank_partial.xml"
 
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Analyses the partial DrugBank database.")
+    parser.add_argument("xml_path", nargs="?", default=relative_file_path,
+                        help="DrugBank XML file, plain or packed in a .zip/.gz/.xz archive")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the XML, do not use the parse cache")
+    parser.add_argument("--refresh", action="store_true", help="parse the XML again and refresh the parse cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="directory of the parse cache")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_arguments()
+
+    # Every table is parsed when it is first used, sharing a single XML tree, or loaded from the parse cache.
+    database = DrugBankDatabase(args.xml_path, use_cache=not args.no_cache, refresh=args.refresh,
+                                cache_dir=args.cache_dir)
+
+    # Task 1
+    print(f"Parsing drugs...")
     try:
-        # Parse the input XML.
-        tree = etree.parse(relative_file_path)
-        root = tree.getroot()
+        drugs = database.drugs
     except etree.ParseError as e:
         print(f"Error parsing XML: {e}")
         exit(1)
-
-    # Task 1
-    print(f"Parsing drugs...")
-    drugs = parse_drugs(root)
     print(drugs)
 
     # Task 2
     print(f"\nParsing synonyms...")
-    synonyms = parse_synonyms(root)
+    synonyms = database.synonyms
     print(f"Generated example graphs for drugs: DB00001, DB00046, DB0098, DB0108")
     visualise_synonyms("DB00001", synonyms)
     visualise_synonyms("DB00046", synonyms)
@@ -55,12 +65,12 @@ if __name__ == "__main__":
 
     # Task 3
     print(f"\nParsing products...")
-    products = parse_products(root)
+    products = database.products
     print(products)
 
     # Task 4
     print(f"\nParsing pathways...")
-    pathways, drug_pathway_count = parse_pathways(root)
+    pathways, drug_pathway_count = database.pathways
     print(f"Number of different pathways: {len(pathways)}")
 
     # Task 5
@@ -74,7 +84,7 @@ if __name__ == "__main__":
 
     # Task 7
     print(f"\nParsing targets...")
-    targets, cellular_locations = parse_targets(root)
+    targets, cellular_locations = database.targets
     print(targets)
     print(f"Example target: Lepirudin")
     print(targets[targets["Drug"] == "Lepirudin"])
@@ -84,18 +94,18 @@ if __name__ == "__main__":
 
     # Task 9
     print(f"\nParsing approval statuses...")
-    status, approved_not_withdrawn, status_count = parse_approval_status(root)
+    status, approved_not_withdrawn, status_count = database.approval
     print(f"Number of drugs which have been approved and not withdrawn: {approved_not_withdrawn}")
     visualise_statuses(status_count)
 
     # Task 10
     print(f"\nParsing drug interactions...")
-    drug_interactions = parse_drug_interactions(root)
+    drug_interactions = database.interactions
     print(drug_interactions)
 
     # Task 11
     print(f"\nParsing gene interactions...")
-    genes = parse_genes(root)
+    genes = database.genes
     pd.set_option('display.max_columns', None)
     pd.set_option('display.width', None)
     pd.set_option('display.max_colwidth', None)
@@ -107,13 +117,13 @@ if __name__ == "__main__":
     visualise_genes(genes, "ICAM1")
 
     # Task 12
-    if targets is not None:
-        print(f"The targets have already been parsed. Reusing...")
-    else:
-        print(f"Parsing targets...")
-        targets, cellular_locations = parse_targets(root)
+    # The targets are memoized by the database, so they are not parsed again.
+    targets, cellular_locations = database.targets
 
     print(f"Example amino acid counts for DB00002:")
-    aminos = get_target_amino_acid_count_for_drug("DB00002", targets)
+    # Targets without a sequence in the XML are looked up on UniProt in reused headless sessions,
+    # which are only started if there is something to look up, and the results are cached on disk for reruns.
+    with WebDriverPool() as pool, AminoAcidCache() as amino_acid_cache:
+        aminos = get_target_amino_acid_count_for_drug("DB00002", targets, pool=pool, cache=amino_acid_cache)
     print(aminos)
     visualise_drug_target_amino(aminos, "DB00002")
\ No newline at end of file
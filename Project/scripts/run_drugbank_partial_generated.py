@@ -1,114 +1,143 @@
 # scripts/run_drugbank_partial_generated.py
+import argparse
 import sys
 import os
+from functools import partial
 
 # Add the project root to sys.path so that we can import our modules.
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from lxml import etree
 import pandas as pd
 
-from drugbank.iter_parsers import (
-    parse_drug,
-    parse_synonyms_for_drug,
-    parse_products_for_drug,
-    parse_targets_for_drug,
-    parse_approval_status_for_drug,
-    parse_drug_interactions_for_drug,
-)
+from drugbank.iter_parsers import iter_records
+from drugbank.pipeline import iter_records_parallel
+from drugbank.cache import ParseCache, DEFAULT_CACHE_DIR
 from drugbank.visualisers import (
     visualise_synonyms,
     visualise_cellular_locations,
     visualise_statuses,
 )
 
-# Global accumulators for parsed data.
-drugs_data = []             # List of drug details dictionaries.
-synonyms_data = {}          # {drug_id: [synonym, ...]}
-products_data = {}          # {drug_id: [product, ...]}
-pathways_data = []          # List of tuples: (drug_id, pathway)
-drug_pathway_count = {}     # {drug_id: count}
-targets_data = []           # List of target dictionaries.
-cellular_locations = {}     # {cellular_location: count}
-approval_status_count = {}  # {status: count}
-drug_interactions = []      # List of interaction dictionaries.
-genes_data = []             # List of gene dictionaries.
-
 relative_file_path = "data/drugbank_partial_generated.xml"
 
+# The iter_records tables the analysis is built from.
+RECORD_TABLE_NAMES = ("drugs", "synonyms", "products", "targets", "approval_status", "drug_interactions")
 
-def main():
-    absolute_path = os.path.abspath(relative_file_path)
-    if not os.path.exists(absolute_path):
-        print(f"File not found: {absolute_path}")
-        sys.exit(1)
+# Names of the tables stored in the parse cache. They differ from the parse_all tables,
+# as the iterative parsers produce somewhat different results.
+GENERATED_TABLES = ("iter_drugs", "iter_synonyms", "iter_products", "iter_targets", "iter_approval_status",
+                    "iter_drug_interactions")
 
-    print("Processing the XML file with iterparse...")
 
-    ns = "http://www.drugbank.ca"
-    context = etree.iterparse(absolute_path, events=("end",), tag=f"{{{ns}}}drug")
+def parse_generated(absolute_path, tables=GENERATED_TABLES, workers=1):
+    """
+    Streams the XML file with iter_records and returns the results of all GENERATED_TABLES.
+    With more than one worker, the drugs are parsed by the multiprocess pipeline (iter_records_parallel).
+    """
+    if workers > 1:
+        print(f"Processing the XML file with {workers} worker processes...")
+        records = iter_records_parallel(absolute_path, RECORD_TABLE_NAMES, workers=workers)
+    else:
+        print("Processing the XML file with iterparse...")
+        records = iter_records(absolute_path, RECORD_TABLE_NAMES)
+
+    drugs_data = []             # List of drug details dictionaries.
+    synonyms_data = {}          # {drug_id: [synonym, ...]}
+    products_data = {}          # {drug_id: [product, ...]}
+    targets_data = []           # List of target dictionaries.
+    cellular_locations = {}     # {cellular_location: count}
+    approval_status_count = {}  # {status: count}
     approved_not_withdrawn_count = 0
+    drug_interactions = []      # List of interaction dictionaries.
 
-    for event, drug_elem in context:
+    for table, batch in records:
         # Task 1: Drug details.
-        details = parse_drug(drug_elem)
-        if details:
-            drugs_data.append(details)
+        if table == "drugs":
+            drugs_data.extend(batch)
 
         # Task 2: Synonyms.
-        syn = parse_synonyms_for_drug(drug_elem)
-        if syn:
-            drug_id = syn["DrugBank_ID"]
-            if drug_id in synonyms_data:
-                synonyms_data[drug_id] = list(set(synonyms_data[drug_id] + syn["Synonyms"]))
-            else:
-                synonyms_data[drug_id] = syn["Synonyms"]
+        elif table == "synonyms":
+            for syn in batch:
+                drug_id = syn["DrugBank_ID"]
+                if drug_id in synonyms_data:
+                    synonyms_data[drug_id] = list(set(synonyms_data[drug_id] + syn["Synonyms"]))
+                else:
+                    synonyms_data[drug_id] = syn["Synonyms"]
 
         # Task 3: Products.
-        prod = parse_products_for_drug(drug_elem)
-        if prod:
-            products_data[prod["DrugBank_ID"]] = prod["Products"]
+        elif table == "products":
+            for prod in batch:
+                products_data[prod["DrugBank_ID"]] = prod["Products"]
 
         # Task 7 & 8: Targets and cellular locations.
-        targs = parse_targets_for_drug(drug_elem)
-        if targs:
-            targets_data.extend(targs["Targets"])
-            for target in targs["Targets"]:
+        elif table == "targets":
+            targets_data.extend(batch)
+            for target in batch:
                 cl = target.get("Cellular_Location", "Unknown")
                 cellular_locations[cl] = cellular_locations.get(cl, 0) + 1
 
         # Task 9: Approval statuses.
-        app = parse_approval_status_for_drug(drug_elem)
-        if app:
-            for status, count in app["Status"].items():
-                approval_status_count[status] = approval_status_count.get(status, 0) + count
-            if "Approved" in app["Status"] and "Withdrawn" not in app["Status"]:
-                approved_not_withdrawn_count += 1
+        elif table == "approval_status":
+            for app in batch:
+                for status, count in app["Status"].items():
+                    approval_status_count[status] = approval_status_count.get(status, 0) + count
+                if "Approved" in app["Status"] and "Withdrawn" not in app["Status"]:
+                    approved_not_withdrawn_count += 1
 
         # Task 10: Drug interactions.
-        inter = parse_drug_interactions_for_drug(drug_elem)
-        if inter:
-            drug_interactions.extend(inter["Interactions"])
-
-        # Clear element from memory.
-        drug_elem.clear()
-        while drug_elem.getprevious() is not None:
-            del drug_elem.getparent()[0]
+        elif table == "drug_interactions":
+            drug_interactions.extend(batch)
 
     print("Parsing complete.")
     print(f"Parsed {len(drugs_data)} drugs.")
 
+    df_syn = pd.DataFrame([{"DrugBank_ID": k, "Synonyms": v} for k, v in synonyms_data.items()])
+    df_products = pd.DataFrame(
+        [{"DrugBank_ID": did, "Products": prods} for did, prods in products_data.items()]
+    )
+    return {
+        "iter_drugs": pd.DataFrame(drugs_data),
+        "iter_synonyms": df_syn,
+        "iter_products": df_products,
+        "iter_targets": (pd.DataFrame(targets_data), cellular_locations),
+        "iter_approval_status": (approval_status_count, approved_not_withdrawn_count),
+        "iter_drug_interactions": pd.DataFrame(drug_interactions),
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Analyses the generated DrugBank database.")
+    parser.add_argument("xml_path", nargs="?", default=relative_file_path,
+                        help="DrugBank XML file, plain or packed in a .zip/.gz/.xz archive")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the XML, do not use the parse cache")
+    parser.add_argument("--refresh", action="store_true", help="parse the XML again and refresh the parse cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="directory of the parse cache")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes parsing the drugs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    absolute_path = os.path.abspath(args.xml_path)
+    if not os.path.exists(absolute_path):
+        print(f"File not found: {absolute_path}")
+        sys.exit(1)
+
+    cache = ParseCache(args.cache_dir, enabled=not args.no_cache, refresh=args.refresh)
+    results = cache.get_tables(absolute_path, GENERATED_TABLES, parse=partial(parse_generated, workers=args.workers))
+
     # Task 1: Drug Details.
     print("\nDrug Details:")
-    df_drugs = pd.DataFrame(drugs_data)
+    df_drugs = results["iter_drugs"]
     print(df_drugs)
 
     # Task 2: Synonyms.
     print("\nSynonyms:")
-    df_syn = pd.DataFrame([{"DrugBank_ID": k, "Synonyms": v} for k, v in synonyms_data.items()])
+    df_syn = results["iter_synonyms"]
     print(df_syn)
+    synonym_ids = set(df_syn["DrugBank_ID"]) if not df_syn.empty else set()
     for drug_id in ["DB00001", "DB00046", "DB00098", "DB00108"]:
-        if drug_id in synonyms_data:
+        if drug_id in synonym_ids:
             print(f"Visualising synonyms for {drug_id}...")
             visualise_synonyms(drug_id, df_syn)
         else:
@@ -116,14 +145,12 @@ def main():
 
     # Task 3: Products.
     print("\nProducts:")
-    df_products = pd.DataFrame(
-        [{"DrugBank_ID": did, "Products": prods} for did, prods in products_data.items()]
-    )
+    df_products = results["iter_products"]
     print(df_products)
 
     # Task 7 & 8: Targets and cellular locations.
     print("\nTargets:")
-    df_targets = pd.DataFrame(targets_data)
+    df_targets, cellular_locations = results["iter_targets"]
     print(df_targets)
     print("\nExample target: Lepirudin")
     if "Drug" in df_targets.columns:
@@ -133,13 +160,14 @@ def main():
     visualise_cellular_locations(cellular_locations)
 
     # Task 9: Approval statuses.
+    approval_status_count, approved_not_withdrawn_count = results["iter_approval_status"]
     print("\nApproval Statuses:")
     print(f"Number of drugs approved and not withdrawn: {approved_not_withdrawn_count}")
     visualise_statuses(approval_status_count)
 
     # Task 10: Drug Interactions.
     print("\nDrug Interactions:")
-    df_interactions = pd.DataFrame(drug_interactions)
+    df_interactions = results["iter_drug_interactions"]
     print(df_interactions)
 
 
@@ -0,0 +1,6 @@
+# tests/sample_data.py
+import os
+
+# A small DrugBank file committed with the tests, so they do not depend on data/drugbank_partial.xml.
+# Its drugs interact with each other and have products, pathways and targets with polypeptides.
+SAMPLE_XML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "drugbank_sample.xml")
@@ -0,0 +1,206 @@
+# tests/test_amino_acid_cache.py
+import threading
+
+import pandas as pd
+import pytest
+
+from drugbank.amino_acid_cache import AminoAcidCache, target_key
+from drugbank.parsers import LOOKUP_FAILED, amino_acid_lookup, get_target_amino_acid_count_for_drug
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Lookup:
+    """Records the batches it is called with and answers from a dict of known counts."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.calls = []
+
+    def __call__(self, target_names):
+        self.calls.append(list(target_names))
+        return [self.counts.get(target_name) for target_name in target_names]
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    with AminoAcidCache(str(tmp_path / "counts.sqlite"), ttl=100, negative_ttl=10, clock=clock) as cache:
+        yield cache
+
+
+def test_target_key():
+    assert target_key("Coagulation factor X") == target_key("coagulation  factor x.")
+    assert target_key(None) is None
+    assert target_key(pd.NA) is None
+    assert target_key("...") is None
+
+
+def test_get_many_looks_up_missing_targets_once(cache):
+    lookup = Lookup({"Prothrombin": 622})
+
+    counts = cache.get_many(["Prothrombin", "prothrombin", "Unknown", None], lookup)
+
+    assert counts == [622, 622, None, None]
+    assert lookup.calls == [["Prothrombin", "Unknown"]]
+    entry = cache.get("PROTHROMBIN")
+    assert (entry.target_name, entry.amino_acid_count, entry.source, entry.fetched_at) == \
+        ("Prothrombin", 622, "uniprot", 1000.0)
+
+    # Found and not found targets are both cached.
+    assert cache.get_many(["Prothrombin", "Unknown"], lookup) == [622, None]
+    assert len(lookup.calls) == 1
+    assert cache.cache_info() == (2, 2, 2, 0)
+
+
+def test_ttl_and_negative_ttl(cache, clock):
+    lookup = Lookup({"Prothrombin": 622})
+    cache.get_many(["Prothrombin", "Unknown"], lookup)
+
+    # The "not found" result expires first.
+    clock.now += 50
+    assert cache.get("Unknown") is None
+    assert cache.get("Prothrombin").amino_acid_count == 622
+    lookup.counts["Unknown"] = 100
+    assert cache.get_many(["Prothrombin", "Unknown"], lookup) == [622, 100]
+    assert lookup.calls[-1] == ["Unknown"]
+
+    clock.now += 60
+    assert cache.get("Prothrombin") is None
+    assert cache.get("Unknown").amino_acid_count == 100
+    assert cache.purge() == 1
+    assert len(cache) == 1
+
+
+def test_cache_persists(tmp_path, clock):
+    path = str(tmp_path / "counts.sqlite")
+    with AminoAcidCache(path, clock=clock) as cache:
+        cache.put("Prothrombin", 622)
+    with AminoAcidCache(path, clock=clock) as cache:
+        assert cache.get_many(["Prothrombin"], Lookup({})) == [622]
+
+
+def test_failed_lookup_is_not_cached(cache):
+    def failing(target_names):
+        raise RuntimeError("UniProt is down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_many(["Prothrombin"], failing)
+    assert len(cache) == 0
+    assert cache.in_flight == {}
+    assert cache.get_many(["Prothrombin"], Lookup({"Prothrombin": 622})) == [622]
+
+
+def test_failed_targets_are_not_cached(cache):
+    def lookup(target_names):
+        return [622, LOOKUP_FAILED, None][:len(target_names)]
+
+    assert cache.get_many(["Prothrombin", "Coagulation factor X", "Unknown"], lookup) == [622, None, None]
+    assert cache.get("Coagulation factor X") is None
+    assert cache.get("Unknown").amino_acid_count is None
+
+    retry = Lookup({"Coagulation factor X": 488})
+    assert cache.get_many(["Prothrombin", "Coagulation factor X", "Unknown"], retry) == [622, 488, None]
+    assert retry.calls == [["Coagulation factor X"]]
+
+
+def test_amino_acid_lookup_marks_failed_batches():
+    class Pool:
+        def map(self, function, chunks):
+            # The session of the second batch failed on every attempt.
+            return [[622] * len(chunks[0]), None]
+
+    lookup = amino_acid_lookup(Pool(), batch_size=2)
+    assert lookup(["Prothrombin", "Thrombin", "Coagulation factor X"]) == [622, 622, LOOKUP_FAILED]
+
+
+def test_short_lookup_fails_the_waiting_threads(cache):
+    started = threading.Event()
+    release = threading.Event()
+
+    def short_lookup(target_names):
+        started.set()
+        release.wait(5)
+        return []
+
+    errors = {}
+
+    def get_many(name):
+        try:
+            cache.get_many(["Prothrombin"], short_lookup)
+        except ValueError as e:
+            errors[name] = e
+
+    # The threads are daemons, so a thread left waiting fails the test instead of hanging it.
+    first = threading.Thread(target=get_many, args=("first",), daemon=True)
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=get_many, args=("second",), daemon=True)
+    second.start()
+    while cache.cache_info().shared == 0 and second.is_alive():
+        second.join(0.01)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert not first.is_alive() and not second.is_alive()
+    assert set(errors) == {"first", "second"}
+    assert cache.in_flight == {}
+    assert len(cache) == 0
+
+
+def test_in_flight_lookups_are_shared(cache):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_lookup(target_names):
+        calls.append(list(target_names))
+        started.set()
+        release.wait(5)
+        return [622 for _ in target_names]
+
+    results = {}
+    first = threading.Thread(target=lambda: results.setdefault("first", cache.get_many(["Prothrombin"], slow_lookup)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.setdefault("second", cache.get_many(["prothrombin"], slow_lookup)))
+    second.start()
+    # Give the second thread the time to find the lookup in flight before it finishes.
+    while cache.cache_info().shared == 0 and second.is_alive():
+        second.join(0.01)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == {"first": [622], "second": [622]}
+    assert calls == [["Prothrombin"]]
+    assert cache.cache_info().shared == 1
+
+
+def test_prefetch_and_drug_counts(cache):
+    targets = pd.DataFrame({
+        "DrugBank_ID": ["DB00001", "DB00001", "DB00002", "DB00002"],
+        "Target_Name": ["Prothrombin", "Unknown A", "Unknown A", "Unknown B"],
+        "Amino_Acid_Count": pd.array([622, pd.NA, pd.NA, pd.NA], dtype="Int64"),
+    })
+    lookup = Lookup({"Unknown A": 100, "Unknown B": 200})
+
+    # Only the distinct targets without a parsed count are looked up.
+    assert cache.prefetch(targets, lookup) == 2
+    assert lookup.calls == [["Unknown A", "Unknown B"]]
+    assert cache.prefetch(targets, lookup) == 0
+
+    result = get_target_amino_acid_count_for_drug("DB00002", targets, cache=cache)
+    assert result["Amino_Acid_Count"].tolist() == [100, 200]
+    assert len(lookup.calls) == 1
@@ -1,4 +1,8 @@
 # test/test_api.py
+import os
+import subprocess
+import sys
+
 from fastapi.testclient import TestClient
 from drugbank.api import app
 
@@ -17,4 +21,21 @@ def test_get_pathway_count_not_found():
     response = client.post("/get_pathway_count/", json=payload)
     assert response.status_code == 404
     data = response.json()
-    assert data["detail"] == "Drug not found"
\ No newline at end of file
+    assert data["detail"] == "Drug not found"
+
+def test_search_drugs():
+    response = client.post("/search_drugs/", json={"query": "*"})
+    assert response.status_code == 400
+
+    response = client.post("/search_drugs/", json={"query": "drug", "limit": 3})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) <= 3
+
+def test_import_has_no_side_effects(tmp_path):
+    # Importing the package from another directory neither needs the input file nor writes the database.
+    project = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    result = subprocess.run([sys.executable, "-c", "import drugbank, drugbank.api; print(drugbank.api.state)"],
+                            cwd=tmp_path, env={**os.environ, "PYTHONPATH": project}, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "'connection': None" in result.stdout
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,150 @@
+# tests/test_cache.py
+import os
+import pytest
+import pandas as pd
+from lxml import etree
+
+from drugbank.parsers import parse_all, TABLES
+from drugbank.cache import ParseCache, load_tables
+
+
+XML = """<drugbank xmlns="http://www.drugbank.ca">
+            <drug type="biotech">
+                <drugbank-id primary="true">DB00001</drugbank-id>
+                <name>Lepirudin</name>
+                <state>liquid</state>
+                <synonyms>
+                    <synonym>Hirudin variant-1</synonym>
+                </synonyms>
+                <products>
+                    <product>
+                        <name>Refludan</name>
+                        <manufacturer>Bayer</manufacturer>
+                        <ndc-id>50419-150</ndc-id>
+                    </product>
+                </products>
+                <pathways>
+                    <pathway>
+                        <name>Lepirudin Action Pathway</name>
+                        <drugs>
+                            <drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug>
+                        </drugs>
+                    </pathway>
+                </pathways>
+                <targets>
+                    <target>
+                        <id>BE0000048</id>
+                        <name>Prothrombin</name>
+                        <polypeptide source="Swiss-Prot" id="P00734">
+                            <name>Prothrombin</name>
+                            <gene-name>F2</gene-name>
+                        </polypeptide>
+                    </target>
+                </targets>
+                <groups><group>approved</group></groups>
+            </drug>
+            <drug type="small molecule">
+                <drugbank-id primary="true">DB00002</drugbank-id>
+                <name>Cetuximab</name>
+                <synonyms/>
+                <drug-interactions>
+                    <drug-interaction>
+                        <drugbank-id>DB00001</drugbank-id>
+                        <name>Lepirudin</name>
+                        <description>Increases the risk of bleeding.</description>
+                    </drug-interaction>
+                </drug-interactions>
+            </drug>
+         </drugbank>"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+class CountingParser:
+    """Parses like the cache does by default, counting the tables it had to parse."""
+
+    def __init__(self):
+        self.parsed = []
+
+    def __call__(self, path, tables):
+        self.parsed.extend(tables)
+        return parse_all(etree.parse(path).getroot(), tables)
+
+
+def test_cached_tables_match_parsed_tables(xml_path, tmp_path):
+    expected = parse_all(etree.parse(xml_path).getroot())
+    cache_dir = str(tmp_path / "cache")
+
+    load_tables(xml_path, cache_dir=cache_dir)
+    cached = load_tables(xml_path, cache_dir=cache_dir)
+
+    for table in ("drugs", "synonyms", "products", "drug_interactions", "genes"):
+        pd.testing.assert_frame_equal(cached[table], expected[table])
+    pd.testing.assert_frame_equal(cached["targets"][0], expected["targets"][0])
+    assert cached["targets"][1] == expected["targets"][1]
+    assert cached["pathways"][1]["DB00001"] == 1
+    assert cached["approval_status"][1] == expected["approval_status"][1]
+    assert cached["synonyms"].iloc[1]["Synonyms"] == []
+    assert cached["products"].loc["DB00001", "Products"][0]["Manufacturer"] == "Bayer"
+
+
+def test_warm_cache_does_not_parse(xml_path, tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    parser = CountingParser()
+
+    cache.get_tables(xml_path, ("drugs", "targets"), parse=parser)
+    assert parser.parsed == ["drugs", "targets"]
+
+    # Only the tables which are not cached yet are parsed.
+    cache.get_tables(xml_path, TABLES, parse=parser)
+    assert sorted(parser.parsed[2:]) == sorted(set(TABLES) - {"drugs", "targets"})
+
+    parser.parsed.clear()
+    cache.get_tables(xml_path, TABLES, parse=parser)
+    assert parser.parsed == []
+
+
+def test_refresh_and_disabled_cache(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    parser = CountingParser()
+
+    ParseCache(cache_dir, enabled=False).get_tables(xml_path, ("drugs",), parse=parser)
+    assert not os.path.exists(cache_dir)
+
+    ParseCache(cache_dir).get_tables(xml_path, ("drugs",), parse=parser)
+    ParseCache(cache_dir, refresh=True).get_tables(xml_path, ("drugs",), parse=parser)
+    assert parser.parsed == ["drugs", "drugs", "drugs"]
+
+
+def test_changed_file_misses_cache(xml_path, tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    old_key = cache.key(xml_path)
+
+    with open(xml_path, "w", encoding="utf-8") as file:
+        file.write(XML.replace("Lepirudin", "Bivalirudin"))
+
+    assert cache.key(xml_path) != old_key
+    drugs = cache.get_tables(xml_path, ("drugs",))["drugs"]
+    assert drugs.iloc[0]["Name"] == "Bivalirudin"
+
+
+def test_eviction_keeps_cache_size_bounded(xml_path, tmp_path):
+    cache_dir = tmp_path / "cache"
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"drugbank_{i}.xml"
+        path.write_text(XML.replace("DB00001", f"DB0000{i + 3}"), encoding="utf-8")
+        paths.append(str(path))
+
+    cache = ParseCache(str(cache_dir), max_bytes=1)
+    for path in paths:
+        cache.get_tables(path, ("drugs",))
+
+    entries = [entry for entry in cache_dir.iterdir() if entry.is_dir()]
+    # Only the most recently used entry survives.
+    assert [entry.name for entry in entries] == [cache.key(paths[-1])]
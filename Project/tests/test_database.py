@@ -0,0 +1,114 @@
+# tests/test_database.py
+import pytest
+import pandas as pd
+from lxml import etree
+
+from drugbank.database import DrugBankDatabase
+from drugbank.parsers import parse_targets, parse_drugs, parse_approval_status
+from tests.test_cache import XML
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def test_tables_are_memoized(xml_path, tmp_path):
+    database = DrugBankDatabase(xml_path, use_cache=False)
+    root = etree.parse(xml_path).getroot()
+
+    targets, cellular_locations = database.targets
+    assert database.targets[0] is targets
+    pd.testing.assert_frame_equal(targets, parse_targets(root)[0])
+    pd.testing.assert_frame_equal(database.drugs, parse_drugs(root))
+    assert database.approval[1] == parse_approval_status(root)[1]
+    assert database.interactions.iloc[0]["Interacting_Drug_ID"] == "DB00001"
+
+    info = database.cache_info()
+    assert info.hits == 1
+    assert info.misses == 4
+    # The XML tree is parsed once and shared by all the tables.
+    assert info.tree_parses == 1
+    assert info.loaded == ("targets", "drugs", "approval_status", "drug_interactions")
+
+
+def test_load_computes_tables_in_one_pass(xml_path):
+    database = DrugBankDatabase(xml_path, use_cache=False)
+    tables = database.load("drugs", "synonyms", "genes")
+
+    assert set(tables) == {"drugs", "synonyms", "genes"}
+    assert database.cache_info().passes == 1
+    assert database.synonyms is tables["synonyms"]
+    assert database.cache_info().passes == 1
+
+    database.load()
+    assert database.cache_info().passes == 2
+    with pytest.raises(ValueError):
+        database.load("unknown")
+
+
+def test_invalidate(xml_path):
+    database = DrugBankDatabase(xml_path, use_cache=False)
+    drugs = database.drugs
+    synonyms = database.synonyms
+
+    database.invalidate("drugs")
+    assert database.drugs is not drugs
+    assert database.synonyms is synonyms
+    assert database.cache_info().tree_parses == 1
+
+    database.invalidate()
+    assert database.cache_info().loaded == ()
+    database.synonyms
+    assert database.cache_info().tree_parses == 2
+
+
+def test_invalidate_drops_the_parse_cache_entry(xml_path, tmp_path):
+    database = DrugBankDatabase(xml_path, cache_dir=str(tmp_path / "cache"))
+    database.load("drugs", "synonyms")
+    assert database.cache_info().passes == 1
+
+    # The invalidated table is parsed again instead of being read back from the cache, the others are kept.
+    database.invalidate("drugs")
+    database.drugs
+    assert database.cache_info().passes == 2
+    fresh = DrugBankDatabase(xml_path, cache_dir=str(tmp_path / "cache"))
+    fresh.load("drugs", "synonyms")
+    assert fresh.cache_info().passes == 0
+
+    fresh.invalidate()
+    fresh.load("drugs", "synonyms")
+    assert fresh.cache_info().passes == 1
+
+
+def test_warm_parse_cache_skips_the_tree(xml_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    DrugBankDatabase(xml_path, cache_dir=cache_dir).load("drugs", "targets")
+
+    database = DrugBankDatabase(xml_path, cache_dir=cache_dir)
+    assert database.drugs.iloc[0]["Name"] == "Lepirudin"
+    database.targets
+    info = database.cache_info()
+    assert (info.passes, info.tree_parses) == (0, 0)
+
+
+def test_interaction_graph(xml_path):
+    database = DrugBankDatabase(xml_path, use_cache=False)
+    graph = database.interaction_graph
+
+    assert database.interaction_graph is graph
+    assert graph.edge_count == len(database.interactions)
+    database.invalidate("drug_interactions")
+    assert database.interaction_graph is not graph
+
+
+def test_name_index(xml_path):
+    database = DrugBankDatabase(xml_path, use_cache=False)
+    index = database.name_index
+
+    assert database.name_index is index
+    assert index.exact("refludan") == ["DB00001"]
+    database.invalidate("synonyms")
+    assert database.name_index is not index
@@ -0,0 +1,79 @@
+# tests/test_fields.py
+from lxml import etree
+
+from drugbank.fields import (
+    qualify,
+    child_index,
+    ElementFields,
+    NS_URL
+)
+
+
+DRUG_XML = """<drug xmlns="http://www.drugbank.ca" type="biotech">
+                <drugbank-id>BTD00024</drugbank-id>
+                <drugbank-id primary="true">DB00001</drugbank-id>
+                <name>Lepirudin</name>
+                <description/>
+                <dosages>
+                    <dosage><form>Injection</form></dosage>
+                </dosages>
+                <synonyms>
+                    <synonym>Hirudin variant-1</synonym>
+                    <synonym>Lepirudin recombinant</synonym>
+                </synonyms>
+              </drug>"""
+
+
+def test_qualify():
+    assert qualify("name") == f"{NS_URL}name"
+    assert qualify("dosages/dosage/form") == f"{NS_URL}dosages/{NS_URL}dosage/{NS_URL}form"
+    assert qualify(".//group") == f".//{NS_URL}group"
+    assert qualify("drugbank-id[@primary='true']") == f"{NS_URL}drugbank-id[@primary='true']"
+
+
+def test_child_index_keeps_first_child():
+    drug = etree.fromstring(DRUG_XML)
+    index = child_index(drug)
+    assert index[f"{NS_URL}drugbank-id"].text == "BTD00024"
+    assert index[f"{NS_URL}name"].text == "Lepirudin"
+
+
+def test_element_fields():
+    fields = ElementFields(etree.fromstring(DRUG_XML))
+
+    assert fields.text("drugbank-id[@primary='true']") == "DB00001"
+    assert fields.text("name") == "Lepirudin"
+    assert fields.text("dosages/dosage/form") == "Injection"
+    assert fields.attr("type") == "biotech"
+    assert fields.texts("synonyms/synonym") == ["Hirudin variant-1", "Lepirudin recombinant"]
+    assert fields.texts(".//synonym") == ["Hirudin variant-1", "Lepirudin recombinant"]
+
+    # An empty element has no text, a missing element falls back to the default.
+    assert fields.text("description", "Unknown") is None
+    assert fields.text("state", "Unknown") == "Unknown"
+    assert fields.text("dosages/dosage/route") is None
+    assert fields.findall("products/product") == []
+
+
+def test_qualify_predicates():
+    assert qualify("targets/target[polypeptide]") == f"{NS_URL}targets/{NS_URL}target[{NS_URL}polypeptide]"
+    assert qualify("external-identifier[resource='GenAtlas']/identifier") == \
+        f"{NS_URL}external-identifier[{NS_URL}resource='GenAtlas']/{NS_URL}identifier"
+    assert qualify("dosage[1]") == f"{NS_URL}dosage[1]"
+
+
+def test_element_fields_repeated_containers():
+    # Two <products> and two <targets> containers: every one of them is searched, like by ElementPath.
+    drug = etree.fromstring("""<drug xmlns="http://www.drugbank.ca">
+        <products><product><name>A</name></product></products>
+        <targets><target><name>T1</name></target></targets>
+        <products><product><name>B</name></product><product><name>C</name></product></products>
+        <targets><target><name>T2</name></target></targets>
+    </drug>""")
+    fields = ElementFields(drug)
+
+    for path in ("products/product", "products/product/name", "targets/target/name", "products"):
+        assert fields.findall(path) == drug.findall(qualify(path))
+        assert fields.find(path) is drug.find(qualify(path))
+    assert fields.texts("products/product/name") == ["A", "B", "C"]
+    assert fields.text("targets/target[name='T2']/name") == "T2"
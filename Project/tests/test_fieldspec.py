@@ -0,0 +1,224 @@
+# tests/test_fieldspec.py
+import pytest
+from lxml import etree
+
+from drugbank.fieldspec import ALL, JOINED, ONE, Field, TableSpec, compile_fields, compile_table, compile_value, join_texts
+from drugbank.fields import qualify
+from drugbank.parsers import (
+    APPROVAL_STATUS_SPEC,
+    DRUG_INTERACTION_SPEC,
+    DRUG_SPEC,
+    NS_URL,
+    PATHWAY_SPEC,
+    PRODUCT_TABLE_SPEC,
+    SYNONYM_SPEC,
+    TABLE_PARSERS,
+    TARGET_SPEC,
+    iter_drugs,
+)
+from drugbank.xml_source import iterparse_xml
+from tests.sample_data import SAMPLE_XML_PATH
+
+DRUG_XML = """<drug xmlns="http://www.drugbank.ca" type="biotech">
+                <drugbank-id>BTD00024</drugbank-id>
+                <drugbank-id primary="true">DB00001</drugbank-id>
+                <name>Lepirudin</name>
+                <description/>
+                <synonyms>
+                    <synonym>Hirudin variant-1</synonym>
+                    <synonym>Lepirudin recombinant</synonym>
+                </synonyms>
+                <food-interactions>
+                    <food-interaction>Avoid alcohol.</food-interaction>
+                    <food-interaction/>
+                    <food-interaction>Take with food.</food-interaction>
+                </food-interactions>
+                <targets>
+                    <target>
+                        <id>BE0000048</id>
+                        <polypeptide id="P00734" source="Swiss-Prot">
+                            <name>Prothrombin</name>
+                            <external-identifiers>
+                                <external-identifier>
+                                    <resource>HGNC</resource><identifier>HGNC:3535</identifier>
+                                </external-identifier>
+                                <external-identifier>
+                                    <resource>GenAtlas</resource><identifier>F2</identifier>
+                                </external-identifier>
+                            </external-identifiers>
+                        </polypeptide>
+                    </target>
+                    <target><id>BE0000049</id></target>
+                    <target>
+                        <id>BE0000048</id>
+                        <polypeptide id="P00734" source="Swiss-Prot"><name>Prothrombin</name></polypeptide>
+                    </target>
+                </targets>
+              </drug>"""
+
+
+# Every container is repeated, and the first one misses some of the fields.
+REPEATED_XML = """<drug xmlns="http://www.drugbank.ca" type="small molecule">
+                    <drugbank-id primary="true">DB00002</drugbank-id>
+                    <name>Cetuximab</name>
+                    <dosages><dosage><route>Intravenous</route></dosage></dosages>
+                    <dosages><dosage><route>Oral</route></dosage><dosage><form>Solution</form></dosage></dosages>
+                    <synonyms><synonym>Cetuximab recombinant</synonym></synonyms>
+                    <synonyms><synonym>Erbitux</synonym></synonyms>
+                    <groups><group>approved</group></groups>
+                    <groups><group>investigational</group></groups>
+                    <products><product><name>Erbitux</name><labeller>ImClone</labeller></product></products>
+                    <products><product><name>Erbitux</name><country>Canada</country></product></products>
+                    <pathways>
+                        <pathway><name>First</name><drugs><drug><drugbank-id>DB00002</drugbank-id></drug></drugs></pathway>
+                    </pathways>
+                    <pathways>
+                        <pathway><name>Second</name><drugs><drug><drugbank-id>DB00003</drugbank-id></drug></drugs></pathway>
+                    </pathways>
+                    <targets>
+                        <target>
+                            <id>BE0000767</id>
+                            <polypeptide id="P00533" source="Swiss-Prot"><name>EGFR</name></polypeptide>
+                            <polypeptide id="P04626" source="Swiss-Prot">
+                                <gene-name>ERBB2</gene-name>
+                                <amino-acid-sequence>>ERBB2
+MELAALCRWG</amino-acid-sequence>
+                            </polypeptide>
+                        </target>
+                    </targets>
+                    <targets><target><id>BE0000048</id><polypeptide source="TrEMBL"/></target></targets>
+                    <drug-interactions>
+                        <drug-interaction><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug-interaction>
+                    </drug-interactions>
+                  </drug>"""
+
+
+def elementpath_values(element, fields):
+    """The values of the fields read with plain find/findall, or None if a required element is missing."""
+    values = []
+    for field in fields:
+        read = compile_value(field)
+        if field.multiplicity == ONE:
+            found = element.find(qualify(field.path))
+            if found is None and field.required:
+                return None
+            values.append(field.default if found is None else read(found))
+        else:
+            found = [read(child) for child in element.iterfind(qualify(field.path))]
+            values.append(found if field.multiplicity == ALL else join_texts(found))
+    return tuple(values)
+
+
+def elementpath_rows(spec, drug):
+    """The rows of a TableSpec read with plain find/findall."""
+    drug_values = elementpath_values(drug, spec.drug_fields)
+    if drug_values is None:
+        return []
+    if spec.rows is None:
+        return [drug_values]
+    rows = []
+    for row in drug.iterfind(qualify(spec.rows)):
+        row_values = elementpath_values(row, spec.row_fields)
+        if row_values is not None:
+            rows.append(drug_values + row_values)
+    return list(dict.fromkeys(rows)) if spec.unique else rows
+
+
+@pytest.fixture
+def drug():
+    return etree.fromstring(DRUG_XML)
+
+
+def test_compile_fields(drug):
+    extract = compile_fields([
+        Field("ID", "drugbank-id[@primary='true']", required=True),
+        Field("Other ID", "drugbank-id"),
+        Field("Type", ".", "@type"),
+        Field("Missing Attribute", ".", "@state", default="Unknown"),
+        Field("Name", "name", transform=str.upper),
+        Field("Description", "description", default="Unknown"),
+        Field("State", "state", default="Unknown"),
+        Field("Synonyms", "synonyms/synonym", multiplicity=ALL),
+        Field("Products", "products/product/name", multiplicity=ALL),
+        Field("Food Interactions", ".//food-interactions/food-interaction", multiplicity=JOINED),
+        Field("Target Count", "targets", lambda element: len(element)),
+    ])
+
+    assert extract(drug) == ("DB00001", "BTD00024", "biotech", "Unknown", "LEPIRUDIN", None, "Unknown",
+                             ["Hirudin variant-1", "Lepirudin recombinant"], [], "Avoid alcohol.; Take with food.", 3)
+
+
+def test_compile_fields_required(drug):
+    extract = compile_fields([Field("Name", "name"), Field("State", "state", required=True)])
+    assert extract(drug) is None
+
+
+def test_compile_table_rows(drug):
+    spec = TableSpec([Field("ID", "drugbank-id[@primary='true']", required=True)], rows="targets/target", row_fields=[
+        Field("Target_ID", "id"),
+        Field("Source", "polypeptide", "@source", required=True),
+        Field("Name", "polypeptide/name", default="Unknown"),
+        Field("GenAtlas_ID", "polypeptide//external-identifier[resource='GenAtlas']/identifier", default="Unknown"),
+        Field("Drug", "../../name"),
+    ])
+    assert spec.columns == ["ID", "Target_ID", "Source", "Name", "GenAtlas_ID", "Drug"]
+
+    # The target without a polypeptide gives no row.
+    assert compile_table(spec)(drug) == [
+        ("DB00001", "BE0000048", "Swiss-Prot", "Prothrombin", "F2", "Lepirudin"),
+        ("DB00001", "BE0000048", "Swiss-Prot", "Prothrombin", "Unknown", "Lepirudin"),
+    ]
+
+    unique_spec = spec._replace(row_fields=spec.row_fields[:3], unique=True)
+    assert compile_table(unique_spec)(drug) == [("DB00001", "BE0000048", "Swiss-Prot", "Prothrombin")]
+
+    # A drug without a required drug field gives no rows at all.
+    missing_spec = spec._replace(drug_fields=(Field("State", "state", required=True),))
+    assert compile_table(missing_spec)(drug) == []
+
+
+@pytest.mark.parametrize("spec", [DRUG_SPEC, SYNONYM_SPEC, PRODUCT_TABLE_SPEC, PATHWAY_SPEC, TARGET_SPEC,
+                                  APPROVAL_STATUS_SPEC, DRUG_INTERACTION_SPEC])
+def test_compiled_specs_match_elementpath_on_repeated_containers(spec):
+    for xml in (REPEATED_XML, DRUG_XML):
+        drug = etree.fromstring(xml)
+        assert compile_table(spec)(drug) == elementpath_rows(spec, drug)
+
+
+def test_compile_fields_repeated_containers():
+    drug = etree.fromstring(REPEATED_XML)
+    fields = [
+        Field("Form", "dosages/dosage/form", required=True),
+        Field("Routes", "dosages/dosage/route", multiplicity=ALL, required=True),
+        Field("Synonyms", "synonyms/synonym", multiplicity=JOINED),
+        Field("Name", "name"), Field("State", "state"), Field("Groups", "groups/group", multiplicity=ALL),
+    ]
+    assert compile_fields(fields)(drug) == ("Solution", ["Intravenous", "Oral"], "Cetuximab recombinant; Erbitux",
+                                            "Cetuximab", None, ["approved", "investigational"])
+    assert compile_fields(fields)(drug) == elementpath_values(drug, fields)
+    assert compile_fields([Field("Labels", "labels/label", multiplicity=ALL, required=True)])(drug) is None
+
+
+def test_compile_table_single_row(drug):
+    extract = compile_table(TableSpec([Field("Name", "name"), Field("State", "state")]))
+    assert extract(drug) == [("Lepirudin", None)]
+    assert extract.source.startswith("def extract_rows(drug):")
+
+
+def test_invalid_fields():
+    with pytest.raises(ValueError):
+        Field("Name", "name", multiplicity="some")
+    with pytest.raises(ValueError):
+        compile_fields([Field("Name", "name", source="tail")])
+
+
+def test_extractors_work_on_iterparse():
+    tree_rows = [{table: extractor(drug) for table, (extractor, _, _) in TABLE_PARSERS.items()}
+                 for drug in iter_drugs(etree.parse(SAMPLE_XML_PATH).getroot())]
+
+    stream_rows = []
+    for _, drug in iterparse_xml(SAMPLE_XML_PATH, events=("end",), tag=f"{NS_URL}drug"):
+        if drug.getparent() is not None and drug.getparent().getparent() is None:
+            stream_rows.append({table: extractor(drug) for table, (extractor, _, _) in TABLE_PARSERS.items()})
+
+    assert stream_rows == tree_rows
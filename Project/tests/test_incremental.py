@@ -0,0 +1,195 @@
+# tests/test_incremental.py
+import gzip
+import pytest
+import pandas as pd
+from lxml import etree
+
+from drugbank import incremental
+from drugbank.incremental import IncrementalParser
+from drugbank.parsers import parse_all
+from tests.sample_data import SAMPLE_XML_PATH
+
+
+def drug_xml(index, description="A drug."):
+    return f"""
+<drug type="small molecule">
+    <drugbank-id primary="true">DB{index:05d}</drugbank-id>
+    <name>Drug{index}</name>
+    <description>{description}</description>
+    <synonyms><synonym>Synonym{index}</synonym></synonyms>
+    <products><product><name>Product{index}</name><manufacturer>Maker</manufacturer></product></products>
+    <groups><group>approved</group></groups>
+    <pathways>
+        <pathway>
+            <name>Pathway{index % 3}</name>
+            <drugs><drug><drugbank-id>DB{index:05d}</drugbank-id><name>Drug{index}</name></drug></drugs>
+        </pathway>
+    </pathways>
+    <targets>
+        <target>
+            <id>BE{index:07d}</id>
+            <name>Target{index}</name>
+            <polypeptide source="Swiss-Prot" id="P{index:05d}"><name>Protein{index}</name></polypeptide>
+        </target>
+    </targets>
+    <drug-interactions>
+        <drug-interaction>
+            <drugbank-id>DB00001</drugbank-id><name>Drug1</name><description>Interacts.</description>
+        </drug-interaction>
+    </drug-interactions>
+</drug>"""
+
+
+def release_xml(drugs):
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<drugbank xmlns="http://www.drugbank.ca" version="5.1">'
+            + "".join(drugs) + "\n</drugbank>\n")
+
+
+def assert_same_tables(tables, expected):
+    for table, result in expected.items():
+        parts = tables[table] if isinstance(result, tuple) else (tables[table],)
+        expected_parts = result if isinstance(result, tuple) else (result,)
+        for part, expected_part in zip(parts, expected_parts):
+            if isinstance(expected_part, pd.DataFrame):
+                pd.testing.assert_frame_equal(part, expected_part)
+            else:
+                assert part == expected_part
+
+
+@pytest.fixture
+def releases(tmp_path):
+    first = [drug_xml(i) for i in range(1, 11)]
+    # Drug 3 changes, drug 7 is removed and drug 11 is added.
+    second = [drug_xml(i, "A changed drug." if i == 3 else "A drug.") for i in range(1, 11) if i != 7]
+    second.append(drug_xml(11))
+
+    paths = []
+    for name, drugs in (("release1.xml", first), ("release2.xml", second)):
+        path = tmp_path / name
+        path.write_text(release_xml(drugs), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def test_incremental_parse_matches_full_parse(releases, tmp_path):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+
+    tables = parser.parse(releases[0])
+    assert_same_tables(tables, parse_all(etree.parse(releases[0]).getroot()))
+    assert parser.last_stats == (10, 0, 10, 0)
+
+    tables = parser.parse(releases[1])
+    assert_same_tables(tables, parse_all(etree.parse(releases[1]).getroot()))
+    # Only the changed and the added drug are extracted, the old version of drug 3 and drug 7 are dropped.
+    assert parser.last_stats == (10, 8, 2, 2)
+    assert list(tables["drugs"]["DrugBank_ID"])[-1] == "DB00011"
+
+    parser.parse(releases[1])
+    assert parser.last_stats == (10, 10, 0, 0)
+
+
+def test_formatting_changes_are_not_changes(releases, tmp_path):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(releases[0])
+
+    with open(releases[0], encoding="utf-8") as file:
+        text = file.read()
+    reformatted = tmp_path / "reformatted.xml"
+    reformatted.write_text(text.replace('<drug type="small molecule">', "<drug type='small molecule'  >"),
+                           encoding="utf-8")
+
+    parser.parse(str(reformatted))
+    assert parser.last_stats == (10, 10, 0, 0)
+
+
+def test_incremental_parse_of_archives(releases, tmp_path):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(releases[0])
+
+    archive = tmp_path / "release2.xml.gz"
+    with open(releases[1], "rb") as file, gzip.open(archive, "wb") as packed:
+        packed.write(file.read())
+
+    tables = parser.parse(str(archive), ("drugs", "targets"))
+    assert_same_tables(tables, parse_all(etree.parse(releases[1]).getroot(), ("drugs", "targets")))
+    assert parser.last_stats == (10, 8, 2, 2)
+
+
+def test_state_of_other_parsers_is_ignored(releases, tmp_path, monkeypatch):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(releases[0])
+
+    monkeypatch.setattr(incremental, "PARSER_VERSION", incremental.PARSER_VERSION + 1)
+    parser.parse(releases[0])
+    assert parser.last_stats == (10, 0, 10, 0)
+
+
+def test_unchanged_drugs_are_not_extracted_or_built_again(releases, tmp_path, monkeypatch):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(releases[0])
+    expected = parse_all(etree.parse(releases[1]).getroot())
+
+    extracted, built = set(), set()
+    for table, (extract, build, columns) in list(incremental.TABLE_PARSERS.items()):
+        def recording_extract(drug, extract=extract):
+            extracted.add(drug.findtext(incremental.PRIMARY_ID_PATH))
+            return extract(drug)
+
+        def recording_build(rows, build=build, columns=columns):
+            rows = list(rows)
+            if columns[0] == "DrugBank_ID":
+                built.update(row[0] for row in rows)
+            return build(rows)
+        monkeypatch.setitem(incremental.TABLE_PARSERS, table, (recording_extract, recording_build, columns))
+
+    tables = parser.parse(releases[1])
+    assert_same_tables(tables, expected)
+    # Only the changed and the added drug go through the extractors and the builders.
+    assert extracted == {"DB00003", "DB00011"}
+    assert built == {"DB00003", "DB00011"}
+
+
+def top_level_drugs(path):
+    """Splits a DrugBank XML file into its envelope and the texts of its top-level drugs."""
+    with open(path, encoding="utf-8") as file:
+        head, *drugs = file.read().split("\n<drug ")
+    drugs = ["\n<drug " + drug for drug in drugs]
+    drugs[-1], tail = drugs[-1].split("\n</drugbank>")
+    return head, drugs, "\n</drugbank>" + tail
+
+
+def test_incremental_parse_of_the_sample(tmp_path):
+    head, drugs, tail = top_level_drugs(SAMPLE_XML_PATH)
+    # DB00002 changes, DB00003 is removed, DB00004 moves to the front and a copy of DB00001 is added.
+    changed = drugs[1].replace("Epidermal growth factor receptor binding FAB.", "A changed drug.")
+    added = drugs[0].replace(">DB00001<", ">DB00005<", 1)
+    second = tmp_path / "second.xml"
+    second.write_text(head + drugs[3] + drugs[0] + changed + added + tail, encoding="utf-8")
+
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(SAMPLE_XML_PATH)
+    tables = parser.parse(str(second))
+
+    assert_same_tables(tables, parse_all(etree.parse(str(second)).getroot()))
+    assert parser.last_stats == (4, 2, 2, 2)
+
+
+def test_repeated_ids_are_parsed_in_full(releases, tmp_path):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(releases[0])
+
+    repeated = tmp_path / "repeated.xml"
+    repeated.write_text(release_xml([drug_xml(i) for i in range(1, 11)] + [drug_xml(3, "A copy.")]),
+                        encoding="utf-8")
+    tables = parser.parse(str(repeated))
+    assert_same_tables(tables, parse_all(etree.parse(str(repeated)).getroot()))
+    assert parser.last_stats == (11, 0, 11, 0)
+
+
+def test_tables_without_cached_parts_are_parsed_in_full(releases, tmp_path):
+    parser = IncrementalParser(str(tmp_path / "cache"))
+    parser.parse(releases[0], ("drugs",))
+
+    tables = parser.parse(releases[1], ("drugs", "genes"))
+    assert_same_tables(tables, parse_all(etree.parse(releases[1]).getroot(), ("drugs", "genes")))
+    assert parser.last_stats == (10, 0, 10, 2)
@@ -0,0 +1,89 @@
+# tests/test_interaction_graph.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from drugbank.interaction_graph import InteractionGraph, pack_strings, unpack_string
+from drugbank.parsers import parse_drug_interactions
+from drugbank.xml_source import parse_xml
+from tests.sample_data import SAMPLE_XML_PATH
+
+
+@pytest.fixture
+def interactions():
+    rows = [
+        ("DB00003", "Drug3", "DB00001", "Drug1", "Increases effects."),
+        ("DB00001", "Drug1", "DB00002", "Drug2", "Decreases effects."),
+        ("DB00001", "Drug1", "DB00003", "Drug3", "Increases effects."),
+        ("DB00002", "Drug2", "DB00004", "Drug4", None),
+        (None, "Drug9", "DB00001", "Drug1", "Unknown drug."),
+    ]
+    columns = ["DrugBank_ID", "Drug", "Interacting_Drug_ID", "Interacting_Drug", "Description"]
+    return pd.DataFrame(rows, columns=columns, dtype="string")
+
+
+def test_pack_strings():
+    offsets, data = pack_strings(["Łódź", None, "abc"])
+    assert [unpack_string(offsets, data, position) for position in range(3)] == ["Łódź", None, "abc"]
+
+
+def test_from_frame(interactions):
+    graph = InteractionGraph.from_frame(interactions)
+
+    assert graph.ids.tolist() == ["DB00001", "DB00002", "DB00003", "DB00004"]
+    assert graph.indices.dtype == np.int32
+    # The row without a DrugBank ID is dropped.
+    assert graph.edge_count == 4
+    assert graph.neighbours("DB00001") == ["DB00002", "DB00003"]
+    assert graph.neighbours("DB00004") == []
+    assert graph.neighbours("DB99999") == []
+    assert graph.interactions("DB00002") == [("DB00004", "Drug4", None)]
+    assert graph.interactions("DB00003") == [("DB00001", "Drug1", "Increases effects.")]
+    assert graph.name("DB00004") == "Drug4"
+    # Equal descriptions are stored once.
+    assert len(graph.description_offsets) == 3
+
+
+def test_degrees(interactions):
+    graph = InteractionGraph.from_frame(interactions)
+
+    assert graph.degree("DB00001") == 2
+    assert graph.degrees().to_dict() == {"DB00001": 2, "DB00002": 1, "DB00003": 1, "DB00004": 0}
+    assert graph.degree_distribution().to_dict() == {0: 1, 1: 2, 2: 1}
+
+
+def test_k_hop(interactions):
+    graph = InteractionGraph.from_frame(interactions)
+
+    assert graph.k_hop("DB00003", 1) == {"DB00001": 1}
+    assert graph.k_hop("DB00003", 3) == {"DB00001": 1, "DB00002": 2, "DB00004": 3}
+    assert graph.k_hop("DB00004", 2) == {}
+    assert graph.k_hop("DB99999", 2) == {}
+
+    symmetric = InteractionGraph.from_frame(interactions, symmetric=True)
+    assert symmetric.neighbours("DB00004") == ["DB00002"]
+    # DB00001 -> DB00003 and DB00003 -> DB00001 are both listed, so they are not added again.
+    assert symmetric.neighbours("DB00001") == ["DB00002", "DB00003"]
+    assert symmetric.k_hop("DB00004", 2) == {"DB00002": 1, "DB00001": 2}
+
+
+def test_save_and_load(interactions, tmp_path):
+    graph = InteractionGraph.from_frame(interactions)
+    graph.save(str(tmp_path / "graph"))
+
+    loaded = InteractionGraph.load(str(tmp_path / "graph"))
+    assert isinstance(loaded.indices, np.memmap)
+    assert loaded.neighbours("DB00001") == graph.neighbours("DB00001")
+    assert loaded.interactions("DB00003") == graph.interactions("DB00003")
+    assert loaded.k_hop("DB00003", 3) == graph.k_hop("DB00003", 3)
+
+    in_memory = InteractionGraph.load(str(tmp_path / "graph"), mmap=False)
+    assert not isinstance(in_memory.indices, np.memmap)
+
+
+def test_matches_dataframe_scan():
+    df = parse_drug_interactions(parse_xml(SAMPLE_XML_PATH))
+    graph = InteractionGraph.from_frame(df)
+
+    for drug_id in df["DrugBank_ID"].unique():
+        assert graph.neighbours(drug_id) == df.loc[df["DrugBank_ID"] == drug_id, "Interacting_Drug_ID"].tolist()
@@ -0,0 +1,177 @@
+# tests/test_iter_parsers.py
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+from lxml import etree
+
+from drugbank.iter_parsers import (
+    RECORD_TABLES,
+    DrugContext,
+    drug_context,
+    iter_records,
+    parse_approval_status_for_drug,
+    parse_drug,
+    parse_drug_interactions_for_drug,
+    parse_pathways_for_drug,
+    parse_products_for_drug,
+    parse_synonyms_for_drug,
+    parse_targets_for_drug,
+)
+from drugbank.parsers import TABLE_PARSERS, parse_all
+from drugbank.simulator import write_repeated_drugs
+from drugbank.xml_source import parse_xml
+from tests.sample_data import SAMPLE_XML_PATH
+from tests.test_incremental import assert_same_tables
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <name>Lepirudin</name>
+        <synonyms><synonym>Hirudin variant-1</synonym></synonyms>
+        <groups><group>approved</group><group>withdrawn</group></groups>
+        <pathways>
+            <pathway>
+                <name>Lepirudin Action Pathway</name>
+                <drugs><drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug></drugs>
+            </pathway>
+        </pathways>
+        <targets>
+            <target>
+                <id>BE0000048</id>
+                <name>Prothrombin</name>
+                <polypeptide id="P00734" source="Swiss-Prot"><name>Prothrombin</name><gene-name>F2</gene-name></polypeptide>
+            </target>
+        </targets>
+        <drug-interactions>
+            <drug-interaction><drugbank-id>DB06605</drugbank-id><name>Apixaban</name><description>Risk.</description></drug-interaction>
+            <drug-interaction><drugbank-id>DB06695</drugbank-id><name>Dabigatran</name><description>Risk.</description></drug-interaction>
+        </drug-interactions>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>Cetuximab</name>
+        <groups><group>approved</group></groups>
+        <products><product><name>Erbitux</name><ndc-id>66733-948</ndc-id></product></products>
+    </drug>
+</drugbank>
+"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugs.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def collect(batches):
+    records = {}
+    for table, batch in batches:
+        records.setdefault(table, []).extend(batch)
+    return records
+
+
+def test_iter_records(xml_path):
+    records = collect(iter_records(xml_path))
+
+    assert set(records) == set(RECORD_TABLES)
+    # The <drug> of the pathway is not a record of its own.
+    assert [drug["DrugBank_ID"] for drug in records["drugs"]] == ["DB00001", "DB00002"]
+    assert records["synonyms"][0] == {"DrugBank_ID": "DB00001", "Synonyms": ["Hirudin variant-1"]}
+    assert records["targets"] == [{
+        "DrugBank_ID": "DB00001", "Drug": "Lepirudin", "Target_ID": "BE0000048", "Target_Name": "Prothrombin",
+        "Source": "Swiss-Prot", "External_ID": "P00734", "Polypeptide_Name": "Prothrombin", "Gene_Name": "F2",
+        "GenAtlas_ID": "Unknown", "Chromosome": "Unknown", "Cellular_Location": "Unknown",
+        "Amino_Acid_Count": None}]
+    assert [(status["Groups"], status["Status"]) for status in records["approval_status"]] == \
+        [(["approved", "withdrawn"], {"Approved": 1, "Withdrawn": 1}), (["approved"], {"Approved": 1})]
+    assert [(product["DrugBank_ID"], product["Product Name"], product["NDC Code"])
+            for product in records["product_table"]] == [("DB00002", "Erbitux", "66733-948")]
+    assert [(interaction["DrugBank_ID"], interaction["Interacting_Drug_ID"])
+            for interaction in records["drug_interactions"]] == [("DB00001", "DB06605"), ("DB00001", "DB06695")]
+    assert records["pathways"] == [{"DrugBank_ID": "DB00001", "Pathway": "Lepirudin Action Pathway"}]
+
+
+def test_iter_records_match_parse_all():
+    records = collect(iter_records(SAMPLE_XML_PATH))
+    expected = parse_all(parse_xml(SAMPLE_XML_PATH), tuple(RECORD_TABLES))
+
+    # The records hold the rows of the compiled extractors, so the builders turn them into the parse_all tables.
+    tables = {}
+    for table, (_, build, columns) in TABLE_PARSERS.items():
+        if table in RECORD_TABLES:
+            tables[table] = build([tuple(record[column] for column in columns) for record in records[table]])
+    assert_same_tables(tables, expected)
+
+
+def test_iter_records_batches(xml_path):
+    batches = list(iter_records(xml_path, tables=("drugs", "drug_interactions"), batch_size=1))
+
+    # A drug with two interactions still gives batches of at most batch_size records.
+    assert [(table, len(batch)) for table, batch in batches] == \
+        [("drugs", 1), ("drug_interactions", 1), ("drug_interactions", 1), ("drugs", 1)]
+
+    frames = list(iter_records(xml_path, tables=("drugs",), batch_size=10, frames=True))
+    assert len(frames) == 1
+    table, frame = frames[0]
+    assert isinstance(frame, pd.DataFrame)
+    assert frame["Name"].tolist() == ["Lepirudin", "Cetuximab"]
+
+
+def test_iter_records_unknown_table(xml_path):
+    with pytest.raises(ValueError):
+        list(iter_records(xml_path, tables=("genes",)))
+    with pytest.raises(ValueError):
+        list(iter_records(xml_path, batch_size=0))
+
+
+def peak_rss_kb(path):
+    """Streams the file in a fresh process and returns its peak RSS."""
+    code = ("import resource, sys\n"
+            "from drugbank.iter_parsers import iter_records\n"
+            "for _ in iter_records(sys.argv[1]): pass\n"
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+    return int(subprocess.run([sys.executable, "-c", code, path], check=True, capture_output=True,
+                              text=True).stdout.split()[-1])
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="ru_maxrss is in kilobytes on Linux only")
+def test_iter_records_memory_is_bounded(tmp_path):
+    small, large = str(tmp_path / "small.xml"), str(tmp_path / "large.xml")
+    write_repeated_drugs(SAMPLE_XML_PATH, small, 500)
+    write_repeated_drugs(SAMPLE_XML_PATH, large, 5000)
+
+    # A tree of all 5000 drugs would take over 100 MiB more; streamed, the peak RSS stays about the same.
+    assert peak_rss_kb(large) - peak_rss_kb(small) < 30 * 1024
+
+
+def test_drug_context():
+    root = etree.fromstring(XML.encode("utf-8"))
+    drug = root[0]
+    context = DrugContext(drug)
+
+    assert (context.drug_id, context.name) == ("DB00001", "Lepirudin")
+    assert not hasattr(context, "__dict__")
+    assert drug_context(context) is context
+    # The parsers give the same results for the element and for its context.
+    for parse in (parse_drug, parse_synonyms_for_drug, parse_products_for_drug, parse_targets_for_drug,
+                  parse_approval_status_for_drug, parse_drug_interactions_for_drug, parse_pathways_for_drug):
+        assert parse(drug) == parse(context)
+    assert parse_drug_interactions_for_drug(context)["Interactions"][0]["Drug"] == "Lepirudin"
+
+
+def test_drug_without_primary_id_is_rejected():
+    drug = etree.fromstring("""<drug xmlns="http://www.drugbank.ca">
+        <drugbank-id>DB00001</drugbank-id>
+        <name>Lepirudin</name>
+        <targets><target><id>BE0000048</id><name>Prothrombin</name><polypeptide/></target></targets>
+    </drug>""")
+    context = DrugContext(drug)
+
+    assert context.drug_id is None
+    for parse in (parse_drug, parse_synonyms_for_drug, parse_products_for_drug, parse_targets_for_drug,
+                  parse_approval_status_for_drug, parse_drug_interactions_for_drug, parse_pathways_for_drug):
+        assert parse(context) is None
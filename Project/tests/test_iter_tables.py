@@ -0,0 +1,205 @@
+# tests/test_iter_tables.py
+import os
+
+import pandas as pd
+import pytest
+from lxml import etree
+
+from drugbank.iter_tables import (
+    ProductIndex,
+    build_product_index,
+    iter_genes,
+    parse_genes_streaming,
+    parse_pathways_streaming,
+)
+from drugbank.parsers import GENE_COLUMNS, parse_genes, parse_pathways
+from tests.sample_data import SAMPLE_XML_PATH
+
+# DB00001 interacts with DB00002 and DB00003, whose products come after it in the file. DB00003 is listed twice:
+# like in parse_genes, only the products of its last entry count.
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <name>Lepirudin</name>
+        <pathways>
+            <pathway>
+                <name>Lepirudin Action Pathway</name>
+                <drugs>
+                    <drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug>
+                    <drug><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug>
+                </drugs>
+            </pathway>
+        </pathways>
+        <targets>
+            <target><polypeptide><gene-name>F2</gene-name></polypeptide></target>
+            <target><polypeptide><gene-name>F10</gene-name></polypeptide></target>
+        </targets>
+        <drug-interactions>
+            <drug-interaction><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug-interaction>
+            <drug-interaction><drugbank-id>DB00003</drugbank-id><name>Dornase alfa</name></drug-interaction>
+            <drug-interaction><drugbank-id>DB09999</drugbank-id><name>Unknown</name></drug-interaction>
+        </drug-interactions>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>Cetuximab</name>
+        <pathways>
+            <pathway>
+                <name>Lepirudin Action Pathway</name>
+                <drugs><drug><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug></drugs>
+            </pathway>
+        </pathways>
+        <products>
+            <product><name>Erbitux</name><ndc-id>66733-948</ndc-id></product>
+            <product><name>Erbitux</name><ndc-id></ndc-id><dpd-id>02271249</dpd-id></product>
+            <product><name>Erbitux</name><ndc-id>66733-948</ndc-id></product>
+        </products>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00003</drugbank-id>
+        <name>Dornase alfa</name>
+        <products><product><name>Old</name><ndc-id>1</ndc-id></product></products>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00003</drugbank-id>
+        <name>Dornase alfa</name>
+        <products><product><name>Pulmozyme</name><ema-ma-number>EU/1</ema-ma-number></product></products>
+    </drug>
+</drugbank>
+"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def root():
+    return etree.fromstring(XML.encode("utf-8"))
+
+
+def test_parse_genes_streaming_matches_parse_genes(xml_path, root):
+    expected = parse_genes(root)
+    genes = parse_genes_streaming(xml_path)
+
+    assert len(genes) == 6
+    assert "Old" not in genes["Product_Name"].tolist()
+    # The categories of Product_ID_Type come from all the products in parse_genes, from the rows here.
+    pd.testing.assert_frame_equal(genes, expected, check_categorical=False)
+
+
+def test_parse_pathways_streaming_matches_parse_pathways_on_the_sample():
+    expected, expected_counts = parse_pathways(etree.parse(SAMPLE_XML_PATH).getroot())
+    pathways, counts = parse_pathways_streaming(SAMPLE_XML_PATH)
+
+    pd.testing.assert_frame_equal(pathways, expected)
+    assert counts == expected_counts
+
+
+def test_parse_genes_streaming_matches_parse_genes_on_the_sample():
+    expected = parse_genes(etree.parse(SAMPLE_XML_PATH).getroot())
+    pd.testing.assert_frame_equal(parse_genes_streaming(SAMPLE_XML_PATH), expected,
+                                  check_categorical=False)
+
+
+# DB00005 is listed twice with different genes and interactions, and DB00004 repeats the rows of DB00005 under
+# another ID. Like in parse_genes, the genes of every entry of DB00005 meet the interactions of every entry,
+# and the repeated rows are left out.
+DUPLICATED_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00005</drugbank-id>
+        <name>Etanercept</name>
+        <targets><target><polypeptide><gene-name>TNF</gene-name></polypeptide></target></targets>
+        <drug-interactions>
+            <drug-interaction><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug-interaction>
+        </drug-interactions>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>Cetuximab</name>
+        <products>
+            <product><name>Erbitux</name><ndc-id>66733-948</ndc-id></product>
+            <product><name>Erbitux</name><dpd-id>02271249</dpd-id></product>
+        </products>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00004</drugbank-id>
+        <name>Etanercept</name>
+        <targets><target><polypeptide><gene-name>TNF</gene-name></polypeptide></target></targets>
+        <drug-interactions>
+            <drug-interaction><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug-interaction>
+        </drug-interactions>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00005</drugbank-id>
+        <name>Etanercept</name>
+        <targets>
+            <target><polypeptide><gene-name>LTA</gene-name></polypeptide></target>
+            <target><polypeptide><gene-name>TNF</gene-name></polypeptide></target>
+        </targets>
+        <drug-interactions>
+            <drug-interaction><drugbank-id>DB00003</drugbank-id><name>Dornase alfa</name></drug-interaction>
+            <drug-interaction><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug-interaction>
+        </drug-interactions>
+    </drug>
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00003</drugbank-id>
+        <name>Dornase alfa</name>
+        <products><product><name>Pulmozyme</name><ema-ma-number>EU/1</ema-ma-number></product></products>
+    </drug>
+</drugbank>
+"""
+
+
+def test_streaming_genes_of_duplicated_drugs_match_parse_genes(tmp_path):
+    path = tmp_path / "duplicated.xml"
+    path.write_text(DUPLICATED_XML, encoding="utf-8")
+    expected = parse_genes(etree.fromstring(DUPLICATED_XML.encode("utf-8")))
+
+    genes = parse_genes_streaming(str(path))
+    assert len(genes) == 6
+    assert not genes.duplicated().any()
+    pd.testing.assert_frame_equal(genes, expected, check_categorical=False)
+    records = [record for batch in iter_genes(str(path), batch_size=4) for record in batch]
+    assert records == expected.astype(object).to_dict("records")
+
+
+def test_parse_pathways_streaming_matches_parse_pathways(xml_path, root):
+    expected, expected_counts = parse_pathways(root)
+    pathways, counts = parse_pathways_streaming(xml_path)
+
+    pd.testing.assert_frame_equal(pathways, expected)
+    assert counts == expected_counts == {"DB00001": 1, "DB00002": 1}
+
+
+def test_iter_genes_batches(xml_path, root):
+    batches = list(iter_genes(xml_path, batch_size=4))
+
+    assert [len(batch) for batch in batches] == [4, 2]
+    records = [record for batch in batches for record in batch]
+    assert records == parse_genes(root).astype(object).to_dict("records")
+    assert list(records[0]) == GENE_COLUMNS
+
+
+def test_product_index(xml_path, tmp_path):
+    index_path = str(tmp_path / "products.sqlite")
+    with build_product_index(xml_path, index_path) as index:
+        products = index.connection.execute(
+            "SELECT drug_id, product_name, product_id, product_id_type FROM products ORDER BY rowid").fetchall()
+        assert products == [("DB00002", "Erbitux", "66733-948", "ndc-id"), ("DB00002", "Erbitux", "02271249", "dpd-id"),
+                            ("DB00003", "Pulmozyme", "EU/1", "ema-ma-number")]
+    # An index with a path is kept.
+    assert os.path.exists(index_path)
+
+
+def test_temporary_product_index_is_removed():
+    with ProductIndex() as index:
+        index.add("DB00001", [("Refludan", "1", "ndc-id")])
+        path = index.path
+        assert os.path.exists(path)
+    assert not os.path.exists(path)
@@ -0,0 +1,89 @@
+# tests/test_name_index.py
+import os
+
+import pandas as pd
+import pytest
+
+from drugbank.cache import ParseCache
+from drugbank.name_index import NameIndex, NameMatch, edit_distance, load_name_index, normalize
+from tests.test_cache import XML
+
+
+@pytest.fixture
+def index():
+    drugs = pd.DataFrame({"DrugBank_ID": ["DB00001", "DB00002", "DB00003"],
+                          "Name": ["Lepirudin", "Cetuximab", "Dornase alfa"]})
+    synonyms = pd.DataFrame({"DrugBank_ID": ["DB00001", "DB00002"],
+                             "Synonyms": [["Hirudin variant-1", "Lepirudin recombinant"], []]})
+    product_table = pd.DataFrame({"DrugBank_ID": ["DB00001", "DB00002", "DB00003", "DB00002"],
+                                  "Product Name": ["Refludan", "Erbitux", "Pulmozyme", None]})
+    return NameIndex.from_tables(drugs, synonyms, product_table)
+
+
+def test_normalize():
+    assert normalize("  Hirudin   Variant-1 ") == "hirudin variant 1"
+    assert normalize("Dornase_ALFA") == "dornase alfa"
+    assert normalize("Lépirudin®") == "lepirudin"
+
+
+def test_edit_distance():
+    assert edit_distance("lepirudin", "lepirudin", 1) == 0
+    assert edit_distance("lepirudin", "lepirudn", 1) == 1
+    assert edit_distance("kitten", "sitting", 3) == 3
+    # Distances over the bound are reported as bound + 1.
+    assert edit_distance("kitten", "sitting", 2) == 3
+    assert edit_distance("a", "abcd", 1) == 2
+
+
+def test_exact(index):
+    assert len(index) == 8
+    assert index.exact("Refludan") == ["DB00001"]
+    assert index.exact("hirudin variant 1") == ["DB00001"]
+    assert index.exact("ERBITUX") == ["DB00002"]
+    assert index.exact("Aspirin") == []
+
+
+def test_prefix(index):
+    assert [match.name for match in index.prefix("lep")] == ["Lepirudin", "Lepirudin recombinant"]
+    assert index.prefix("lep", limit=1) == [NameMatch("Lepirudin", ["DB00001"], 0)]
+    assert index.prefix("zzz") == []
+
+
+def test_fuzzy(index):
+    assert index.fuzzy("lepirudn") == [NameMatch("Lepirudin", ["DB00001"], 1)]
+    assert index.fuzzy("Pulmozime") == [NameMatch("Pulmozyme", ["DB00003"], 1)]
+    assert index.fuzzy("cetuximab") == [NameMatch("Cetuximab", ["DB00002"], 0)]
+    # The index is built for one edit.
+    assert index.fuzzy("ertibux") == []
+    assert NameIndex.from_tables(pd.DataFrame({"DrugBank_ID": ["DB00002"], "Name": ["Erbitux"]}),
+                                 max_distance=2).fuzzy("ertibux") == [NameMatch("Erbitux", ["DB00002"], 2)]
+
+
+def test_lookup(index):
+    assert index.lookup("refludan") == [NameMatch("Refludan", ["DB00001"], 0)]
+    assert index.lookup("dornase") == [NameMatch("Dornase alfa", ["DB00003"], 0)]
+    assert index.lookup("erbitx") == [NameMatch("Erbitux", ["DB00002"], 1)]
+
+
+def test_save_and_load(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = NameIndex.load(str(tmp_path))
+
+    assert loaded.exact("Refludan") == ["DB00001"]
+    assert loaded.prefix("lep") == index.prefix("lep")
+    assert loaded.fuzzy("lepirudn") == index.fuzzy("lepirudn")
+
+
+def test_load_name_index_is_cached(tmp_path):
+    xml_path = tmp_path / "drugbank.xml"
+    xml_path.write_text(XML, encoding="utf-8")
+    cache_dir = str(tmp_path / "cache")
+
+    index = load_name_index(str(xml_path), cache_dir=cache_dir)
+    assert index.exact("Refludan") == ["DB00001"]
+    entry_dir = ParseCache(cache_dir).entry_dir(str(xml_path))
+    assert os.path.exists(os.path.join(entry_dir, "name_index.delete_hashes.npy"))
+
+    cached = load_name_index(str(xml_path), cache_dir=cache_dir)
+    assert cached.exact("Cetuximab") == ["DB00002"]
+    assert cached.fuzzy("hirudin varient 1") == index.fuzzy("hirudin varient 1")
@@ -0,0 +1,90 @@
+# tests/test_parallel.py
+import pytest
+import pandas as pd
+from lxml import etree
+
+from drugbank.parsers import parse_all
+from drugbank.parallel import (
+    scan_drug_offsets,
+    split_shards,
+    parse_all_parallel
+)
+
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" version="5.1">
+<drug type="biotech">
+    <drugbank-id primary="true">DB00001</drugbank-id>
+    <name>Lepirudin</name>
+    <pathways>
+        <pathway>
+            <name>Lepirudin Action Pathway</name>
+            <drugs>
+                <drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug>
+                <drug><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug>
+            </drugs>
+        </pathway>
+    </pathways>
+    <drug-interactions>
+        <drug-interaction>
+            <drugbank-id>DB00002</drugbank-id>
+            <name>Cetuximab</name>
+            <description>Increases the risk of bleeding.</description>
+        </drug-interaction>
+    </drug-interactions>
+    <groups><group>approved</group></groups>
+</drug>
+<drug type="biotech">
+    <drugbank-id primary="true">DB00002</drugbank-id>
+    <name>Cetuximab</name>
+    <products>
+        <product><name>Erbitux</name><ndc-id>66733-948</ndc-id></product>
+    </products>
+    <groups><group>approved</group><group>withdrawn</group></groups>
+</drug>
+<drug type="small molecule">
+    <drugbank-id primary="true">DB00003</drugbank-id>
+    <name>Dornase alfa</name>
+</drug>
+</drugbank>
+"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def test_scan_drug_offsets_skips_nested_drugs(xml_path):
+    offsets = scan_drug_offsets(xml_path)
+    assert len(offsets) == 3
+
+    with open(xml_path, "rb") as file:
+        data = file.read()
+    for start, end in offsets:
+        drug = etree.fromstring(data[start:end].replace(b"<drug ", b"<drug xmlns='http://www.drugbank.ca' ", 1))
+        assert drug.tag == "{http://www.drugbank.ca}drug"
+
+
+def test_split_shards():
+    offsets = [(0, 10), (10, 20), (20, 30), (30, 40)]
+    assert split_shards(offsets, 2) == [(0, 20), (20, 40)]
+    assert split_shards(offsets, 1) == [(0, 40)]
+    assert split_shards(offsets, 10) == offsets
+    assert split_shards([], 4) == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_all_parallel(xml_path, workers):
+    expected = parse_all(etree.parse(xml_path).getroot())
+    result = parse_all_parallel(xml_path, workers=workers)
+
+    pd.testing.assert_frame_equal(result["drugs"], expected["drugs"])
+    pd.testing.assert_frame_equal(result["products"], expected["products"])
+    pd.testing.assert_frame_equal(result["pathways"][0], expected["pathways"][0])
+    pd.testing.assert_frame_equal(result["drug_interactions"], expected["drug_interactions"])
+    pd.testing.assert_frame_equal(result["genes"], expected["genes"])
+    assert result["approval_status"][1] == expected["approval_status"][1] == 1
+    assert list(result["drugs"]["DrugBank_ID"]) == ["DB00001", "DB00002", "DB00003"]
@@ -1,5 +1,7 @@
 # tests/test_parsers.py
+import time
 import pytest
+from collections import Counter
 from lxml import etree
 
 from drugbank.parsers import (
@@ -12,11 +14,22 @@ from drugbank.parsers import (
     parse_drugs,
     parse_approval_status,
     parse_drug_interactions,
+    parse_genes,
+    parse_all,
+    TABLES,
+    sequence_length,
     get_target_amino_acid_count_for_drug,
     get_amino_acid_count_from_html,
     get_amino_acid_count_for_target,
+    get_uniprot_cards_page,
+    parse_uniprot_cards,
+    UniProtCardIndex,
+    batch_query,
+    batches,
+    lookup_amino_acid_counts,
     pd
 )
+from tests.uniprot_mock import FakeBrowser, serve_uniprot
 
 
 @pytest.fixture
@@ -105,6 +118,40 @@ def missing_elements_xml():
     return etree.fromstring(xml)
 
 
+@pytest.fixture
+def gene_xml():
+    xml = """<drugbank xmlns="http://www.drugbank.ca">
+                <drug>
+                    <drugbank-id primary="true">DB00001</drugbank-id>
+                    <name>Lepirudin</name>
+                    <targets>
+                        <target><polypeptide><gene-name>F2</gene-name></polypeptide></target>
+                        <target><polypeptide><gene-name>F2</gene-name></polypeptide></target>
+                    </targets>
+                    <drug-interactions>
+                        <drug-interaction>
+                            <drugbank-id>DB00002</drugbank-id>
+                            <name>Urokinase</name>
+                        </drug-interaction>
+                        <drug-interaction>
+                            <drugbank-id>DB00003</drugbank-id>
+                            <name>Unknown</name>
+                        </drug-interaction>
+                    </drug-interactions>
+                </drug>
+                <drug>
+                    <drugbank-id primary="true">DB00002</drugbank-id>
+                    <name>Urokinase</name>
+                    <products>
+                        <product><name>Kinlytic</name><ndc-id>24430-1003</ndc-id></product>
+                        <product><name>Kinlytic</name><ndc-id/><dpd-id>00743242</dpd-id></product>
+                        <product><name>No identifier</name></product>
+                    </products>
+                </drug>
+              </drugbank>"""
+    return etree.fromstring(xml)
+
+
 def test_parse_multiple_drugs(multiple_drugs_xml):
     df = parse_drugs(multiple_drugs_xml)
     assert len(df) == 2
@@ -115,7 +162,7 @@ def test_parse_multiple_drugs(multiple_drugs_xml):
 def test_parse_missing_elements(missing_elements_xml):
     df = parse_drugs(missing_elements_xml)
     assert len(df) == 1
-    assert df.iloc[0]["Name"] is None  # Name is missing
+    assert pd.isna(df.iloc[0]["Name"])  # Name is missing
 
 
 def test_parse_drugs(empty_xml, single_drug_xml):
@@ -128,6 +175,18 @@ def test_parse_drugs(empty_xml, single_drug_xml):
     assert df.iloc[0]["Name"] == "Aspirin"
 
 
+def test_parser_dtypes(single_drug_xml):
+    drugs = parse_drugs(single_drug_xml)
+    assert isinstance(drugs["Type"].dtype, pd.CategoricalDtype)
+    assert isinstance(drugs["State"].dtype, pd.CategoricalDtype)
+    assert isinstance(drugs["Name"].dtype, pd.StringDtype)
+
+    targets, _ = parse_targets(single_drug_xml)
+    for column in ("Source", "Chromosome", "Cellular_Location"):
+        assert isinstance(targets[column].dtype, pd.CategoricalDtype)
+    assert isinstance(targets["Gene_Name"].dtype, pd.StringDtype)
+
+
 def test_parse_synonyms(empty_xml, single_drug_xml):
     df_empty = parse_synonyms(empty_xml)
     assert df_empty.empty
@@ -149,6 +208,39 @@ def test_parse_products(empty_xml, single_drug_xml):
     assert df.iloc[0]["Products"][0]["Manufacturer"] == "Bayer"
 
 
+def test_parse_products_deduplicates_and_long_format(empty_xml):
+    xml = etree.fromstring("""<drugbank xmlns="http://www.drugbank.ca">
+                <drug>
+                    <drugbank-id primary="true">DB00001</drugbank-id>
+                    <products>
+                        <product><name>Aspirin</name><manufacturer>Bayer</manufacturer></product>
+                        <product><name>Aspirin</name><manufacturer>Bayer</manufacturer></product>
+                        <product><name>Aspirin</name><country>US</country></product>
+                    </products>
+                </drug>
+                <drug>
+                    <drugbank-id primary="true">DB00002</drugbank-id>
+                    <products>
+                        <product><name>Aspirin</name><manufacturer>Bayer</manufacturer></product>
+                    </products>
+                </drug>
+              </drugbank>""")
+
+    df = parse_products(xml)
+    products = df.loc["DB00001", "Products"]
+    assert [(product["Manufacturer"], product["Country"]) for product in products] == [("Bayer", None), (None, "US")]
+    assert list(products[0]) == ["Product Name", "Manufacturer", "NDC Code", "Form", "Route", "Strength", "Country",
+                                 "Approval Agency"]
+
+    long_df = parse_products(xml, long_format=True)
+    assert list(long_df["DrugBank_ID"]) == ["DB00001", "DB00001", "DB00002"]
+    assert list(long_df.columns) == ["DrugBank_ID"] + list(products[0])
+    assert long_df["Manufacturer"].dtype == "category"
+    assert pd.isna(long_df.iloc[1]["Manufacturer"])
+
+    assert parse_products(empty_xml, long_format=True).empty
+
+
 def test_parse_pathways(empty_xml, single_drug_xml):
     df_empty, _ = parse_pathways(empty_xml)
     assert df_empty.empty
@@ -171,12 +263,47 @@ def test_parse_targets(empty_xml, single_drug_xml):
     assert df.iloc[0]["Polypeptide_Name"] == "Cyclooxygenase-1"
 
 
+def test_sequence_length():
+    assert sequence_length(">lcl|BSEQ0001 Prothrombin\nMAHVRGLQLP\nGCLALAALC \n") == 19
+    assert sequence_length("MAHVRGLQLP*") == 10
+    assert sequence_length(">header only\n") is None
+
+
+def test_parse_targets_amino_acid_count():
+    xml = """<drugbank xmlns="http://www.drugbank.ca">
+                <drug>
+                    <drugbank-id primary="true">DB00001</drugbank-id>
+                    <name>Lepirudin</name>
+                    <targets>
+                        <target>
+                            <id>BE0000048</id>
+                            <name>Prothrombin</name>
+                            <polypeptide id="P00734" source="Swiss-Prot">
+                                <amino-acid-sequence format="FASTA">&gt;lcl|BSEQ0001 Prothrombin
+MAHVRGLQLPGCLALAALCSLVHSQHVFLAPQQARSLLQRVRRANTFLEEVRKGNLERECVEETCSYEEAFEALESSTATDVFWAKYTACETARTPRDKLAACLEG
+NCAEGLGTNYRGHVNITRSGIECQLWRSRYPHKPEINSTTHPGADLQENFCRNPDSSTTGPWCYTTDPTVRRQECSIPVCGQDQVTVAMTPRSEGSSVNLSPPLE</amino-acid-sequence>
+                            </polypeptide>
+                        </target>
+                        <target>
+                            <id>BE0000049</id>
+                            <name>Factor X</name>
+                            <polypeptide id="P00742" source="Swiss-Prot"/>
+                        </target>
+                    </targets>
+                </drug>
+              </drugbank>"""
+    df, _ = parse_targets(etree.fromstring(xml))
+    assert df["Amino_Acid_Count"].tolist() == [211, pd.NA]
+    assert str(df["Amino_Acid_Count"].dtype) == "Int64"
+
+
 def test_parse_drug_interactions(empty_xml, single_drug_xml):
     df_empty = parse_drug_interactions(empty_xml)
     assert df_empty.empty
 
     df = parse_drug_interactions(single_drug_xml)
     assert len(df) == 1
+    assert df.iloc[0]["DrugBank_ID"] == "DB00001"
     assert df.iloc[0]["Interacting_Drug_ID"] == "DB00002"
     assert df.iloc[0]["Interacting_Drug"] == "Warfarin"
     assert "Increases risk of bleeding." in df.iloc[0]["Description"]
@@ -192,6 +319,148 @@ def test_parse_approval_status(empty_xml, single_drug_xml):
     assert approved_not_withdrawn == 1
 
 
+def test_parse_genes(empty_xml, gene_xml):
+    df_empty = parse_genes(empty_xml)
+    assert df_empty.empty
+
+    df = parse_genes(gene_xml)
+    assert list(df.columns) == ["Gene", "Drug", "Interacting_Drug", "Product_Name", "Product_ID", "Product_ID_Type"]
+    assert len(df) == 2
+    assert set(df["Gene"]) == {"F2"}
+    assert set(df["Interacting_Drug"]) == {"Urokinase"}
+    assert list(df["Product_ID_Type"]) == ["ndc-id", "dpd-id"]
+
+
+def test_parse_genes_drops_repeated_rows():
+    # Two drugs with different IDs, but the same name, gene and interaction, give the same rows once.
+    drug = """<drug>
+                  <drugbank-id primary="true">{}</drugbank-id>
+                  <name>Lepirudin</name>
+                  <targets><target><polypeptide><gene-name>F2</gene-name></polypeptide></target></targets>
+                  <drug-interactions>
+                      <drug-interaction><drugbank-id>DB00002</drugbank-id><name>Urokinase</name></drug-interaction>
+                  </drug-interactions>
+              </drug>"""
+    root = etree.fromstring(f"""<drugbank xmlns="http://www.drugbank.ca">
+                {drug.format("DB00001")}
+                {drug.format("DB00003")}
+                <drug>
+                    <drugbank-id primary="true">DB00002</drugbank-id>
+                    <name>Urokinase</name>
+                    <products><product><name>Kinlytic</name><ndc-id>24430-1003</ndc-id></product></products>
+                </drug>
+              </drugbank>""")
+
+    df = parse_genes(root)
+    assert df.values.tolist() == [["F2", "Lepirudin", "Urokinase", "Kinlytic", "24430-1003", "ndc-id"]]
+    assert list(df.index) == [0]
+    pd.testing.assert_frame_equal(parse_all(root, ["genes"])["genes"], df)
+
+
+def test_parse_genes_normalized(gene_xml):
+    tables = parse_genes(gene_xml, explode=False)
+    assert len(tables.genes) == 1
+    assert len(tables.interactions) == 2
+    assert list(tables.products.loc["DB00002", "Product_ID"]) == ["24430-1003", "00743242"]
+
+
+def test_parse_all(empty_xml, single_drug_xml, multiple_drugs_xml):
+    for root in (empty_xml, single_drug_xml, multiple_drugs_xml):
+        tables = parse_all(root)
+        assert set(tables) == set(TABLES)
+
+        pd.testing.assert_frame_equal(tables["drugs"], parse_drugs(root))
+        pd.testing.assert_frame_equal(tables["synonyms"], parse_synonyms(root))
+        pd.testing.assert_frame_equal(tables["products"], parse_products(root))
+        pd.testing.assert_frame_equal(tables["pathways"][0], parse_pathways(root)[0])
+        pd.testing.assert_frame_equal(tables["targets"][0], parse_targets(root)[0])
+        pd.testing.assert_frame_equal(tables["approval_status"][0], parse_approval_status(root)[0])
+        pd.testing.assert_frame_equal(tables["drug_interactions"], parse_drug_interactions(root))
+        pd.testing.assert_frame_equal(tables["genes"], parse_genes(root))
+
+
+def test_parse_all_selected_tables(single_drug_xml):
+    tables = parse_all(single_drug_xml, tables=("drugs", "targets"))
+    assert set(tables) == {"drugs", "targets"}
+    assert tables["drugs"].iloc[0]["Name"] == "Aspirin"
+    assert tables["targets"][0].iloc[0]["Gene_Name"] == "PTGS1"
+
+    with pytest.raises(ValueError):
+        parse_all(single_drug_xml, tables=("drugs", "unknown"))
+
+
+GENERATED_DRUG_COUNT = 20000
+
+GENERATED_DRUG = """<drug type="small molecule">
+    <drugbank-id primary="true">DB{index:05d}</drugbank-id>
+    <name>Drug{index}</name>
+    <groups><group>approved</group><group>investigational</group></groups>
+    <pathways>
+        <pathway>
+            <name>Pathway{index}</name>
+            <drugs>
+                <drug><drugbank-id>DB{index:05d}</drugbank-id><name>Drug{index}</name></drug>
+                <drug><drugbank-id>DB00001</drugbank-id><name>Drug1</name></drug>
+            </drugs>
+        </pathway>
+    </pathways>
+    <targets>
+        <target>
+            <id>BE{index:07d}</id>
+            <name>Target{index}</name>
+            <polypeptide source="Swiss-Prot" id="P{index:05d}"><name>Protein{index}</name></polypeptide>
+        </target>
+    </targets>
+    <drug-interactions>
+        <drug-interaction>
+            <drugbank-id>DB00001</drugbank-id><name>Drug1</name><description>Interacts.</description>
+        </drug-interaction>
+    </drug-interactions>
+</drug>"""
+
+
+class CountingElement(etree.ElementBase):
+    """Counts the elements handed over to Python, by their tag, while parsing."""
+    visited = Counter()
+
+    def _init(self):
+        CountingElement.visited[etree.QName(self.tag).localname] += 1
+
+
+@pytest.fixture(scope="module")
+def generated_xml():
+    drugs = "".join(GENERATED_DRUG.format(index=i) for i in range(1, GENERATED_DRUG_COUNT + 1))
+    parser = etree.XMLParser()
+    parser.set_element_class_lookup(etree.ElementDefaultClassLookup(element=CountingElement))
+    return etree.fromstring(f'<drugbank xmlns="http://www.drugbank.ca">{drugs}</drugbank>', parser)
+
+
+@pytest.mark.parametrize("parse, elements_per_drug", [
+    (parse_targets, 1),
+    (parse_approval_status, 2),
+    (parse_drug_interactions, 1),
+])
+def test_parsers_visit_only_top_level_drugs(generated_xml, parse, elements_per_drug):
+    CountingElement.visited.clear()
+    result = parse(generated_xml)
+    visited = CountingElement.visited
+
+    # The <drug> stubs listed in pathways are neither visited nor parsed as drugs.
+    assert visited["drug"] == GENERATED_DRUG_COUNT
+    assert visited["pathway"] == 0
+    assert visited["target"] + visited["group"] + visited["drug-interaction"] \
+        == GENERATED_DRUG_COUNT * elements_per_drug
+
+    if parse is parse_targets:
+        assert len(result[0]) == GENERATED_DRUG_COUNT
+    elif parse is parse_approval_status:
+        assert result[1] == GENERATED_DRUG_COUNT
+        assert result[2]["Experimental/Investigational"] == GENERATED_DRUG_COUNT
+    else:
+        assert len(result) == GENERATED_DRUG_COUNT
+        assert result["DrugBank_ID"].is_unique
+
+
 def test_parse_polypeptide():
     # Construct a small XML fragment representing a polypeptide.
     xml_str = """
@@ -271,6 +540,82 @@ def test_get_amino_acid_count_from_html():
     assert aa_count is None
 
 
+def test_uniprot_card_index():
+    html = """
+    <html><body>
+        <section class="card">
+            <h2 class="small">P19221 · THRB_MOUSE</h2>
+            <div class="card__content">Prothrombin · Gene: F2 ·
+                <a title="Mus musculus (Mouse), taxon ID 10090" href="/taxonomy/10090">Mus musculus</a> · 618 amino acids
+            </div>
+        </section>
+        <section class="card">
+            <h2 class="small">P00734 · THRB_HUMAN</h2>
+            <div class="card__content">Prothrombin · Gene: F2 ·
+                <a title="Homo sapiens (Human), taxon ID 9606" href="/taxonomy/9606">Homo sapiens</a> · 622 amino acids
+            </div>
+        </section>
+        <section class="card"><div class="card__content">No header · 100 amino acids</div></section>
+    </body></html>
+    """
+    cards = parse_uniprot_cards(html)
+    assert [(card.entry, card.protein_name, card.length) for card in cards] == \
+        [("P19221", "Prothrombin", 618), ("P00734", "Prothrombin", 622)]
+    assert cards[1].organism == "Homo sapiens (Human), taxon ID 9606"
+
+    index = UniProtCardIndex(cards)
+    assert index.by_name["prothrombin"][0] == ("Mus musculus (Mouse), taxon ID 10090", 618)
+    # Only the human card counts, found by its protein name or by a name mentioned in the card (the gene).
+    assert index.amino_acid_count("  PROTHROMBIN ") == 622
+    assert index.amino_acid_count("F2") == 622
+    assert index.amino_acid_count("Thrombin receptor") is None
+    assert parse_uniprot_cards("") == []
+
+
+def test_batch_query():
+    assert batch_query(["Prothrombin", 'Factor "X"']) == '("Prothrombin" OR "Factor  X ") AND (organism_id:9606)'
+    assert batches([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+
+
+def test_batched_lookup_uses_one_query():
+    queries = []
+    targets = ["Prothrombin", "Complement C1q subcomponent subunit A", "Unknown protein"]
+    with serve_uniprot(queries) as url:
+        counts = lookup_amino_acid_counts(FakeBrowser(), targets, base_url=url, step_timeout=0.5)
+
+    assert counts == [622, 245, None]
+    assert queries == [batch_query(targets)]
+
+
+def test_get_uniprot_cards_page_waits_for_cards():
+    with serve_uniprot() as url:
+        browser = FakeBrowser(render_delay=0.3)
+        start = time.monotonic()
+        html = get_uniprot_cards_page("Complement C1q subcomponent subunit A", driver=browser, base_url=url)
+        elapsed = time.monotonic() - start
+
+    # The page is returned once the cards are rendered, instead of after fixed sleeps.
+    assert 0.3 <= elapsed < 1.5
+    assert browser.clicks == ["input", "button"]
+    assert not browser.quit_called
+    assert get_amino_acid_count_from_html(html, "Complement C1q subcomponent subunit A") == 245
+
+
+def test_get_uniprot_cards_page_timeouts():
+    with serve_uniprot() as url:
+        # No cards for an unknown target: the wait for them ends after the step timeout.
+        start = time.monotonic()
+        html = get_uniprot_cards_page("Unknown protein", driver=FakeBrowser(), base_url=url, step_timeout=0.2)
+        assert time.monotonic() - start < 1.5
+        assert get_amino_acid_count_from_html(html, "Unknown protein") is None
+
+        # The overall timeout cuts a slow page short.
+        start = time.monotonic()
+        get_uniprot_cards_page("Complement C1q subcomponent subunit A", timeout=0.3,
+                               driver=FakeBrowser(render_delay=5), base_url=url)
+        assert time.monotonic() - start < 1.5
+
+
 def test_get_amino_acid_count_for_target(monkeypatch):
     # Create a fake function that returns our dummy HTML
     def fake_get_uniprot_cards_page(query, sleep_time=2):
@@ -304,10 +649,52 @@ def test_get_target_amino_acid_count_for_drug(monkeypatch):
         "Target_Name": ["C1QA", "EGFR"]
     })
 
-    # Patch get_amino_acid_count_for_target to return fixed values.
-    def fake_get_amino_acid_count_for_target(target_name):
-        return 245 if target_name == "C1QA" else 1210
-    monkeypatch.setattr("drugbank.parsers.get_amino_acid_count_for_target", fake_get_amino_acid_count_for_target)
+    # Patch get_amino_acid_counts_for_targets to return fixed values.
+    looked_up = []
+
+    def fake_get_amino_acid_counts_for_targets(target_names):
+        looked_up.append(target_names)
+        return [245 if target_name == "C1QA" else 1210 for target_name in target_names]
+    monkeypatch.setattr("drugbank.parsers.get_amino_acid_counts_for_targets", fake_get_amino_acid_counts_for_targets)
     result_df = get_target_amino_acid_count_for_drug("DB00001", df_targets)
+    # Both targets are looked up with a single query.
+    assert looked_up == [["C1QA", "EGFR"]]
     assert result_df.loc[result_df["Target_Name"] == "C1QA", "Amino_Acid_Count"].iloc[0] == 245
     assert result_df.loc[result_df["Target_Name"] == "EGFR", "Amino_Acid_Count"].iloc[0] == 1210
+
+
+def test_get_target_amino_acid_count_for_drug_uses_parsed_counts(monkeypatch):
+    df_targets = pd.DataFrame({
+        "DrugBank_ID": ["DB00001", "DB00001"],
+        "Target_Name": ["C1QA", "EGFR"],
+        "Amino_Acid_Count": pd.array([245, None], dtype="Int64"),
+    })
+
+    # Only the target without a parsed sequence is looked up on UniProt.
+    looked_up = []
+
+    def fake_get_amino_acid_counts_for_targets(target_names):
+        looked_up.extend(target_names)
+        return [1210 for _ in target_names]
+    monkeypatch.setattr("drugbank.parsers.get_amino_acid_counts_for_targets", fake_get_amino_acid_counts_for_targets)
+    result_df = get_target_amino_acid_count_for_drug("DB00001", df_targets)
+    assert looked_up == ["EGFR"]
+    assert result_df["Amino_Acid_Count"].tolist() == [245, 1210]
+
+
+def test_get_target_amino_acid_count_for_drug_skips_targets_without_a_name(monkeypatch):
+    df_targets = pd.DataFrame({
+        "DrugBank_ID": ["DB00001", "DB00001", "DB00001"],
+        "Target_Name": pd.array(["C1QA", None, "EGFR"], dtype="string"),
+    })
+
+    looked_up = []
+
+    def fake_get_amino_acid_counts_for_targets(target_names):
+        looked_up.extend(target_names)
+        return [245 if target_name == "C1QA" else 1210 for target_name in target_names]
+    monkeypatch.setattr("drugbank.parsers.get_amino_acid_counts_for_targets", fake_get_amino_acid_counts_for_targets)
+    result_df = get_target_amino_acid_count_for_drug("DB00001", df_targets)
+    assert looked_up == ["C1QA", "EGFR"]
+    counts = result_df["Amino_Acid_Count"].tolist()
+    assert counts[0] == 245 and pd.isna(counts[1]) and counts[2] == 1210
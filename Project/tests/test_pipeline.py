@@ -0,0 +1,138 @@
+# tests/test_pipeline.py
+import gzip
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import drugbank.pipeline as pipeline
+from drugbank.iter_parsers import RECORD_TABLES, iter_records
+from drugbank.parallel import scan_drug_offsets
+from drugbank.pipeline import iter_drug_blocks, iter_records_parallel, read_envelope
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" version="5.1">
+<drug type="biotech" created="2005-06-13">
+    <drugbank-id primary="true">DB00001</drugbank-id>
+    <name>Lepirudin</name>
+    <synonyms><synonym>Hirudin variant-1</synonym></synonyms>
+    <pathways>
+        <pathway>
+            <name>Lepirudin Action Pathway</name>
+            <drugs>
+                <drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug>
+                <drug><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug>
+            </drugs>
+        </pathway>
+    </pathways>
+    <drug-interactions>
+        <drug-interaction><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name><description>Risk.</description></drug-interaction>
+    </drug-interactions>
+    <groups><group>approved</group></groups>
+</drug>
+<drug type="biotech" created="2005-06-13">
+    <drugbank-id primary="true">DB00002</drugbank-id>
+    <name>Cetuximab</name>
+    <groups><group>approved</group><group>withdrawn</group></groups>
+</drug>
+<drug type="small molecule" created="2005-06-13">
+    <drugbank-id primary="true">DB00003</drugbank-id>
+    <name>Dornase alfa</name>
+    <synonyms><synonym>Pulmozyme</synonym></synonyms>
+</drug>
+</drugbank>
+"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def collect(records):
+    tables = {table: [] for table in RECORD_TABLES}
+    for table, batch in records:
+        tables[table].extend(batch)
+    return tables
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 40, 1 << 20])
+def test_iter_drug_blocks_matches_scan_drug_offsets(xml_path, chunk_size):
+    with open(xml_path, "rb") as file:
+        data = file.read()
+    expected = [data[start:end] for start, end in scan_drug_offsets(xml_path)]
+
+    assert list(iter_drug_blocks(xml_path, chunk_size)) == expected
+
+
+def test_read_envelope(xml_path):
+    prefix, suffix = read_envelope(xml_path)
+    assert prefix.rstrip().endswith(b'<drugbank xmlns="http://www.drugbank.ca" version="5.1">')
+    assert suffix == b"</drugbank>"
+
+
+@pytest.mark.parametrize("workers,batch_size", [(1, 1), (2, 1), (2, 2), (3, 10)])
+def test_iter_records_parallel_matches_iter_records(xml_path, workers, batch_size):
+    records = iter_records_parallel(xml_path, workers=workers, batch_size=batch_size, queue_depth=1)
+    assert collect(records) == collect(iter_records(xml_path))
+
+
+def test_iter_records_parallel_reads_archives(xml_path, tmp_path):
+    archive = tmp_path / "drugbank.xml.gz"
+    archive.write_bytes(gzip.compress(XML.encode("utf-8")))
+    assert collect(iter_records_parallel(str(archive), workers=2)) == collect(iter_records(xml_path))
+
+
+def test_iter_records_parallel_keeps_document_order(xml_path, monkeypatch):
+    parse_drug_blocks = pipeline.parse_drug_blocks
+
+    def slow_first_drug(prefix, suffix, blocks, tables):
+        # The first batch finishes last, so the later ones wait in the reorder buffer.
+        if b"DB00001" in blocks[0]:
+            time.sleep(0.3)
+        return parse_drug_blocks(prefix, suffix, blocks, tables)
+
+    # The worker processes are forked, so they run the patched function.
+    monkeypatch.setattr(pipeline, "parse_drug_blocks", slow_first_drug)
+    records = collect(iter_records_parallel(xml_path, tables=["drugs"], workers=3, batch_size=1))
+
+    assert [drug["DrugBank_ID"] for drug in records["drugs"]] == ["DB00001", "DB00002", "DB00003"]
+
+
+def test_iter_records_parallel_reports_worker_errors(tmp_path):
+    path = tmp_path / "broken.xml"
+    path.write_text(XML.replace("<name>Cetuximab</name>\n    <groups>", "<name>Cetuximab</nam>\n    <groups>"),
+                    encoding="utf-8")
+
+    with pytest.raises(RuntimeError, match="batch 1"):
+        collect(iter_records_parallel(str(path), workers=2, batch_size=1))
+    assert multiprocessing.active_children() == []
+
+
+def test_iter_records_parallel_reports_dead_workers(xml_path, monkeypatch):
+    def crash(prefix, suffix, blocks, tables):
+        os._exit(1)
+
+    monkeypatch.setattr(pipeline, "parse_drug_blocks", crash)
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="exit code 1"):
+        collect(iter_records_parallel(xml_path, workers=2, batch_size=1))
+    assert time.perf_counter() - start < 10
+    assert multiprocessing.active_children() == []
+
+
+def test_iter_records_parallel_stops_processes_when_closed_early(xml_path):
+    records = iter_records_parallel(xml_path, workers=2, batch_size=1)
+    next(records)
+    records.close()
+    assert multiprocessing.active_children() == []
+
+
+def test_iter_records_parallel_rejects_bad_arguments(xml_path):
+    with pytest.raises(ValueError):
+        next(iter_records_parallel(xml_path, tables=["unknown"]))
+    with pytest.raises(ValueError):
+        next(iter_records_parallel(xml_path, queue_depth=0))
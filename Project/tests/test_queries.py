@@ -0,0 +1,62 @@
+# tests/test_queries.py
+import pytest
+
+from drugbank.sqlite_export import export_sqlite
+from drugbank import queries
+from tests.test_sqlite_export import XML
+
+
+@pytest.fixture
+def connection(tmp_path):
+    xml_path = tmp_path / "drugbank.xml"
+    xml_path.write_text(XML, encoding="utf-8")
+    db_path = str(tmp_path / "drugbank.sqlite")
+    export_sqlite(str(xml_path), db_path, use_cache=False)
+
+    connection = queries.connect(db_path)
+    yield connection
+    connection.close()
+
+
+def test_get_drug(connection):
+    drug = queries.get_drug(connection, "DB00001")
+    assert drug["name"] == "Lepirudin"
+    assert drug["type"] == "biotech"
+    assert queries.get_drug(connection, "DB99999") is None
+
+
+def test_get_pathway_count(connection):
+    assert queries.get_pathway_count(connection, "DB00001") == 1
+    assert queries.get_pathway_count(connection, "DB00002") == 1
+    assert queries.get_pathway_count(connection, "DB99999") is None
+    assert queries.get_pathways(connection, "DB00002") == ["Lepirudin Action Pathway"]
+
+
+def test_synonyms_and_products(connection):
+    assert queries.get_synonyms(connection, "DB00001") == ["Hirudin variant-1", "Lepirudin recombinant"]
+    products = queries.get_products(connection, "DB00001")
+    assert [product["manufacturer"] for product in products] == ["Bayer", "Berlex"]
+    assert products[1]["ndc_code"] is None
+
+
+def test_targets_and_genes(connection):
+    assert queries.get_targets(connection, "DB00002")[0]["gene_name"] == "EGFR"
+    assert queries.get_target_drugs(connection, "BE0000048") == [{"drugbank_id": "DB00001", "name": "Lepirudin"}]
+    assert [drug["drugbank_id"] for drug in queries.get_gene_drugs(connection, "EGFR")] == ["DB00002"]
+
+
+def test_interactions(connection):
+    assert queries.get_interactions(connection, "DB00001")[0]["interacting_drug_id"] == "DB00002"
+    assert queries.get_interacting_drugs(connection, "DB00002") == [
+        {"drugbank_id": "DB00001", "name": "Lepirudin", "description": "Increases the risk of bleeding."}
+    ]
+
+
+def test_search_drugs(connection):
+    results = queries.search_drugs(connection, "thrombin")
+    assert [result["drugbank_id"] for result in results] == ["DB00001"]
+    assert "[thrombin]" in results[0]["snippet"]
+
+    results = queries.search_drugs(connection, "receptor OR thrombocytopenia")
+    assert {result["drugbank_id"] for result in results} == {"DB00001", "DB00002"}
+    assert queries.search_drugs(connection, "thromb*", limit=1)[0]["drugbank_id"] == "DB00001"
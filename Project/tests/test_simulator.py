@@ -5,6 +5,7 @@ from drugbank.simulator import (
     generate_element,
     set_primary_drugbank_id,
     main,
+    write_repeated_drugs,
     NS_URL
 )
 
@@ -71,3 +72,19 @@ def test_set_primary_drugbank_id():
     assert ids[0].text == "DB1234"
     assert ids[0].attrib.get('primary') == 'true'
     assert 'primary' not in ids[1].attrib
+
+
+def test_write_repeated_drugs(tmp_path):
+    source = tmp_path / "source.xml"
+    source.write_text(f"""<drugbank xmlns="{NS_URL}">
+        <drug><drugbank-id primary="true">DB00001</drugbank-id><name>A</name></drug>
+        <drug><drugbank-id primary="true">DB00002</drugbank-id><name>B</name></drug>
+    </drugbank>""")
+    output = tmp_path / "output.xml"
+
+    write_repeated_drugs(str(source), str(output), 5)
+
+    drugs = etree.parse(str(output)).getroot().findall(f"{{{NS_URL}}}drug")
+    assert [drug.findtext(f"{{{NS_URL}}}name") for drug in drugs] == ["A", "B", "A", "B", "A"]
+    assert [drug.findtext(f"{{{NS_URL}}}drugbank-id") for drug in drugs] == \
+        ["DB000001", "DB000002", "DB000003", "DB000004", "DB000005"]
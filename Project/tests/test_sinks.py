@@ -0,0 +1,178 @@
+# tests/test_sinks.py
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pyarrow.parquet as pq
+import pytest
+from lxml import etree
+
+from drugbank.__main__ import parse_arguments
+from drugbank.parsers import parse_genes
+from drugbank.sinks import RECORD_SCHEMAS, TABLES, Sink, convert
+from drugbank.simulator import write_repeated_drugs
+from tests.test_iter_tables import DUPLICATED_XML
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca">
+    <drug type="biotech">
+        <drugbank-id primary="true">DB00001</drugbank-id>
+        <name>Lepirudin</name>
+        <synonyms><synonym>Hirudin variant-1</synonym><synonym>Lepirudin recombinant</synonym></synonyms>
+        <products>
+            <product><name>Refludan</name><labeller>Bayer</labeller><country>US</country></product>
+        </products>
+        <groups><group>approved</group><group>withdrawn</group></groups>
+        <drug-interactions>
+            <drug-interaction><drugbank-id>DB06605</drugbank-id><name>Apixaban</name><description>Risk.</description></drug-interaction>
+        </drug-interactions>
+    </drug>
+    <drug type="small molecule">
+        <drugbank-id primary="true">DB00002</drugbank-id>
+        <name>Cetuximab</name>
+        <groups><group>approved</group></groups>
+    </drug>
+</drugbank>
+"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugs.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def test_convert_parquet_writes_every_table(xml_path, tmp_path):
+    out = tmp_path / "out"
+    counts = convert(xml_path, str(out))
+
+    assert set(counts) == set(TABLES)
+    assert counts["drugs"] == 2
+    assert counts["drug_interactions"] == 1
+    for table in TABLES:
+        assert pq.read_schema(out / f"{table}.parquet") == RECORD_SCHEMAS[table]
+
+    drugs = pq.read_table(out / "drugs.parquet").to_pylist()
+    assert [drug["Name"] for drug in drugs] == ["Lepirudin", "Cetuximab"]
+    synonyms = pq.read_table(out / "synonyms.parquet").to_pylist()
+    assert synonyms[0]["Synonyms"] == ["Hirudin variant-1", "Lepirudin recombinant"]
+    status = pq.read_table(out / "approval_status.parquet").to_pylist()
+    assert status[0]["Status"]["Approved"] == 1
+    assert status[0]["Status"]["Withdrawn"] == 1
+
+
+def test_convert_flushes_every_n_drugs_as_row_groups(tmp_path):
+    source = tmp_path / "drugs.xml"
+    source.write_text(XML, encoding="utf-8")
+    repeated = tmp_path / "repeated.xml"
+    write_repeated_drugs(str(source), str(repeated), 10)
+
+    counts = convert(str(repeated), str(tmp_path / "out"), tables=["drugs"], flush_drugs=3)
+
+    assert counts == {"drugs": 10}
+    parquet_file = pq.ParquetFile(tmp_path / "out" / "drugs.parquet")
+    assert parquet_file.metadata.num_row_groups == 4
+    assert parquet_file.metadata.num_rows == 10
+
+
+def test_convert_csv_writes_header_and_json_cells(xml_path, tmp_path):
+    out = tmp_path / "out"
+    convert(xml_path, str(out), "csv", tables=["synonyms", "targets"])
+
+    with open(out / "synonyms.csv", newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["DrugBank_ID", "Synonyms"]
+    assert rows[1][0] == "DB00001"
+    assert json.loads(rows[1][1]) == ["Hirudin variant-1", "Lepirudin recombinant"]
+
+    # A table without records still gets its file, with the header only.
+    with open(out / "targets.csv", newline="", encoding="utf-8") as file:
+        assert list(csv.reader(file)) == [RECORD_SCHEMAS["targets"].names]
+
+
+def test_convert_ndjson_writes_one_record_per_line(xml_path, tmp_path):
+    out = tmp_path / "out"
+    counts = convert(xml_path, str(out), "ndjson", tables=["drugs", "approval_status"])
+
+    with open(out / "drugs.ndjson", encoding="utf-8") as file:
+        drugs = [json.loads(line) for line in file]
+    assert len(drugs) == counts["drugs"] == 2
+    assert drugs[1]["DrugBank_ID"] == "DB00002"
+    assert sorted(os.listdir(out)) == ["approval_status.ndjson", "drugs.ndjson"]
+
+
+def test_convert_genes_match_parse_genes(tmp_path):
+    path = tmp_path / "duplicated.xml"
+    path.write_text(DUPLICATED_XML, encoding="utf-8")
+    out = tmp_path / "out"
+    counts = convert(str(path), str(out), "ndjson", tables=["genes"])
+
+    with open(out / "genes.ndjson", encoding="utf-8") as file:
+        genes = [json.loads(line) for line in file]
+    expected = parse_genes(etree.fromstring(DUPLICATED_XML.encode("utf-8")))
+    assert counts["genes"] == len(expected)
+    assert genes == expected.astype(object).to_dict("records")
+
+
+def test_convert_rejects_unknown_format_and_tables(xml_path, tmp_path):
+    with pytest.raises(ValueError):
+        convert(xml_path, str(tmp_path / "out"), "xlsx")
+    with pytest.raises(ValueError):
+        convert(xml_path, str(tmp_path / "out"), tables=["unknown"])
+    with pytest.raises(ValueError):
+        convert(xml_path, str(tmp_path / "out"), flush_drugs=0)
+
+
+def test_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        Sink(str(tmp_path / "out"))
+
+
+def test_command_line_rejects_non_positive_flush_drugs(xml_path, tmp_path):
+    for value in ("0", "-5"):
+        with pytest.raises(SystemExit):
+            parse_arguments(["convert", xml_path, "--out", str(tmp_path / "out"), "--flush-drugs", value])
+    args = parse_arguments(["convert", xml_path, "--out", str(tmp_path / "out"), "--flush-drugs", "5"])
+    assert args.flush_drugs == 5
+
+
+def test_convert_removes_partial_files_when_parsing_fails(tmp_path):
+    broken = tmp_path / "broken.xml"
+    broken.write_text(XML.replace("</drugbank>", ""), encoding="utf-8")
+    out = tmp_path / "out"
+
+    with pytest.raises(etree.ParseError):
+        convert(str(broken), str(out), flush_drugs=1)
+
+    assert os.listdir(out) == []
+
+
+def test_command_line_convert(xml_path, tmp_path):
+    out = tmp_path / "out"
+    project = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    result = subprocess.run([sys.executable, "-m", "drugbank", "convert", xml_path, "--out", str(out),
+                             "--format", "csv", "--tables", "drugs"],
+                            cwd=project, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert "drugs: 2 records" in result.stdout
+    assert os.listdir(out) == ["drugs.csv"]
+
+
+def test_command_line_convert_from_another_directory(xml_path, tmp_path):
+    # Importing the package must not prepare the API database, which would need data/ in the working directory.
+    workdir = tmp_path / "elsewhere"
+    workdir.mkdir()
+    project = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    env = dict(os.environ, PYTHONPATH=project)
+    result = subprocess.run([sys.executable, "-m", "drugbank", "convert", xml_path, "--out", "out",
+                             "--tables", "drugs"],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert "drugs: 2 records" in result.stdout
+    assert os.listdir(workdir) == ["out"]
+    assert os.listdir(workdir / "out") == ["drugs.parquet"]
@@ -0,0 +1,113 @@
+# tests/test_sqlite_export.py
+import os
+import sqlite3
+import pytest
+
+from drugbank.sqlite_export import export_sqlite, ensure_database, read_metadata
+
+
+XML = """<drugbank xmlns="http://www.drugbank.ca">
+            <drug type="biotech">
+                <drugbank-id primary="true">DB00001</drugbank-id>
+                <name>Lepirudin</name>
+                <description>Lepirudin is a recombinant hirudin, a direct thrombin inhibitor.</description>
+                <indication>For the treatment of heparin-induced thrombocytopenia.</indication>
+                <mechanism-of-action>Lepirudin forms a stable complex with thrombin.</mechanism-of-action>
+                <synonyms>
+                    <synonym>Hirudin variant-1</synonym>
+                    <synonym>Lepirudin recombinant</synonym>
+                </synonyms>
+                <products>
+                    <product><name>Refludan</name><manufacturer>Bayer</manufacturer><ndc-id>50419-150</ndc-id></product>
+                    <product><name>Refludan</name><manufacturer>Berlex</manufacturer></product>
+                </products>
+                <pathways>
+                    <pathway>
+                        <name>Lepirudin Action Pathway</name>
+                        <drugs>
+                            <drug><drugbank-id>DB00001</drugbank-id><name>Lepirudin</name></drug>
+                            <drug><drugbank-id>DB00002</drugbank-id><name>Cetuximab</name></drug>
+                        </drugs>
+                    </pathway>
+                </pathways>
+                <targets>
+                    <target>
+                        <id>BE0000048</id>
+                        <name>Prothrombin</name>
+                        <polypeptide source="Swiss-Prot" id="P00734">
+                            <name>Prothrombin</name>
+                            <gene-name>F2</gene-name>
+                        </polypeptide>
+                    </target>
+                </targets>
+                <drug-interactions>
+                    <drug-interaction>
+                        <drugbank-id>DB00002</drugbank-id>
+                        <name>Cetuximab</name>
+                        <description>Increases the risk of bleeding.</description>
+                    </drug-interaction>
+                </drug-interactions>
+            </drug>
+            <drug type="biotech">
+                <drugbank-id primary="true">DB00002</drugbank-id>
+                <name>Cetuximab</name>
+                <description>Cetuximab is an epidermal growth factor receptor binding antibody.</description>
+                <targets>
+                    <target>
+                        <id>BE0000767</id>
+                        <name>Epidermal growth factor receptor</name>
+                        <polypeptide source="Swiss-Prot" id="P00533">
+                            <name>Epidermal growth factor receptor</name>
+                            <gene-name>EGFR</gene-name>
+                        </polypeptide>
+                    </target>
+                </targets>
+            </drug>
+         </drugbank>"""
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "drugbank.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def count(db_path, table):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_export_sqlite(xml_path, tmp_path):
+    db_path = str(tmp_path / "drugbank.sqlite")
+    export_sqlite(xml_path, db_path, use_cache=False)
+
+    assert count(db_path, "drugs") == 2
+    assert count(db_path, "synonyms") == 2
+    assert count(db_path, "products") == 2
+    assert count(db_path, "pathways") == 2
+    assert count(db_path, "targets") == 2
+    assert count(db_path, "drug_interactions") == 1
+
+    connection = sqlite3.connect(db_path)
+    indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    connection.close()
+    assert {"targets_gene_name", "targets_target_id", "drug_interactions_interacting_drug_id"} <= indexes
+
+
+def test_ensure_database(xml_path, tmp_path):
+    db_path = str(tmp_path / "drugbank.sqlite")
+    ensure_database(xml_path, db_path, use_cache=False)
+    exported_at = os.stat(db_path).st_mtime_ns
+
+    # An up to date database is not exported again.
+    ensure_database(xml_path, db_path, use_cache=False)
+    assert os.stat(db_path).st_mtime_ns == exported_at
+
+    with open(xml_path, "w", encoding="utf-8") as file:
+        file.write(XML.replace("<name>Cetuximab</name>\n                <description>", "<name>Erbitux</name><description>"))
+    ensure_database(xml_path, db_path, use_cache=False)
+    assert read_metadata(db_path)["size"] == str(os.path.getsize(xml_path))
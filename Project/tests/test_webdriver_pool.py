@@ -0,0 +1,177 @@
+# tests/test_webdriver_pool.py
+import threading
+from functools import partial
+
+import pytest
+
+from drugbank.parsers import lookup_amino_acid_count
+from drugbank.webdriver_pool import BLOCKED_URL_PATTERNS, WebDriverPool, chrome_driver, chrome_options
+from tests.uniprot_mock import FakeBrowser, serve_uniprot
+
+
+@pytest.fixture
+def server_url():
+    with serve_uniprot() as url:
+        yield url
+
+
+class DriverFactory:
+    """Starts FakeBrowsers, the first crashes ones crashing on their first page."""
+
+    def __init__(self, crashes=0):
+        self.crashes = crashes
+        self.drivers = []
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            driver = FakeBrowser(crash=len(self.drivers) < self.crashes)
+            self.drivers.append(driver)
+        return driver
+
+
+def test_lookup_through_pool(server_url):
+    factory = DriverFactory()
+    lookup = partial(lookup_amino_acid_count, base_url=server_url, step_timeout=0.5)
+
+    with WebDriverPool(size=2, driver_factory=factory) as pool:
+        counts = pool.map(lookup, ["Complement C1q subcomponent subunit A", "Unknown protein"] * 3)
+
+    assert counts == [245, None] * 3
+    # Six lookups share at most two sessions, which are quit when the pool is closed.
+    assert 1 <= len(factory.drivers) <= 2
+    assert all(driver.quit_called for driver in factory.drivers)
+    assert sum(len(driver.urls) for driver in factory.drivers) == 6
+    assert factory.drivers[0].urls[0].startswith(f"{server_url}?query=")
+
+
+def test_sessions_are_reused():
+    factory = DriverFactory()
+    pool = WebDriverPool(size=1, driver_factory=factory)
+
+    results = pool.map(lambda driver, item: (id(driver), item * 2), [1, 2, 3])
+
+    assert [result for _, result in results] == [2, 4, 6]
+    assert len({driver for driver, _ in results}) == 1
+    assert len(factory.drivers) == 1
+    assert not factory.drivers[0].quit_called
+    pool.close()
+    assert factory.drivers[0].quit_called
+
+
+def test_crashed_session_is_restarted(server_url):
+    factory = DriverFactory(crashes=1)
+    lookup = partial(lookup_amino_acid_count, base_url=server_url, step_timeout=0.5)
+
+    with WebDriverPool(size=1, driver_factory=factory, retries=1) as pool:
+        count = pool.run(lookup, "Complement C1q subcomponent subunit A")
+        stats = pool.stats()
+
+    assert count == 245
+    assert len(factory.drivers) == 2
+    assert factory.drivers[0].quit_called
+    assert stats.restarts == 1
+    assert stats.sessions_started == 2
+    assert pool.timings[0].attempts == 2
+    assert pool.timings[0].ok
+
+
+def test_lookup_fails_after_retries():
+    factory = DriverFactory(crashes=5)
+
+    with WebDriverPool(size=1, driver_factory=factory, retries=2) as pool:
+        assert pool.run(lambda driver, item: driver.get(item), "http://127.0.0.1/") is None
+        stats = pool.stats()
+
+    assert len(factory.drivers) == 3
+    assert stats.lookups == 1
+    assert stats.failures == 1
+    assert stats.restarts == 3
+
+
+def test_other_errors_are_raised():
+    factory = DriverFactory()
+    pool = WebDriverPool(size=1, driver_factory=factory)
+
+    with pytest.raises(ZeroDivisionError):
+        pool.run(lambda driver, item: item / 0, 1)
+
+    # The session is still fine and is used for the next lookup.
+    assert pool.run(lambda driver, item: item, 1) == 1
+    assert len(factory.drivers) == 1
+    pool.close()
+
+
+def test_stats():
+    pool = WebDriverPool(size=2, driver_factory=DriverFactory())
+    assert pool.stats().lookups == 0
+    assert pool.stats().mean_seconds == 0.0
+
+    pool.map(lambda driver, item: item, range(4))
+    stats = pool.stats()
+
+    assert stats.lookups == 4
+    assert stats.failures == 0
+    assert stats.total_seconds >= stats.max_seconds >= stats.mean_seconds >= 0
+    assert [timing.item for timing in sorted(pool.timings, key=lambda timing: timing.item)] == [0, 1, 2, 3]
+    pool.close()
+
+
+def test_closed_pool():
+    pool = WebDriverPool(size=1, driver_factory=DriverFactory())
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    with pytest.raises(ValueError):
+        WebDriverPool(size=0)
+
+
+def test_target_amino_acid_counts_with_pool(monkeypatch):
+    import pandas as pd
+    from drugbank.parsers import get_target_amino_acid_count_for_drug
+
+    targets = pd.DataFrame({
+        "DrugBank_ID": ["DB00001", "DB00001", "DB00001"],
+        "Target_Name": ["Prothrombin", "Unknown A", "Unknown B"],
+        "Amino_Acid_Count": pd.array([622, pd.NA, pd.NA], dtype="Int64"),
+    })
+    monkeypatch.setattr("drugbank.parsers.lookup_amino_acid_counts",
+                        lambda driver, target_names: [len(target_name) for target_name in target_names])
+    factory = DriverFactory()
+
+    with WebDriverPool(size=2, driver_factory=factory) as pool:
+        result = get_target_amino_acid_count_for_drug("DB00001", targets, pool=pool)
+
+    assert result["Amino_Acid_Count"].tolist() == [622, 9, 9]
+    # Both missing targets are looked up in a single batch.
+    assert pool.stats().lookups == 1
+
+
+def test_chrome_options():
+    options = chrome_options()
+    assert "--headless=new" in options.arguments
+    assert options.page_load_strategy == "eager"
+    assert options.experimental_options["prefs"]["profile.managed_default_content_settings.images"] == 2
+
+    options = chrome_options(headless=False, block_resources=False)
+    assert options.arguments == []
+    assert "prefs" not in options.experimental_options
+
+
+def test_chrome_driver_blocks_fonts(monkeypatch):
+    commands = []
+
+    class FakeChrome:
+        def __init__(self, service, options):
+            self.options = options
+
+        def execute_cdp_cmd(self, command, arguments):
+            commands.append((command, arguments))
+
+    monkeypatch.setattr("drugbank.webdriver_pool.webdriver.Chrome", FakeChrome)
+    monkeypatch.setattr("drugbank.webdriver_pool.chromedriver_path", lambda: "chromedriver")
+
+    driver = chrome_driver()
+    assert "--headless=new" in driver.options.arguments
+    assert commands[-1] == ("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    assert "*.woff2" in BLOCKED_URL_PATTERNS
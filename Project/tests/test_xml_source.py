@@ -0,0 +1,116 @@
+# tests/test_xml_source.py
+import gzip
+import lzma
+import zipfile
+import pytest
+import pandas as pd
+from lxml import etree
+
+from drugbank.parsers import parse_all
+from drugbank.parallel import parse_all_parallel
+from drugbank.xml_source import detect_compression, open_xml, parse_xml, iterparse_xml
+
+
+XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<drugbank xmlns="http://www.drugbank.ca" version="5.1">
+<drug type="biotech">
+    <drugbank-id primary="true">DB00001</drugbank-id>
+    <name>Lepirudin</name>
+    <synonyms><synonym>Hirudin variant-1</synonym></synonyms>
+</drug>
+<drug type="small molecule">
+    <drugbank-id primary="true">DB00002</drugbank-id>
+    <name>Cetuximab</name>
+</drug>
+</drugbank>
+"""
+
+
+def write_plain(path):
+    path.write_bytes(XML)
+
+
+def write_gz(path):
+    with gzip.open(path, "wb") as file:
+        file.write(XML)
+
+
+def write_xz(path):
+    with lzma.open(path, "wb") as file:
+        file.write(XML)
+
+
+def write_zip(path):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("readme.txt", "DrugBank release")
+        archive.writestr("full database.xml", XML)
+
+
+WRITERS = {
+    "drugbank.xml": (write_plain, None),
+    "drugbank.xml.gz": (write_gz, "gz"),
+    "drugbank.xml.xz": (write_xz, "xz"),
+    "drugbank.zip": (write_zip, "zip"),
+}
+
+
+@pytest.fixture(params=list(WRITERS))
+def xml_file(request, tmp_path):
+    write, compression = WRITERS[request.param]
+    path = tmp_path / request.param
+    write(path)
+    return str(path), compression
+
+
+def test_detect_compression(xml_file, tmp_path):
+    path, compression = xml_file
+    assert detect_compression(path) == compression
+
+    # The format is recognised by the content, not by the name.
+    renamed = tmp_path / "renamed.xml"
+    with open(path, "rb") as file:
+        renamed.write_bytes(file.read())
+    assert detect_compression(str(renamed)) == compression
+
+
+def test_open_xml_reads_uncompressed_bytes(xml_file):
+    path, _ = xml_file
+    with open_xml(path) as source:
+        assert source.read() == XML
+
+
+def test_parse_xml(xml_file):
+    path, _ = xml_file
+    expected = parse_all(etree.fromstring(XML))
+    tables = parse_all(parse_xml(path))
+
+    pd.testing.assert_frame_equal(tables["drugs"], expected["drugs"])
+    pd.testing.assert_frame_equal(tables["synonyms"], expected["synonyms"])
+
+
+def test_iterparse_xml(xml_file):
+    path, _ = xml_file
+    names = [drug.findtext("{http://www.drugbank.ca}name")
+             for _, drug in iterparse_xml(path, events=("end",), tag="{http://www.drugbank.ca}drug")]
+    assert names == ["Lepirudin", "Cetuximab"]
+
+
+def test_parse_all_parallel_reads_archives(tmp_path):
+    path = tmp_path / "drugbank.xml.gz"
+    write_gz(path)
+    result = parse_all_parallel(str(path), ("drugs",), workers=2)
+    assert list(result["drugs"]["DrugBank_ID"]) == ["DB00001", "DB00002"]
+
+
+def test_parse_xml_errors(tmp_path):
+    empty = tmp_path / "empty.xml"
+    empty.write_bytes(b"")
+    with pytest.raises(etree.ParseError):
+        parse_xml(str(empty))
+
+    archive = tmp_path / "empty.zip"
+    with zipfile.ZipFile(archive, "w") as file:
+        file.writestr("a.txt", "a")
+        file.writestr("b.txt", "b")
+    with pytest.raises(ValueError):
+        parse_xml(str(archive))
@@ -0,0 +1,174 @@
+# tests/uniprot_mock.py
+import threading
+import time
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lxml.html
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+from selenium.webdriver.common.by import By
+
+# The search page of the mock: the view switch and the submit button, with the results rendered into
+# <div id="results"> after the submit, like UniProt does it with JavaScript.
+SEARCH_PAGE = """<html><body>
+<form>
+    <span role="radiogroup">
+        <label><input type="radio" name="view" value="table"><span>Table</span></label>
+        <label><input type="radio" name="view" value="cards"><span>Cards</span></label>
+    </span>
+    <button class="button primary" type="submit">View results</button>
+</form>
+<div id="results"></div>
+</body></html>"""
+
+CARDS = {
+    "complement c1q subcomponent subunit a": """
+    <section class="card">
+        <h2 class="small">P02745 · C1QA_HUMAN</h2>
+        <div class="card__content">
+            Complement C1q subcomponent subunit A · Gene: C1QA · Homo sapiens (Human) · 245 amino acids · Evidence...
+            <a title="Homo sapiens">Homo sapiens</a>
+        </div>
+    </section>""",
+    "prothrombin": """
+    <section class="card">
+        <h2 class="small">P19221 · THRB_MOUSE</h2>
+        <div class="card__content">
+            Prothrombin · Gene: F2 · <a title="Mus musculus (Mouse), taxon ID 10090" href="/taxonomy/10090">Mus musculus</a>
+            · 618 amino acids · Evidence...
+        </div>
+    </section>
+    <section class="card">
+        <h2 class="small">P00734 · THRB_HUMAN</h2>
+        <div class="card__content">
+            Prothrombin · Gene: F2 · <a title="Homo sapiens (Human), taxon ID 9606" href="/taxonomy/9606">Homo sapiens</a>
+            · 622 amino acids · Evidence...
+        </div>
+    </section>""",
+}
+
+
+class UniProtHandler(BaseHTTPRequestHandler):
+    """
+    Serves the search page at /uniprotkb and the rendered cards at /uniprotkb/cards: the cards of every protein
+    named in the query, so a batched query gets the cards of all its targets.
+    """
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query).get("query", [""])[0]
+        if url.path.endswith("/cards"):
+            self.server.queries.append(query)
+            page = "".join(cards for name, cards in CARDS.items() if name in query.lower())
+        else:
+            page = SEARCH_PAGE
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(page.encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_uniprot(queries=None):
+    """
+    Runs the mock UniProt on a free local port and yields the URL of its search page.
+    The queries whose results were rendered are appended to the queries list.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UniProtHandler)
+    server.queries = queries if queries is not None else []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/uniprotkb"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read().decode("utf-8")
+
+
+class FakeElement:
+    def __init__(self, browser, element):
+        self.browser = browser
+        self.element = element
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def is_selected(self):
+        return self.element.get("value") == "cards" and self.browser.cards_view
+
+    def click(self):
+        self.browser.clicks.append(self.element.tag)
+        if self.element.get("value") == "cards":
+            self.browser.cards_view = True
+        elif self.element.get("type") == "submit":
+            self.browser.submit()
+
+
+class FakeBrowser:
+    """
+    A stand-in for a browser session on the mock UniProt: it finds elements by XPath in the page source and,
+    once the Cards view is submitted, renders the cards render_delay seconds later. A crashing browser fails
+    on its first page like a session whose browser is gone.
+    """
+
+    def __init__(self, render_delay=0.0, crash=False):
+        self.render_delay = render_delay
+        self.crash = crash
+        self.quit_called = False
+        self.urls = []
+        self.clicks = []
+        self.document = ""
+        self.cards_view = False
+        self.cards_url = None
+        self.rendered_at = None
+        self.cards = None
+
+    def get(self, url):
+        if self.crash:
+            raise WebDriverException("chrome not reachable")
+        self.urls.append(url)
+        self.document = fetch(url)
+        self.cards_view = False
+        self.rendered_at = None
+        self.cards = None
+        base, _, query = url.partition("?")
+        self.cards_url = f"{base}/cards?{query}"
+
+    def submit(self):
+        if self.cards_view:
+            self.rendered_at = time.monotonic() + self.render_delay
+
+    @property
+    def page_source(self):
+        if self.rendered_at is None or time.monotonic() < self.rendered_at:
+            return self.document
+        if self.cards is None:
+            self.cards = fetch(self.cards_url)
+        return self.document.replace('<div id="results"></div>', f'<div id="results">{self.cards}</div>')
+
+    def find_elements(self, by=By.XPATH, value=None):
+        if by != By.XPATH:
+            raise NoSuchElementException(f"The fake browser only finds elements by XPath, not by {by}.")
+        return [FakeElement(self, element) for element in lxml.html.fromstring(self.page_source).xpath(value)]
+
+    def find_element(self, by=By.XPATH, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(value)
+        return elements[0]
+
+    def quit(self):
+        self.quit_called = True